@@ -0,0 +1,108 @@
+"""Time building a page of xbar figures with each figure class.
+
+Writes a part with 50 tests at two locations to a temporary directory,
+then plots every test with each figure class and serialises them to
+JSON as the dash app does.
+
+Usage:
+    poetry run python benchmarks/figure_construction.py [<n_sn>]
+"""
+
+# Imports
+
+import os
+import sys
+import time
+import tempfile
+import logging
+import contextlib
+import pandas as pd  # type: ignore
+import numpy as np
+from spyc.helpers.partnumber import PartNumber
+from spyc.helpers.spcfigure import (
+    SPCFigure,
+    SPCServerFigure,
+    SPCDictFigure,
+)
+
+N_TESTS = 50
+LOCATIONS = ["Portland", "Miami"]
+
+
+def write_part(dirpath: str, n_sn: int) -> str:
+    """Write a part as a directory of csv files.
+
+    Args:
+        dirpath (str): Directory to write the part in to
+        n_sn (int): Serial numbers tested at each location
+
+    Returns:
+        str: path of the part
+    """
+    rng = np.random.default_rng(0)
+    path = os.path.join(dirpath, "BENCH")
+    os.makedirs(path)
+
+    pd.DataFrame([{"Part Number": "BENCH", "Notes": ""}]).to_csv(
+        os.path.join(path, "Header.csv"), index=False
+    )
+    pd.DataFrame(
+        {
+            "Test_ID": [str(i) for i in range(N_TESTS)],
+            "Test_Name": [f"Test {i}" for i in range(N_TESTS)],
+            "Min_Tol": 9.0,
+            "Max_Tol": 11.0,
+            "Units": "mm",
+        }
+    ).to_csv(os.path.join(path, "Test_List.csv"), index=False)
+
+    for location in LOCATIONS:
+        pd.DataFrame(
+            {
+                "Test_ID": np.repeat([str(i) for i in range(N_TESTS)], n_sn),
+                "Unit SN": np.tile(
+                    [f"SN{i:06d}" for i in range(n_sn)], N_TESTS
+                ),
+                "Reading": rng.normal(10, 0.4, N_TESTS * n_sn),
+            }
+        ).to_csv(os.path.join(path, f"{location}.csv"), index=False)
+
+    return path
+
+
+def main(n_sn: int = 100) -> None:
+    """Plot every test with each figure class and print the times.
+
+    Args:
+        n_sn (int, optional): Serial numbers tested at each location
+    """
+    logging.basicConfig(level=30)
+
+    with tempfile.TemporaryDirectory() as dirpath:
+        part = PartNumber(write_part(dirpath, n_sn))
+
+        for figure_class in (SPCFigure, SPCServerFigure, SPCDictFigure):
+            start = time.perf_counter()
+
+            # SPCFigure prints every title
+            with contextlib.redirect_stdout(open(os.devnull, "w")):
+                figs = part.xbar(
+                    capability_loc=LOCATIONS[0],
+                    meanline=True,
+                    figure_class=figure_class,
+                )
+            built = time.perf_counter()
+
+            for fig in figs.values():
+                fig.to_json(validate=False)
+            done = time.perf_counter()
+
+            print(
+                f"{figure_class.__name__:>16}: {len(figs)} tests,"
+                f" build {built - start:.2f} s,"
+                f" to json {done - built:.2f} s"
+            )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
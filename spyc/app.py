@@ -0,0 +1,1480 @@
+"""Dash apps of spyc, the interactive plots and the capability summary.
+
+Imports dash, plotly and pandas, so is only imported by spyc.main for the
+commands that need it.
+"""
+
+# Imports
+
+import os
+import uuid
+import json
+import pkgutil
+import logging
+import functools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import Future
+from collections import OrderedDict
+from typing import List, Dict, Any, Union, Callable, Iterable, Optional
+from typing import Tuple, Hashable
+
+import pandas as pd  # type: ignore
+
+import dash  # type: ignore
+import dash_core_components as dcc  # type: ignore
+import dash_html_components as html  # type: ignore
+import dash_table  # type: ignore
+from dash.dependencies import Input, Output, State, MATCH  # type: ignore
+from dash.exceptions import PreventUpdate  # type: ignore
+
+from .helpers.partnumber import PartNumber
+from .helpers.spcfigure import SPCPlot, SPCDictFigure
+from .helpers.readers import find_sources
+from .helpers.watcher import DirectoryWatcher
+from .helpers.figurecache import FigureCache
+from .helpers.jobs import JobQueue
+
+# create logger
+log = logging.getLogger(__name__)
+
+external_stylesheets = ["https://codepen.io/chriddyp/pen/bWLwgP.css"]
+
+# Columns of the capability summary
+SUMMARY_COLUMNS = [
+    "Part Number",
+    "Location",
+    "Test_ID",
+    "Test_Name",
+    "count",
+    "mean",
+    "SD",
+    "min",
+    "max",
+    "oot",
+    "LSL",
+    "USL",
+    "Cp",
+    "Cpk",
+]
+SUMMARY_TEXT_COLUMNS = ["Part Number", "Location", "Test_ID", "Test_Name"]
+
+
+def load_plot_types() -> Dict[str, Any]:
+    """Read the plot options shipped in the package.
+
+    Found through the package, so works from any working directory and
+    from an installed package.
+
+    Returns:
+        Dict[str, Any]: Options of each plot type, key is the plot type
+
+    Raises:
+        FileNotFoundError: plot_options.json is missing from the package
+    """
+    data = pkgutil.get_data(__package__ or "spyc", "plot_options.json")
+    if data is None:
+        raise FileNotFoundError("plot_options.json not found in spyc")
+
+    return json.loads(data)
+
+
+# Get plot options from json source file
+plot_types: Dict[str, Any] = load_plot_types()
+
+
+def make_parts(
+    filepath: str,
+    workers: int = 1,
+    cache_dir: Optional[str] = None,
+    lazy: bool = False,
+    engine: str = "pandas",
+) -> Dict[str, PartNumber]:
+    """Create list of parts in the target directory.
+
+    Args:
+        filepath (str): Directory to look within
+        workers (int, optional): Number of processes used to read the data
+            files, 1 reads serially and 0 uses all CPUs
+        cache_dir (Optional[str], optional): Directory of the parsed data
+            cache, default is to not use a cache
+        lazy (bool, optional): Only read the header of each file, the
+            rest is read when first used
+        engine (str, optional): Excel reader, pandas or streaming
+
+    Returns:
+        Dict[str, PartNumber]: Partslist, key is part number string
+
+    Raises:
+        ValueError: Description
+    """
+    if not os.path.isabs(filepath):
+
+        filepath = os.path.abspath(filepath)
+        log.debug(f"dir input is not absolute, new dir is: {filepath}")
+
+    log.debug(f"Looking in dir: {filepath}")
+
+    # Look up xlsx files and directories of csv/parquet tables
+    data_files = find_sources(filepath)
+
+    log.info(f"{len(data_files)} files found in {filepath}")
+
+    if workers < 1:
+        workers = os.cpu_count() or 1
+
+    # No point starting processes for a single file
+    workers = min(workers, len(data_files))
+
+    # Options passed to every PartNumber
+    part_kwargs: Dict[str, Any] = dict(
+        cache_dir=cache_dir, lazy=lazy, engine=engine
+    )
+
+    if workers > 1:
+        log.debug(f"Reading files with {workers} processes")
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Submit everything up front, results are still collected
+            # in file order so duplicate detection matches a serial read
+            futures = [
+                pool.submit(PartNumber, file, **part_kwargs)
+                for file in data_files
+            ]
+
+            return collect_parts(
+                data_files, [future.result for future in futures]
+            )
+
+    return collect_parts(
+        data_files,
+        [
+            functools.partial(PartNumber, file, **part_kwargs)
+            for file in data_files
+        ],
+    )
+
+
+def collect_parts(
+    data_files: List[str], loaders: Iterable[Callable[[], PartNumber]]
+) -> Dict[str, PartNumber]:
+    """Build the parts dict from one loader per data file.
+
+    Args:
+        data_files (List[str]): Data files, used for logging
+        loaders (Iterable[Callable[[], PartNumber]]): Callables returning the
+            PartNumber for the matching data file
+
+    Returns:
+        Dict[str, PartNumber]: Partslist, key is part number string
+    """
+    # create Part_Number Object for each file
+    parts: Dict[str, PartNumber] = {}
+    for file, loader in zip(data_files, loaders):
+        log.debug(f"Reading from {file}")
+        try:
+            add_part(parts, loader())
+        except ValueError as e:
+            log.warning(e)
+
+    return parts
+
+
+def add_part(parts: Dict[str, PartNumber], part: PartNumber) -> None:
+    """Add a part to the parts dict.
+
+    Args:
+        parts (Dict[str, PartNumber]): Partslist, key is part number string
+        part (PartNumber): Part to add
+
+    Raises:
+        ValueError: Part number is already in the parts dict
+    """
+    if part.header["Part Number"] in parts:
+        raise ValueError(
+            "Duplicate PN in source directory,"
+            f" {part.header['Part Number']}"
+        )
+    parts[part.header["Part Number"]] = part
+
+
+def update_parts(
+    parts: Dict[str, PartNumber],
+    added: List[str],
+    modified: List[str],
+    deleted: List[str],
+    **part_kwargs: Any,
+) -> None:
+    """Apply changes in the source directory to the parts dict in place.
+
+    Modified parts are updated (only appended rows are read where
+    possible), added files are read and deleted files have their part
+    removed.
+
+    Args:
+        parts (Dict[str, PartNumber]): Partslist, key is part number string
+        added (List[str]): New data files
+        modified (List[str]): Changed data files
+        deleted (List[str]): Removed data files
+        **part_kwargs (Any): Passed to PartNumber for new files
+    """
+    by_file = {part.filepath: pn for pn, part in parts.items()}
+    new_files = list(added)
+
+    for file in deleted:
+        if file in by_file:
+            log.info(f"{by_file[file]} removed, {file} was deleted")
+            parts.pop(by_file[file]).unload()
+
+    for file in modified:
+        if file not in by_file:
+            # Did not load last time, e.g. a duplicate PN, so try again
+            new_files.append(file)
+            continue
+
+        pn = by_file[file]
+        part = parts[pn]
+        try:
+            part.update()
+
+            # Part number changed in the header
+            if part.header["Part Number"] != pn:
+                del parts[pn]
+                add_part(parts, part)
+
+        except ValueError as e:
+            log.warning(e)
+            parts.pop(pn, None)
+            part.unload()
+
+    for file in new_files:
+        log.debug(f"Reading from {file}")
+        try:
+            add_part(parts, PartNumber(file, **part_kwargs))
+        except ValueError as e:
+            log.warning(e)
+
+
+def dash_app(
+    filepath: str,
+    debug: bool = False,
+    workers: int = 1,
+    cache_dir: Optional[str] = None,
+    lazy: bool = False,
+    max_loaded: Optional[int] = None,
+    engine: str = "pandas",
+    watch: Optional[float] = None,
+    fig_cache: int = 0,
+    plot_workers: int = 0,
+):
+    """Create a dash app.
+
+    Args:
+        filepath (str): Description
+        debug (bool, optional): Description
+        workers (int, optional): Processes used to read the data files
+        cache_dir (Optional[str], optional): Directory of the parsed data
+            cache, default is to not use a cache
+        lazy (bool, optional): Only read part data when a part is selected
+        max_loaded (Optional[int], optional): Lazy parts kept in memory,
+            default is no limit
+        engine (str, optional): Excel reader, pandas or streaming
+        watch (Optional[float], optional): Seconds between checks of the
+            directory for changed data files, default is to not check
+        fig_cache (int, optional): Bytes of figure JSON to keep for
+            selections already plotted, default is no cache
+        plot_workers (int, optional): Processes plotting figures in the
+            background, default is to plot in the web server thread
+
+    Raises:
+        FileNotFoundError: Description
+    """
+    app = dash.Dash(
+        __name__, external_stylesheets=external_stylesheets, title="SPYC"
+    )
+    app.config["suppress_callback_exceptions"] = True
+
+    # Get PartNumber objects
+    PartNumber.max_resident = max_loaded
+
+    # Snapshot the directory before reading so no change is missed
+    watcher = DirectoryWatcher(filepath) if watch else None
+
+    part_dict = make_parts(
+        filepath,
+        workers=workers,
+        cache_dir=cache_dir,
+        lazy=lazy,
+        engine=engine,
+    )
+
+    if not part_dict:
+        raise FileNotFoundError(f"No Parts generated from dir = {filepath}")
+
+    figure_cache = FigureCache(fig_cache)
+
+    def cache_figure(key: Hashable, fig_json: Optional[str]) -> None:
+        """Cache a figure plotted by a worker.
+
+        Args:
+            key (Hashable): Figure key
+            fig_json (Optional[str]): Figure JSON, None if the plot type
+                has no figure
+        """
+        if fig_json is not None:
+            figure_cache.put(key, fig_json)
+
+    # Figures are plotted in worker processes so a large page does not
+    # hold up the web server, the page polls the job for its progress
+    jobs = None
+    part_kwargs: Dict[str, Any] = dict(cache_dir=cache_dir, engine=engine)
+    if plot_workers > 0:
+        jobs = JobQueue(
+            ProcessPoolExecutor(
+                max_workers=plot_workers,
+                initializer=init_plot_worker,
+                initargs=(max_loaded,),
+            ),
+            plot_task,
+            on_done=cache_figure,
+        )
+
+    # Bumped when the parts change, pushed to the page by the interval
+    data_version = {"value": 0}
+
+    if watcher is not None and watch is not None:
+
+        def refresh(
+            added: List[str], modified: List[str], deleted: List[str]
+        ) -> None:
+            """Update the parts and the page when data files change.
+
+            Args:
+                added (List[str]): New data files
+                modified (List[str]): Changed data files
+                deleted (List[str]): Removed data files
+            """
+            update_parts(
+                part_dict,
+                added,
+                modified,
+                deleted,
+                cache_dir=cache_dir,
+                lazy=lazy,
+                engine=engine,
+            )
+            data_version["value"] += 1
+
+        watcher.interval = watch
+        watcher.callback = refresh
+        watcher.start()
+
+    # Elements to always display. The rest are generate by the code
+    disp_elements = [
+        html.H1(children="SPYC"),
+        dcc.Interval(
+            id="watch_interval",
+            interval=(watch or 1) * 1000,
+            disabled=watch is None,
+        ),
+        dcc.Store(id="data_version", data=0),
+        dcc.Dropdown(
+            id="part_dd",
+            placeholder="Select a Part Number",
+            clearable=True,
+        ),
+        html.Div(id="loc_title"),
+        dcc.Checklist(id="loc_dd", labelStyle={"display": "inline-block"}),
+        dcc.Dropdown(
+            id="test_dd",
+            placeholder="Select tests to plot, leave blank to plot all",
+            multi=True,
+            clearable=True,
+        ),
+        dcc.RadioItems(id="plot_dd", labelStyle={"display": "inline-block"}),
+        html.Div(id="cap_title"),
+        dcc.RadioItems(
+            id="cap_dd", labelStyle={"display": "inline-block"}, value="None"
+        ),
+        html.Div(id="option_title"),
+        dcc.Checklist(id="option_dd", labelStyle={"display": "inline-block"}),
+        html.Div(
+            id="page_controls",
+            children=[
+                html.Button("Previous", id="prev_page"),
+                html.Span(id="page_label"),
+                html.Button("Next", id="next_page"),
+            ],
+            style={"display": "none"},
+        ),
+        dcc.Store(id="page", data=0),
+        html.Div(id="fig_container"),
+        dcc.Interval(id="job_interval", interval=500, disabled=True),
+        dcc.Store(id="graph_width"),
+        html.Details(
+            id="summary_details",
+            children=[html.Summary("Capability summary")] + summary_elements(),
+        ),
+    ]
+
+    # Width of the page in pixels, zoomed graphs are plotted to match
+    app.clientside_callback(
+        "function(children) { return window.innerWidth; }",
+        Output("graph_width", "data"),
+        Input("fig_container", "children"),
+    )
+
+    @app.callback(
+        Output("data_version", "data"),
+        Input("watch_interval", "n_intervals"),
+        State("data_version", "data"),
+    )
+    def check_data_version(_: Optional[int], version: int) -> int:
+        """Push the data version to the page when the parts have changed.
+
+        Args:
+            _ (Optional[int]): Interval count, unused
+            version (int): Data version the page has
+
+        Returns:
+            int: Current data version
+
+        Raises:
+            PreventUpdate: Page is up to date
+        """
+        if version == data_version["value"]:
+            raise PreventUpdate
+
+        return data_version["value"]
+
+    @app.callback(Output("part_dd", "options"), Input("data_version", "data"))
+    def get_parts(_: int) -> List[Dict[str, str]]:
+        """Build dict for part selection drop down.
+
+        Args:
+            _ (int): Data version, unused
+
+        Returns:
+            List[Dict[str, str]]: Dropdown options for part numbers
+        """
+        part_dd_options = []
+        for pn in list(part_dict.keys()):
+
+            part_dd_options.append({"label": pn, "value": pn})
+
+        return part_dd_options
+
+    @app.callback(Output("loc_title", "children"), Input("part_dd", "value"))
+    def show_loc_title(pn: str) -> str:
+        """Show location title only if PN is selected.
+
+        Args:
+            pn (str): pn to plot
+
+        Returns:
+            str: location title
+        """
+        if pn:
+            return "Plot data for:"
+        return ""
+
+    @app.callback(
+        Output("cap_title", "children"),
+        [Input("part_dd", "value"), Input("plot_dd", "value")],
+    )
+    def show_cap_title(pn: str, ptype: str) -> str:
+        """Show capability title only if PN is selected and plot allows capability.
+
+        Args:
+            pn (str): pn to plot
+            ptype (str): plot type
+
+        Returns:
+            str: Capability title
+        """
+        if pn and ptype:
+            if plot_types[ptype]["capability"]:
+                return "Measure capability from:"
+        return ""
+
+    @app.callback(
+        Output("option_title", "children"), Input("plot_dd", "value")
+    )
+    def show_option_title(ptype: str) -> str:
+        """Show option title only if PN is selected.
+
+        Args:
+            ptype (str): plot type
+
+        Returns:
+            str: plot options title
+        """
+        # only disaply if the plot type has options
+        if ptype and len(plot_types[ptype]["options"]) > 0:
+            return "Plot Options:"
+        return ""
+
+    @app.callback(
+        Output("summary_table", "data"),
+        [Input("summary_details", "open"), Input("data_version", "data")],
+    )
+    def get_summary(is_open: Optional[bool], _: int) -> List[Dict[str, Any]]:
+        """Fill the capability summary when it is shown.
+
+        Args:
+            is_open (Optional[bool]): summary is expanded
+            _ (int): data version, unused
+
+        Returns:
+            List[Dict[str, Any]]: rows of the summary table
+
+        Raises:
+            PreventUpdate: summary is collapsed
+        """
+        # Lazy parts are all read for the summary, only do it when asked
+        if not is_open:
+            raise PreventUpdate
+
+        return summary_table(part_dict).to_dict("records")
+
+    @app.callback(
+        Output("loc_dd", "options"),
+        [Input("part_dd", "value"), Input("data_version", "data")],
+    )
+    def get_loc(value: str, _: int) -> List[Dict[str, str]]:
+        """Display graphs selected by part number dropdown.
+
+        Parameters
+        ----------
+        value : str
+            part number
+        _ : int
+            data version, unused
+
+        Returns
+        -------
+        List[Dict[str:str]]
+            checklist options for locations
+        """
+        loc_dd_options = []
+
+        if value is not None and value in part_dict:
+
+            part = part_dict[value]
+
+            # build dict for part slection drop down
+
+            for loc in list(part.data.keys()):
+                loc_dd_options.append({"label": loc, "value": loc})
+
+            return loc_dd_options
+        return []
+
+    @app.callback(
+        Output("test_dd", "options"),
+        [Input("part_dd", "value"), Input("data_version", "data")],
+    )
+    def get_test_id(pn: str, _: int) -> List[Dict[str, str]]:
+        """Display plot types avaialable.
+
+        Parameters
+        ----------
+        pn: str
+            Part Number to plot
+        _ : int
+            data version, unused
+
+        Returns
+        -------
+        List[Dict[str,str]]
+            Dropdown options for tests types
+        """
+        if pn and pn in part_dict:
+            test_dd_options = []
+            # get part
+            part = part_dict[pn]
+
+            for test_id in part.tests.index.get_level_values(0).unique():
+                test_dd_options.append(
+                    {
+                        "label": part.tests.loc[test_id]["Test_Name"],
+                        "value": test_id,
+                    }
+                )
+
+            return test_dd_options
+
+        return []
+
+    @app.callback(Output("plot_dd", "options"), [Input("loc_dd", "value")])
+    def get_plot_type(locs: List[str]) -> List[Dict[str, str]]:
+        """Display plot types avaialable.
+
+        Parameters
+        ----------
+        locs: List[str]
+            List of Locations selected
+
+        Returns
+        -------
+        List[Dict[str,str]]
+            Radio options for plot types
+        """
+        if locs:
+            plot_dd_options = []
+            for ptype in plot_types:
+                # Filter Plot Options Based On Maximum # Locations to plot
+                max_locs = plot_types[ptype]["max_locs"]
+
+                if max_locs is None or max_locs >= len(locs):
+                    plot_dd_options.append({"label": ptype, "value": ptype})
+
+            return plot_dd_options
+
+        return []
+
+    @app.callback(
+        Output("cap_dd", "options"),
+        [Input("loc_dd", "value"), Input("plot_dd", "value")],
+    )
+    def get_capability_loc(
+        locs: List[str], ptype: str
+    ) -> List[Dict[str, str]]:
+        """Display plot types avaialable.
+
+        Parameters
+        ----------
+        locs: List[str]
+            List of Locations selected
+        ptype: str
+            Selected plot type
+
+        Returns
+        -------
+        List[Dict[str,str]]
+            Radio options for capability location
+        """
+        if locs and ptype and plot_types[ptype]["capability"]:
+            cap_dd_options = [{"label": "None", "value": "None"}]
+
+            for loc in locs:
+                cap_dd_options.append({"label": loc, "value": loc})
+
+            return cap_dd_options
+
+        return []
+
+    @app.callback(Output("option_dd", "options"), Input("plot_dd", "value"))
+    def get_options(ptype: str) -> List[Dict[str, str]]:
+        """Display plot types avaialable.
+
+        Parameters
+        ptype: str
+            Selected plot type
+
+        Returns
+        -------
+        List[Dict[str,str]]
+            Checklist options for plot options
+        """
+        if ptype and len(plot_types[ptype]["options"]) > 0:
+            option_dd_options = []
+
+            for option in plot_types[ptype]["options"]:
+                print(option)
+                option_dd_options.append({"label": option, "value": option})
+
+            return option_dd_options
+
+        return []
+
+    @app.callback(
+        [
+            Output("page", "data"),
+            Output("page_label", "children"),
+            Output("page_controls", "style"),
+        ],
+        [
+            Input("prev_page", "n_clicks"),
+            Input("next_page", "n_clicks"),
+            Input("part_dd", "value"),
+            Input("plot_dd", "value"),
+            Input("test_dd", "value"),
+            Input("data_version", "data"),
+        ],
+        State("page", "data"),
+    )
+    def change_page(
+        _prev: Optional[int],
+        _next: Optional[int],
+        pn: str,
+        ptype: str,
+        test_id: Union[List[str], None],
+        _version: int,
+        page: Optional[int],
+    ) -> Tuple[int, str, Dict[str, str]]:
+        """Move between pages of figures.
+
+        A new part, plot type or set of tests goes back to the first
+        page, new data keeps the page the user is on.
+
+        Args:
+            _prev (Optional[int]): Previous button clicks, unused
+            _next (Optional[int]): Next button clicks, unused
+            pn (str): Part Number to plot
+            ptype (str): Type of plot
+            test_id (Union[List[str], None]): Tests to plot
+            _version (int): Data version, unused
+            page (Optional[int]): Page shown
+
+        Returns:
+            Tuple[int, str, Dict[str, str]]: Page to show, page label and
+                style of the page controls, hidden for a single page
+        """
+        if not (pn and ptype and pn in part_dict):
+            return 0, "", {"display": "none"}
+
+        n_pages = page_count(
+            len(selected_tests(part_dict[pn], test_id)),
+            plot_types[ptype].get("page_size"),
+        )
+
+        trigger = dash.callback_context.triggered[0]["prop_id"].split(".")[0]
+        page = page or 0
+        if trigger == "prev_page":
+            page -= 1
+        elif trigger == "next_page":
+            page += 1
+        elif trigger != "data_version":
+            page = 0
+        page = min(max(page, 0), n_pages - 1)
+
+        style = {} if n_pages > 1 else {"display": "none"}
+
+        return page, f" Page {page + 1} of {n_pages} ", style
+
+    # Builds the figures of the next page while the user looks at this one
+    prefetcher = ThreadPoolExecutor(max_workers=1)
+    prefetching: Dict[Tuple[Any, ...], Future] = {}
+
+    def figure_json(key: Tuple[Any, ...]) -> Optional[str]:
+        """Get the JSON of a figure, plotting and caching it if needed.
+
+        Args:
+            key (Tuple[Any, ...]): Part Number, locations, plot type,
+                test, capability location, options and data version
+
+        Returns:
+            Optional[str]: Figure JSON, None if the plot type has no figure
+        """
+        fig_json = figure_cache.get(key)
+        if fig_json is not None:
+            return fig_json
+
+        fig_json = plot_json(part_dict[key[0]], key)
+        if fig_json is not None:
+            figure_cache.put(key, fig_json)
+
+        return fig_json
+
+    def prefetch(keys: List[Tuple[Any, ...]]) -> None:
+        """Plot figures in the background so they are cached when needed.
+
+        Figures queued for an earlier page that have not started are
+        dropped.
+
+        Args:
+            keys (List[Tuple[Any, ...]]): Figures to plot, see figure_json
+        """
+        for key, future in list(prefetching.items()):
+            if key not in keys:
+                future.cancel()
+
+        # Nothing to prefetch in to
+        if not figure_cache.max_bytes:
+            return
+
+        for key in keys:
+            if key in figure_cache or key in prefetching:
+                continue
+
+            prefetching[key] = prefetcher.submit(figure_json, key)
+            prefetching[key].add_done_callback(
+                functools.partial(forget_prefetch, key)
+            )
+
+    def forget_prefetch(key: Tuple[Any, ...], _: Future) -> None:
+        """Drop a figure from the prefetches running once it is done.
+
+        Args:
+            key (Tuple[Any, ...]): Figure, see figure_json
+            _ (Future): Finished prefetch, unused
+        """
+        prefetching.pop(key, None)
+
+    def cached_figures(
+        keys: List[Tuple[Any, ...]],
+    ) -> Tuple[Dict[Tuple[Any, ...], Optional[str]], List[Tuple[Any, ...]]]:
+        """Look figures up in the figure cache.
+
+        Args:
+            keys (List[Tuple[Any, ...]]): Figures wanted, see figure_json
+
+        Returns:
+            Tuple[Dict[Tuple[Any, ...], Optional[str]], List[Tuple[Any, ...]]]:
+                JSON of the figures found, None if the plot failed, and the
+                keys of the figures not found
+        """
+        found: Dict[Tuple[Any, ...], Optional[str]] = {}
+        missing = []
+        for key in keys:
+            if key in figure_cache:
+                found[key] = figure_cache.get(key)
+            if found.get(key) is None:
+                missing.append(key)
+
+        return found, missing
+
+    @app.callback(
+        [
+            Output("fig_container", "children"),
+            Output("job_interval", "disabled"),
+        ],
+        [
+            Input("page", "data"),
+            Input("loc_dd", "value"),
+            Input("cap_dd", "value"),
+            Input("option_dd", "value"),
+            Input("job_interval", "n_intervals"),
+        ],
+        [
+            State("part_dd", "value"),
+            State("plot_dd", "value"),
+            State("test_dd", "value"),
+            State("data_version", "data"),
+            State("session", "data"),
+        ],
+    )
+    def plot_figure(
+        page: int,
+        locs: List[str],
+        capability_loc: Union[str, None],
+        options: Union[List[str], None],
+        _intervals: Optional[int],
+        pn: str,
+        ptype: str,
+        test_id: Union[List[str], None],
+        version: int,
+        session: str,
+    ):
+        """Plot the figures of one page.
+
+        Figures are cached for each test on the inputs, so going back to
+        a selection or adding a test to it only builds the new figures.
+        Once the page is plotted the next page is plotted in the
+        background. The part, plot type and tests come in through the page,
+        which is reset when they change.
+
+        With plot workers the figures not cached are plotted as a job in
+        the worker processes. Until it finishes the page shows its progress
+        and polls with the job interval. A new selection replaces the job,
+        cancelling the figures not started.
+
+        Args:
+            page (int): Page of the tests to plot
+            locs (List[str]): Locations to plot
+            capability_loc (str): Location to calculate cpability for
+            options (List(str)): options selected by the user
+            _intervals (Optional[int]): Job interval count, unused
+            pn (str): Part Number to plot
+            ptype (str): Type of plot
+            test_id (Union[List[str], None]): Tests to plot
+            version (int): data version
+            session (str): id of the browser session
+
+        Returns:
+            Tuple[List[Any], bool]: Elements to display and whether to stop
+                polling for progress
+
+        Raises:
+            PreventUpdate: Polled after the job finished
+        """
+        # Get all inputs first (except test_id as that can be None)
+        if not (locs and pn and ptype and pn in part_dict):
+            if jobs is not None:
+                jobs.cancel(session)
+            return None, True
+
+        # get part
+        part = part_dict[pn]
+
+        # Convert "None" option to NoneType
+        if capability_loc == "None":
+            capability_loc = None
+
+        # handle no options slected case
+        if options is None:
+            options = []
+
+        # Cached per test, so adding a test only plots that one
+        keys = [
+            (
+                pn,
+                tuple(locs),
+                ptype,
+                t_id,
+                capability_loc,
+                tuple(sorted(options)),
+                version,
+            )
+            for t_id in selected_tests(part, test_id)
+        ]
+        page_size = plot_types[ptype].get("page_size") or len(keys)
+        start = (page or 0) * page_size
+        stop = start + page_size
+
+        if jobs is None:
+            figures: List[Optional[str]] = []
+            for key in keys[start:stop]:
+                future = prefetching.get(key)
+                if future is not None and not future.cancel():
+                    figures.append(future.result())
+                else:
+                    figures.append(figure_json(key))
+
+            prefetch(keys[stop:][:page_size])
+
+            return figure_elements(figures), True
+
+        trigger = dash.callback_context.triggered[0]["prop_id"]
+        job = jobs.get(session)
+
+        found, missing = cached_figures(keys[start:stop])
+        if job is not None and not job.cancelled:
+            found.update(
+                (key, job.results[key])
+                for key in missing
+                if key in job.results
+            )
+            missing = [key for key in missing if key not in job.results]
+
+        if missing:
+            if (
+                job is None
+                or job.cancelled
+                or not set(missing) <= set(job.keys)
+            ):
+                job = jobs.submit(
+                    session,
+                    {
+                        key: (part.filepath, key, part_kwargs)
+                        for key in missing
+                    },
+                )
+
+            done, total = job.progress
+            return progress_elements(done, total), False
+
+        if trigger == "job_interval.n_intervals" and (
+            job is None or job.cancelled
+        ):
+            raise PreventUpdate
+
+        # Page is ready, plot the next one in the background
+        jobs.cancel(session)
+        if figure_cache.max_bytes:
+            _, next_missing = cached_figures(keys[stop:][:page_size])
+            jobs.submit(
+                (session, "prefetch"),
+                {
+                    key: (part.filepath, key, part_kwargs)
+                    for key in next_missing
+                },
+                keep=False,
+            )
+
+        return figure_elements([found[key] for key in keys[start:stop]]), True
+
+    @app.callback(
+        Output({"type": "spc_graph", "index": MATCH}, "figure"),
+        Input({"type": "spc_graph", "index": MATCH}, "relayoutData"),
+        [
+            State({"type": "spc_graph", "index": MATCH}, "id"),
+            State("part_dd", "value"),
+            State("loc_dd", "value"),
+            State("plot_dd", "value"),
+            State("cap_dd", "value"),
+            State("option_dd", "value"),
+            State("graph_width", "data"),
+        ],
+    )
+    def zoom_figure(
+        relayout: Optional[Dict[str, Any]],
+        graph_id: Dict[str, str],
+        pn: str,
+        locs: List[str],
+        ptype: str,
+        capability_loc: Union[str, None],
+        options: Union[List[str], None],
+        width: Optional[int],
+    ):
+        """Replot a downsampled figure for the SNs in view when zoomed.
+
+        The readings in view are downsampled to the width of the page,
+        with the same again either side of the view plotted so panning
+        shows readings straight away.
+
+        Args:
+            relayout (Optional[Dict[str, Any]]): relayoutData of the graph
+            graph_id (Dict[str, str]): id of the graph, index is the test
+            pn (str): Part Number plotted
+            locs (List[str]): Locations plotted
+            ptype (str): Type of plot
+            capability_loc (str): Location to calculate cpability for
+            options (List(str)): options selected by the user
+            width (Optional[int]): width of the page in pixels
+
+        Returns:
+            Dict[str, Any]: figure of the SNs in view
+
+        Raises:
+            PreventUpdate: not a zoom or the figure is not downsampled
+        """
+        sn_range = zoom_range(relayout)
+
+        if not (locs and pn and ptype and pn in part_dict):
+            raise PreventUpdate
+
+        # Only plot types that downsample have anything more to show
+        if not plot_types[ptype].get("max_points"):
+            raise PreventUpdate
+
+        # Tests that fit in max_points at every location are not
+        # downsampled, so have nothing to replot
+        counts = (
+            part_dict[pn]
+            .stats["count"]
+            .reindex([(loc, graph_id["index"]) for loc in locs])
+        )
+        if not (counts > plot_types[ptype]["max_points"]).any():
+            raise PreventUpdate
+
+        if capability_loc == "None":
+            capability_loc = None
+
+        overscan = plot_types[ptype].get("overscan", 0.0)
+        window_points = None
+        if width and plot_types[ptype].get("points_per_pixel"):
+            window_points = int(
+                width
+                * plot_types[ptype]["points_per_pixel"]
+                * (1 + 2 * overscan)
+            )
+
+        figs = plot_factory(
+            part_dict[pn],
+            ptype,
+            locs,
+            graph_id["index"],
+            capability_loc,
+            options or [],
+            sn_range=sn_range,
+            overscan=overscan,
+            window_points=window_points,
+        )
+
+        for fig in figs.values():
+            if fig is not None and fig.layout["meta"]["downsampled"]:
+                # Keep the zoom box height and the traces hidden
+                if (
+                    sn_range is not None
+                    and relayout is not None
+                    and "yaxis.range[0]" in relayout
+                ):
+                    fig.update_yaxes(
+                        range=[
+                            relayout["yaxis.range[0]"],
+                            relayout["yaxis.range[1]"],
+                        ]
+                    )
+                fig.update_layout(uirevision=f"{pn} {graph_id['index']}")
+
+                return fig.to_dict()
+
+        # All readings are already plotted
+        raise PreventUpdate
+
+    def serve_layout() -> Any:
+        """Layout for a page load, each gets its own session for jobs.
+
+        Returns:
+            Any: Page layout
+        """
+        return html.Div(
+            children=disp_elements
+            + [dcc.Store(id="session", data=uuid.uuid4().hex)]
+        )
+
+    app.layout = serve_layout
+
+    app.run_server(debug=debug)
+
+
+def summary_app(
+    filepath: str,
+    debug: bool = False,
+    workers: int = 1,
+    cache_dir: Optional[str] = None,
+    engine: str = "pandas",
+):
+    """Create a dash app showing the capability summary of every part.
+
+    Args:
+        filepath (str): Directory of data files
+        debug (bool, optional): Run dash in debug mode
+        workers (int, optional): Processes used to read the data files
+        cache_dir (Optional[str], optional): Directory of the parsed data
+            cache, default is to not use a cache
+        engine (str, optional): Excel reader, pandas or streaming
+
+    Raises:
+        FileNotFoundError: No parts in filepath
+    """
+    app = dash.Dash(
+        __name__, external_stylesheets=external_stylesheets, title="SPYC"
+    )
+
+    part_dict = make_parts(
+        filepath, workers=workers, cache_dir=cache_dir, engine=engine
+    )
+
+    if not part_dict:
+        raise FileNotFoundError(f"No Parts generated from dir = {filepath}")
+
+    app.layout = html.Div(
+        children=[html.H1(children="SPYC Capability Summary")]
+        + summary_elements(summary_table(part_dict).to_dict("records"))
+    )
+
+    app.run_server(debug=debug)
+
+
+def summary_table(parts: Dict[str, PartNumber]) -> pd.DataFrame:
+    """Capability of every test at every location of every part.
+
+    Args:
+        parts (Dict[str, PartNumber]): Parts by part number
+
+    Returns:
+        pd.DataFrame: One row per part, location and test, least capable
+            (lowest Cpk) first
+    """
+    if not parts:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+
+    # One concat of the statistics indexes, they already hold capability
+    return (
+        pd.concat(
+            {pn: part.stats for pn, part in parts.items()},
+            names=["Part Number"],
+        )
+        .reset_index()[SUMMARY_COLUMNS]
+        .sort_values("Cpk", na_position="last", kind="stable")
+        .reset_index(drop=True)
+    )
+
+
+def summary_elements(data: Optional[List[Dict[str, Any]]] = None) -> List[Any]:
+    """Elements of the capability summary.
+
+    The table is virtualised so only the rows on screen are drawn, and
+    can be sorted and filtered on any column.
+
+    Args:
+        data (Optional[List[Dict[str, Any]]], optional): Rows of the
+            summary table, default is to fill it from a callback
+
+    Returns:
+        List[Any]: Elements to display
+    """
+    numeric = {"type": "numeric", "format": {"specifier": ".3~f"}}
+
+    return [
+        dash_table.DataTable(
+            id="summary_table",
+            columns=[
+                (
+                    dict(name=column, id=column)
+                    if column in SUMMARY_TEXT_COLUMNS
+                    else dict(name=column, id=column, **numeric)
+                )
+                for column in SUMMARY_COLUMNS
+            ],
+            data=data or [],
+            sort_action="native",
+            filter_action="native",
+            page_action="none",
+            virtualization=True,
+            fixed_rows={"headers": True},
+            style_table={"height": "600px", "overflowY": "auto"},
+            style_cell={"minWidth": "80px", "fontFamily": "Arial"},
+            # Flag incapable and marginal tests
+            style_data_conditional=[
+                {
+                    "if": {"filter_query": "{Cpk} < 1"},
+                    "backgroundColor": "#ffa3af",
+                },
+                {
+                    "if": {"filter_query": "{Cpk} >= 1 && {Cpk} < 1.33"},
+                    "backgroundColor": "#ffd639",
+                },
+            ],
+        )
+    ]
+
+
+def plot_factory(
+    part: PartNumber,
+    plot_type: str,
+    locations: Union[List[str], None],
+    test_id: Union[List[str], str, None],
+    capability_loc: Union[str, None],
+    options: List[str],
+    **kwargs: Any,
+) -> Union[Dict[str, SPCPlot], Dict[None, None]]:
+    """Create plot using parameters from the dash interface.
+
+    Args:
+        part (PartNumber): PartNubmer object to plot for object
+        plot_type (str): Type of plot
+        locations (Union[List[str], None]): List of locations to plot for
+        test_id (Union[List[str], str]): Test_ids to plot for
+        capability_loc (str): Lcoation to calcualte capability for
+        options (List[str]): Options of the plot type selected
+        **kwargs (Any): zoom settings passed to the xbar plot, i.e.
+            sn_range, overscan and window_points
+    """
+    # Select plot type
+    if plot_type == "xbar":
+
+        # Plots for all sites all tests,
+        # calculate capability for Portland
+        return part.xbar(
+            location=locations,
+            test_id=test_id,
+            capability_loc=capability_loc,
+            meanline="meanline" in options,
+            violin="violin" in options,
+            webgl_threshold=plot_types[plot_type].get("webgl_threshold"),
+            max_points=plot_types[plot_type].get("max_points"),
+            downsampler=plot_types[plot_type].get("downsampler", "lttb"),
+            rules=(
+                plot_types[plot_type].get("rules", "western_electric")
+                if "rules" in options
+                else None
+            ),
+            figure_class=SPCDictFigure,
+            **kwargs,
+        )
+    elif plot_type == "imr":
+
+        # I and MR charts for each location, limits are shared by the part
+        return part.imr(
+            location=locations,
+            test_id=test_id,
+            capability_loc=capability_loc,
+            spec_limits="spec_limits" in options,
+            rules=(
+                plot_types[plot_type].get("rules", "western_electric")
+                if "rules" in options
+                else None
+            ),
+            webgl_threshold=plot_types[plot_type].get("webgl_threshold"),
+            figure_class=SPCDictFigure,
+        )
+    else:
+        return {None: None}
+
+
+def plot_json(part: PartNumber, key: Tuple[Any, ...]) -> Optional[str]:
+    """Plot one figure of the dash app and serialise it.
+
+    Args:
+        part (PartNumber): Part to plot
+        key (Tuple[Any, ...]): Part Number, locations, plot type, test,
+            capability location, options and data version
+
+    Returns:
+        Optional[str]: Figure JSON, None if the plot type has no figure
+    """
+    pn, locs, ptype, t_id, capability_loc, options, _ = key
+
+    figs = plot_factory(
+        part, ptype, list(locs), t_id, capability_loc, list(options)
+    )
+    fig = next(iter(figs.values()), None)
+    if fig is None:
+        return None
+
+    # Same as zoom_figure so hidden traces stay hidden
+    fig.update_layout(uirevision=f"{pn} {t_id}")
+
+    return fig.to_json()
+
+
+# Parts read by a plot worker process, key is the data file, least
+# recently plotted first
+worker_parts: "OrderedDict[str, Tuple[int, PartNumber]]" = OrderedDict()
+
+
+def init_plot_worker(max_loaded: Optional[int]) -> None:
+    """Set up a plot worker process.
+
+    Args:
+        max_loaded (Optional[int]): Parts the worker keeps, default is
+            no limit
+    """
+    PartNumber.max_resident = max_loaded
+    worker_parts.clear()
+
+
+def plot_task(
+    filepath: str, key: Tuple[Any, ...], part_kwargs: Dict[str, Any]
+) -> Optional[str]:
+    """Plot one figure in a plot worker process.
+
+    Parts are read lazily the first time they are plotted, and again
+    when the data version in key changes, i.e. the data file was updated.
+    The worker keeps the max_loaded parts it plotted most recently.
+
+    Args:
+        filepath (str): Data file of the part
+        key (Tuple[Any, ...]): Figure to plot, see plot_json
+        part_kwargs (Dict[str, Any]): Passed to PartNumber
+
+    Returns:
+        Optional[str]: Figure JSON, None if the plot type has no figure
+    """
+    version = key[-1]
+    if filepath in worker_parts and worker_parts[filepath][0] != version:
+        worker_parts.pop(filepath)[1].unload()
+
+    if filepath not in worker_parts:
+        worker_parts[filepath] = (
+            version,
+            PartNumber(filepath, lazy=True, **part_kwargs),
+        )
+    worker_parts.move_to_end(filepath)
+
+    if PartNumber.max_resident is not None:
+        while len(worker_parts) > max(PartNumber.max_resident, 1):
+            worker_parts.popitem(last=False)[1][1].unload()
+
+    return plot_json(worker_parts[filepath][1], key)
+
+
+def figure_elements(figures: List[Optional[str]]) -> List[Any]:
+    """Graphs to show in the dash app.
+
+    Args:
+        figures (List[Optional[str]]): Figure JSON, None is skipped
+
+    Returns:
+        List[Any]: Elements to display
+    """
+    elements = []
+    shown = [fig for fig in figures if fig is not None]
+    for fig in json.loads(f"[{','.join(shown)}]"):
+        elements.append(
+            dcc.Graph(
+                id={
+                    "type": "spc_graph",
+                    "index": fig["layout"]["meta"]["test_id"],
+                },
+                figure=fig,
+                config={"displaylogo": False},
+            )
+        )
+        elements.append(html.Hr())
+
+    return elements
+
+
+def progress_elements(done: int, total: int) -> List[Any]:
+    """Progress of plotting a page.
+
+    Args:
+        done (int): Figures plotted
+        total (int): Figures to plot
+
+    Returns:
+        List[Any]: Elements to display
+    """
+    return [
+        html.Div(f"Plotting {done} of {total} figures"),
+        html.Progress(value=str(done), max=str(total)),
+    ]
+
+
+def selected_tests(
+    part: PartNumber, test_id: Union[List[str], None]
+) -> List[str]:
+    """Get the tests to plot from the test dropdown.
+
+    Args:
+        part (PartNumber): Part to plot
+        test_id (Union[List[str], None]): Tests selected, blank for all
+
+    Returns:
+        List[str]: Test_IDs to plot, in order
+    """
+    if test_id:
+        return list(test_id)
+
+    return list(part.tests.index.get_level_values(0).unique())
+
+
+def page_count(n_figures: int, page_size: Optional[int]) -> int:
+    """Get the number of pages needed for the figures.
+
+    Args:
+        n_figures (int): Figures to show
+        page_size (Optional[int]): Figures on each page, None for one page
+
+    Returns:
+        int: Number of pages, at least one
+    """
+    if not page_size:
+        return 1
+
+    return max(-(-n_figures // page_size), 1)
+
+
+def zoom_range(
+    relayout: Optional[Dict[str, Any]],
+) -> Optional[Tuple[float, float]]:
+    """Get the x axis range from the relayoutData of a graph.
+
+    Args:
+        relayout (Optional[Dict[str, Any]]): relayoutData of the graph
+
+    Returns:
+        Optional[Tuple[float, float]]: range in view, None when reset to
+            show everything
+
+    Raises:
+        PreventUpdate: the x axis range has not changed
+    """
+    if not relayout:
+        raise PreventUpdate
+
+    if relayout.get("xaxis.autorange"):
+        return None
+
+    if "xaxis.range[0]" in relayout and "xaxis.range[1]" in relayout:
+        return relayout["xaxis.range[0]"], relayout["xaxis.range[1]"]
+
+    if "xaxis.range" in relayout:
+        start, stop = relayout["xaxis.range"]
+        return start, stop
+
+    raise PreventUpdate
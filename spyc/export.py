@@ -0,0 +1,242 @@
+"""Export xbar charts of every part to files, i.e. for nightly SPC packs.
+
+Every test of every part is plotted at each location on its own, with
+the capability at that location, and written to
+<out>/<Part Number>/<location>/<Test_ID>.<format>. Parts are exported in
+parallel, one part per process.
+
+HTML files all load one copy of plotly.js written to <out>, PNG and SVG
+are rendered locally by kaleido.
+"""
+
+# Imports
+
+import os
+import re
+import logging
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterable, Optional, Callable, Tuple
+
+import plotly.io as pio  # type: ignore
+import plotly.offline  # type: ignore
+
+from .app import make_parts, plot_factory
+from .helpers.partnumber import PartNumber
+
+# create logger
+log = logging.getLogger(__name__)
+
+# Formats export can write
+FORMATS = ["html", "png", "svg"]
+
+# Shared by every HTML file in the output directory
+PLOTLY_JS = "plotly.min.js"
+
+
+def export_parts(
+    filepath: str,
+    out: str,
+    formats: Iterable[str] = ("html",),
+    options: Iterable[str] = (),
+    workers: int = 1,
+    cache_dir: Optional[str] = None,
+    engine: str = "pandas",
+) -> int:
+    """Export every part in a directory.
+
+    Args:
+        filepath (str): Directory of data files
+        out (str): Directory to write the files to
+        formats (Iterable[str], optional): html, png and/or svg
+        options (Iterable[str], optional): xbar options, i.e. meanline
+        workers (int, optional): Processes exporting parts, 0 to use all
+            CPUs
+        cache_dir (Optional[str], optional): Directory of the parsed data
+            cache, default is to not use a cache
+        engine (str, optional): Excel reader, pandas or streaming
+
+    Returns:
+        int: Number of files written
+
+    Raises:
+        ValueError: Unknown format or kaleido is needed and not installed
+        FileNotFoundError: No parts in filepath
+    """
+    formats = list(formats)
+    unknown = [fmt for fmt in formats if fmt not in FORMATS]
+    if unknown:
+        raise ValueError(f"Unknown formats {unknown}, expected {FORMATS}")
+
+    if set(formats) - {"html"} and importlib.util.find_spec("kaleido") is None:
+        raise ValueError(
+            "png and svg export needs kaleido, install spyc[export]"
+        )
+
+    # Only the headers, each process reads the parts it exports
+    parts = make_parts(filepath, cache_dir=cache_dir, lazy=True, engine=engine)
+    if not parts:
+        raise FileNotFoundError(f"No Parts generated from dir = {filepath}")
+
+    os.makedirs(out, exist_ok=True)
+    if "html" in formats:
+        write_plotly_js(out)
+
+    part_kwargs: Dict[str, Any] = dict(cache_dir=cache_dir, engine=engine)
+    args = [
+        (part.filepath, out, formats, list(options), part_kwargs)
+        for part in parts.values()
+    ]
+
+    written = sum(
+        len(files) for files in map_parts(export_part, args, workers)
+    )
+
+    log.info(f"Exported {written} files from {len(parts)} parts to {out}")
+
+    return written
+
+
+def export_part(
+    data_file: str,
+    out: str,
+    formats: List[str],
+    options: List[str],
+    part_kwargs: Dict[str, Any],
+) -> List[str]:
+    """Export every test of a part at each of its locations.
+
+    Args:
+        data_file (str): Data file of the part
+        out (str): Directory to write the files to
+        formats (List[str]): html, png and/or svg
+        options (List[str]): xbar options, i.e. meanline
+        part_kwargs (Dict[str, Any]): Passed to PartNumber
+
+    Returns:
+        List[str]: Files written
+    """
+    part = PartNumber(data_file, **part_kwargs)
+    pn = part.header["Part Number"]
+
+    files = []
+    for location in part.data:
+        figs = plot_factory(part, "xbar", [location], None, location, options)
+
+        for fig in figs.values():
+            if fig is None:
+                continue
+
+            fig_dict = fig.to_dict()
+            test_id = fig_dict["layout"]["meta"]["test_id"]
+
+            for fmt in formats:
+                path = figure_path(out, pn, location, test_id, fmt)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+
+                if fmt == "html":
+                    write_html(fig_dict, path, os.path.join(out, PLOTLY_JS))
+                else:
+                    pio.write_image(fig_dict, path, format=fmt, validate=False)
+
+                files.append(path)
+
+        log.info(f"Exported {pn} @ {location}, {len(figs)} tests")
+
+    part.unload()
+
+    return files
+
+
+def map_parts(
+    fn: Callable[..., Any], args: List[Tuple[Any, ...]], workers: int
+) -> List[Any]:
+    """Run a function for each part, in a pool of processes.
+
+    Args:
+        fn (Callable[..., Any]): Function to run, i.e. export_part
+        args (List[Tuple[Any, ...]]): Arguments for each part
+        workers (int): Processes to use, 0 to use all CPUs and 1 to run
+            in this process
+
+    Returns:
+        List[Any]: Result for each part, in order
+    """
+    if workers < 1:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(args))
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(fn, *zip(*args)))
+
+    return [fn(*part_args) for part_args in args]
+
+
+def write_plotly_js(out: str) -> str:
+    """Write the copy of plotly.js shared by the HTML in a directory.
+
+    Args:
+        out (str): Output directory
+
+    Returns:
+        str: Path of plotly.js
+    """
+    path = os.path.join(out, PLOTLY_JS)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(plotly.offline.get_plotlyjs())
+
+    return path
+
+
+def write_html(fig: Dict[str, Any], path: str, plotly_js: str) -> None:
+    """Write a figure as HTML loading a shared copy of plotly.js.
+
+    Args:
+        fig (Dict[str, Any]): Figure
+        path (str): HTML file to write
+        plotly_js (str): plotly.js file the HTML loads
+    """
+    src = os.path.relpath(plotly_js, os.path.dirname(path))
+
+    html = pio.to_html(
+        fig,
+        include_plotlyjs=src.replace(os.sep, "/"),
+        validate=False,
+        config={"displaylogo": False},
+    )
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(html)
+
+
+def figure_path(
+    out: str, pn: str, location: str, test_id: str, fmt: str
+) -> str:
+    """Get the file a figure is exported to.
+
+    Args:
+        out (str): Output directory
+        pn (str): Part Number
+        location (str): Location plotted
+        test_id (str): Test plotted
+        fmt (str): html, png or svg
+
+    Returns:
+        str: Path of the file
+    """
+    return os.path.join(
+        out, safe_name(pn), safe_name(location), f"{safe_name(test_id)}.{fmt}"
+    )
+
+
+def safe_name(name: Any) -> str:
+    """Make a name safe to use as a file name.
+
+    Args:
+        name (Any): Part number, location or test
+
+    Returns:
+        str: name with anything but letters, numbers, -, . and _ as _
+    """
+    return re.sub(r"[^\w.-]", "_", str(name))
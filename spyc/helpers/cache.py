@@ -0,0 +1,327 @@
+"""On disk cache of parsed data files.
+
+Parsing a workbook with openpyxl is slow, so once a file has been read the
+header, test list and location sheets are stored as feather files. The
+next time the same, unchanged, file is requested the frames are read back
+from the cache instead.
+"""
+
+# Imports
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+from typing import Dict, Optional, Any
+import pandas as pd  # type: ignore
+from .readers import Frames
+
+# Bump when the layout of the cache changes so old entries are ignored
+CACHE_VERSION = 1
+
+
+class PartCache:
+    """Cache of parsed data files in a directory.
+
+    Every data file gets its own folder, named from a hash of its absolute
+    path, holding a feather file for the header, the test list and each
+    location plus a meta.json describing the source file.
+
+    An entry is valid when the size and mtime of the source match, or when
+    they do not but the content hash does (e.g. the file was copied or
+    touched without being changed).
+
+    Attributes
+    ----------
+    cache_dir : str
+        directory holding the cache entries
+    log : logging.Logger
+        logging object
+    """
+
+    def __init__(self, cache_dir: str) -> None:
+        """Set up the cache directory.
+
+        Parameters
+        ----------
+        cache_dir : str
+            directory to hold the cache, created if missing
+        """
+        self.log: logging.Logger = logging.getLogger(__name__)
+
+        self.cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def __repr__(self) -> str:
+        """Override the __repr__ function with a friendly output.
+
+        Returns
+        -------
+        str
+            String representation of the cache
+        """
+        return f"PartCache: {self.cache_dir}"
+
+    def entry_dir(self, filepath: str) -> str:
+        """Get the folder used to cache a data file.
+
+        Parameters
+        ----------
+        filepath : str
+            path to the data file
+
+        Returns
+        -------
+        str
+            path of the cache entry
+        """
+        key = hashlib.sha1(
+            os.path.abspath(filepath).encode("utf-8")
+        ).hexdigest()
+
+        return os.path.join(self.cache_dir, key)
+
+    @staticmethod
+    def file_hash(filepath: str) -> str:
+        """Hash the content of a file.
+
+        Parameters
+        ----------
+        filepath : str
+            file to hash
+
+        Returns
+        -------
+        str
+            sha256 hex digest of the file
+        """
+        digest = hashlib.sha256()
+        with open(filepath, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+
+        return digest.hexdigest()
+
+    @staticmethod
+    def fingerprint(filepath: str) -> Dict[str, Any]:
+        """Get the size, mtime and content hash of a data file.
+
+        Taken before the file is read, so an entry is never newer than
+        the data stored in it.
+
+        Parameters
+        ----------
+        filepath : str
+            path to the data file
+
+        Returns
+        -------
+        Dict[str, Any]
+            size, mtime (ns) and hash of the file
+        """
+        stat = os.stat(filepath)
+
+        return {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "hash": PartCache.file_hash(filepath),
+        }
+
+    def check(self, filepath: str) -> Optional[Dict[str, Any]]:
+        """Check if a data file has a valid cache entry.
+
+        Parameters
+        ----------
+        filepath : str
+            path to the data file
+
+        Returns
+        -------
+        Optional[Dict[str, Any]]
+            meta data of the entry or None if the file is not cached
+            or has changed
+        """
+        entry = self.entry_dir(filepath)
+        meta = self.read_meta(entry)
+
+        if meta is None or meta["version"] != CACHE_VERSION:
+            self.log.debug(f"{filepath} not in cache")
+            return None
+
+        stat = os.stat(filepath)
+        if meta["size"] != stat.st_size:
+            self.log.debug(f"{filepath} size changed, cache is stale")
+            return None
+
+        if meta["mtime"] != stat.st_mtime_ns:
+            # Touched or copied, only stale if the content is different
+            if meta["hash"] != PartCache.file_hash(filepath):
+                self.log.debug(f"{filepath} content changed, cache is stale")
+                return None
+
+            meta["mtime"] = stat.st_mtime_ns
+            self.write_meta(entry, meta)
+
+        return meta
+
+    def load_header(self, filepath: str) -> Optional[Dict[str, Any]]:
+        """Read only the header of a data file from the cache.
+
+        Parameters
+        ----------
+        filepath : str
+            path to the data file
+
+        Returns
+        -------
+        Optional[Dict[str, Any]]
+            header infomation or None if the file is not cached
+            or has changed
+        """
+        if self.check(filepath) is None:
+            return None
+
+        try:
+            header = pd.read_feather(
+                os.path.join(self.entry_dir(filepath), "header.feather")
+            )
+        except (OSError, ImportError) as e:
+            self.log.warning(f"Cache entry for {filepath} unreadable\n{e}")
+            return None
+
+        return header.iloc[0].to_dict()
+
+    def load(self, filepath: str) -> Optional[Frames]:
+        """Read a data file from the cache.
+
+        Parameters
+        ----------
+        filepath : str
+            path to the data file
+
+        Returns
+        -------
+        Optional[Frames]
+            header, tests and data as PartNumber would read them
+            or None if the file is not cached or has changed
+        """
+        meta = self.check(filepath)
+
+        if meta is None:
+            return None
+
+        entry = self.entry_dir(filepath)
+
+        try:
+            header = pd.read_feather(os.path.join(entry, "header.feather"))
+            tests = pd.read_feather(
+                os.path.join(entry, "tests.feather")
+            ).set_index("Test_ID")
+
+            data = {}
+            for i, location in enumerate(meta["locations"]):
+                data[location] = pd.read_feather(
+                    os.path.join(entry, f"loc_{i}.feather")
+                ).set_index(["Test_ID", "Unit SN"])
+
+        except (OSError, ImportError, KeyError) as e:
+            self.log.warning(f"Cache entry for {filepath} unreadable\n{e}")
+            return None
+
+        self.log.debug(f"{filepath} read from cache")
+
+        return header.iloc[0].to_dict(), tests, data
+
+    def store(
+        self,
+        filepath: str,
+        header: Dict[str, Any],
+        tests: pd.DataFrame,
+        data: Dict[str, pd.DataFrame],
+        fingerprint: Dict[str, Any],
+    ) -> None:
+        """Write a parsed data file to the cache.
+
+        Failures are logged and otherwise ignored, the cache is only ever
+        a speed up. If the file changed while it was read the entry is
+        stale straight away, as the fingerprint is of the file read.
+
+        Parameters
+        ----------
+        filepath : str
+            path to the data file
+        header : Dict[str, Any]
+            header infomation
+        tests : pd.DataFrame
+            test list indexed by Test_ID
+        data : Dict[str, pd.DataFrame]
+            location data indexed by Test_ID and Unit SN
+        fingerprint : Dict[str, Any]
+            fingerprint of the file taken before it was read
+        """
+        entry = self.entry_dir(filepath)
+
+        try:
+            meta = {
+                "version": CACHE_VERSION,
+                "path": os.path.abspath(filepath),
+                **fingerprint,
+                "locations": list(data.keys()),
+            }
+
+            # Clear out the old entry, meta.json is written last so a
+            # partly written entry is never read
+            shutil.rmtree(entry, ignore_errors=True)
+            os.makedirs(entry)
+
+            pd.DataFrame([header]).to_feather(
+                os.path.join(entry, "header.feather")
+            )
+            tests.reset_index().to_feather(
+                os.path.join(entry, "tests.feather")
+            )
+            for i, frame in enumerate(data.values()):
+                frame.reset_index().to_feather(
+                    os.path.join(entry, f"loc_{i}.feather")
+                )
+
+            self.write_meta(entry, meta)
+            self.log.debug(f"{filepath} written to cache")
+
+        except (OSError, ImportError, ValueError) as e:
+            self.log.warning(f"Failed to cache {filepath}\n{e}")
+
+    @staticmethod
+    def read_meta(entry: str) -> Optional[Dict[str, Any]]:
+        """Read the meta data for a cache entry.
+
+        Parameters
+        ----------
+        entry : str
+            cache entry folder
+
+        Returns
+        -------
+        Optional[Dict[str, Any]]
+            meta data, None if missing or unreadable
+        """
+        try:
+            with open(os.path.join(entry, "meta.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def write_meta(entry: str, meta: Dict[str, Any]) -> None:
+        """Write the meta data for a cache entry.
+
+        Parameters
+        ----------
+        entry : str
+            cache entry folder
+        meta : Dict[str, Any]
+            meta data
+        """
+        with open(os.path.join(entry, "meta.json"), "w") as f:
+            json.dump(meta, f)
@@ -0,0 +1,204 @@
+"""Process capability of every test at every location at once.
+
+Statistics are calculated with a groupby on the Test_ID level of the
+location data, so one pass over the readings covers every test, and the
+capability indices are then worked out for all tests together:
+
+    * Cpl = (mean - LSL) / 3 SD
+    * Cpu = (USL - mean) / 3 SD
+    * Cpk = min(Cpl, Cpu)
+    * Cp = (USL - LSL) / 6 SD
+
+An index that needs a limit which is not set (blank in the test list) is
+NaN, Cpk falls back to whichever of Cpl and Cpu is set.
+
+Control limits for individuals and moving range (I-MR) charts come from
+the average moving range (MR) of consecutive readings of each test:
+
+    * sigma = MR / d2
+    * I chart, mean -/+ 3 sigma
+    * MR chart, 0 to D4 MR
+"""
+
+# Imports
+
+from typing import Dict
+import pandas as pd  # type: ignore
+import numpy as np
+
+# I-MR chart constants for a moving range of 2 readings
+D2 = 1.128
+D4 = 3.267
+
+# Columns of capability_table
+CAPABILITY_COLUMNS = [
+    "Location",
+    "Test_ID",
+    "Test_Name",
+    "count",
+    "mean",
+    "SD",
+    "LSL",
+    "USL",
+    "Cp",
+    "Cpk",
+    "Cpl",
+    "Cpu",
+]
+
+
+def stats_from_moments(moments: pd.DataFrame) -> pd.DataFrame:
+    """Get the count, mean and sample SD from test moments.
+
+    Parameters
+    ----------
+    moments : pd.DataFrame
+        count, mean and m2 indexed by Test_ID, see PartNumber.test_moments
+
+    Returns
+    -------
+    pd.DataFrame
+        count, mean and SD indexed by Test_ID, followed by min, max and
+        oot when they are in moments
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sd = np.sqrt(moments["m2"] / (moments["count"] - 1))
+
+    stats = pd.DataFrame(
+        {
+            "count": moments["count"],
+            "mean": moments["mean"],
+            "SD": sd.where(moments["count"] > 1),
+        }
+    )
+    for column in ("min", "max", "oot"):
+        if column in moments:
+            stats[column] = moments[column]
+
+    return stats
+
+
+def capability(stats: pd.DataFrame, tests: pd.DataFrame) -> pd.DataFrame:
+    """Add the limits and capability indices to test statistics.
+
+    Parameters
+    ----------
+    stats : pd.DataFrame
+        count, mean and SD indexed by Test_ID
+    tests : pd.DataFrame
+        test list indexed by Test_ID
+
+    Returns
+    -------
+    pd.DataFrame
+        stats with LSL, USL, Cp, Cpk, Cpl and Cpu columns added
+    """
+    limits = tests.reindex(stats.index)
+    lsl = limits["Min_Tol"].astype(float)
+    usl = limits["Max_Tol"].astype(float)
+    mean = stats["mean"].astype(float)
+    sd = stats["SD"].astype(float)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cpl = (mean - lsl) / (3 * sd)
+        cpu = (usl - mean) / (3 * sd)
+        cp = (usl - lsl) / (6 * sd)
+
+    result = stats.copy()
+    result["LSL"] = lsl
+    result["USL"] = usl
+    result["Cp"] = cp
+    # fmin ignores a NaN index, i.e. single sided limits
+    result["Cpk"] = np.fmin(cpl, cpu)
+    result["Cpl"] = cpl
+    result["Cpu"] = cpu
+
+    return result
+
+
+def capability_table(
+    stats: Dict[str, pd.DataFrame], tests: pd.DataFrame
+) -> pd.DataFrame:
+    """Tidy table of the capability of every test at every location.
+
+    Parameters
+    ----------
+    stats : Dict[str, pd.DataFrame]
+        count, mean and SD indexed by Test_ID, key is location
+    tests : pd.DataFrame
+        test list indexed by Test_ID
+
+    Returns
+    -------
+    pd.DataFrame
+        one row per location and test, columns are CAPABILITY_COLUMNS
+        with any other columns of stats after the SD
+    """
+    frames = []
+    for location, loc_stats in stats.items():
+        frame = capability(loc_stats, tests)
+        frame["Test_Name"] = tests["Test_Name"].reindex(frame.index)
+        frame["Location"] = location
+        frames.append(frame.rename_axis("Test_ID").reset_index())
+
+    if not frames:
+        return pd.DataFrame(columns=CAPABILITY_COLUMNS)
+
+    table = pd.concat(frames, ignore_index=True)
+    extra = [column for column in table if column not in CAPABILITY_COLUMNS]
+    split = CAPABILITY_COLUMNS.index("SD") + 1
+
+    return table[
+        CAPABILITY_COLUMNS[:split] + extra + CAPABILITY_COLUMNS[split:]
+    ]
+
+
+def control_limits(dataset: pd.DataFrame) -> pd.DataFrame:
+    """Get the I-MR control limits of every test at one location.
+
+    Moving ranges are the np.diff of the readings of all tests at once,
+    ranges between two tests are dropped. Blank readings are skipped.
+
+    Parameters
+    ----------
+    dataset : pd.DataFrame
+        single location indexed by Test_ID and Unit SN, readings of each
+        test in the order they were taken
+
+    Returns
+    -------
+    pd.DataFrame
+        mean, MR (average moving range), sigma, I_LCL, I_UCL and MR_UCL
+        indexed by Test_ID
+    """
+    codes, test_ids = pd.factorize(dataset.index.get_level_values("Test_ID"))
+    order = np.argsort(codes, kind="stable")
+    codes = codes[order]
+    readings = dataset["Reading"].to_numpy(dtype=float)[order]
+
+    valid = ~np.isnan(readings)
+    codes, readings = codes[valid], readings[valid]
+
+    # Moving range of each reading to the next of the same test
+    ranges = np.abs(np.diff(readings))
+    same = codes[1:] == codes[:-1]
+
+    n = len(test_ids)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.bincount(codes, readings, n) / np.bincount(codes, None, n)
+        mr = np.bincount(codes[1:][same], ranges[same], n) / np.bincount(
+            codes[1:][same], None, n
+        )
+    sigma = mr / D2
+
+    return pd.DataFrame(
+        {
+            "mean": mean,
+            "MR": mr,
+            "sigma": sigma,
+            "I_LCL": mean - 3 * sigma,
+            "I_UCL": mean + 3 * sigma,
+            "MR_UCL": D4 * mr,
+        },
+        index=pd.Index(test_ids, name="Test_ID"),
+    )
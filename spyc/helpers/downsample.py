@@ -0,0 +1,248 @@
+"""Reduce xbar traces to a point budget before they are sent to the browser.
+
+Readings are plotted against their position in the order of the serial
+numbers, so every location shares one numeric x axis and a zoomed in
+range can be mapped back to the serial numbers in view.
+
+Two reducers are available:
+
+    * lttb, largest triangle three buckets, keeps the visual shape
+    * minmax, the lowest and highest reading in each bucket
+
+Out of tolerance readings are always kept whatever the reducer picks.
+Rule violations are kept in up to half of the points left after them,
+thinned evenly when there are more, so the trace stays within max_points.
+"""
+
+# Imports
+
+import logging
+from typing import Dict, Tuple, Callable, Optional
+import pandas as pd  # type: ignore
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+def sn_order(datasets: Dict[str, pd.DataFrame]) -> pd.Index:
+    """Get the order of serial numbers across locations.
+
+    Parameters
+    ----------
+    datasets : Dict[str, pd.DataFrame]
+        single test for each location, indexed by Unit SN
+
+    Returns
+    -------
+    pd.Index
+        every Unit SN once, in the order first seen
+    """
+    if not datasets:
+        return pd.Index([], name="Unit SN")
+
+    return pd.Index(
+        pd.unique(
+            np.concatenate(
+                [data.index.to_numpy() for data in datasets.values()]
+            )
+        ),
+        name="Unit SN",
+    )
+
+
+def sn_window(
+    positions: np.ndarray,
+    sn_range: Tuple[float, float],
+    overscan: float = 0.0,
+) -> np.ndarray:
+    """Flag the readings inside a range of SN positions.
+
+    Parameters
+    ----------
+    positions : np.ndarray
+        position of each reading on the x axis
+    sn_range : Tuple[float, float]
+        first and last position, i.e. the x axis range of the plot
+    overscan : float, optional
+        widen the range by this fraction of its width on each side, so
+        panning shows readings straight away, by default 0
+
+    Returns
+    -------
+    np.ndarray
+        boolean array, True where the reading is in the range
+    """
+    start, stop = sn_range
+    margin = (stop - start) * overscan
+
+    return (positions >= start - margin) & (positions <= stop + margin)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Pick points with largest triangle three buckets.
+
+    The first and last points are kept, the rest are split in to
+    n_out - 2 buckets and from each the point making the largest triangle
+    with the point picked before and the average of the next bucket.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        positions, ascending
+    y : np.ndarray
+        readings, no NaNs
+    n_out : int
+        points to keep
+
+    Returns
+    -------
+    np.ndarray
+        indices of the points kept, ascending
+    """
+    n = len(y)
+    n_out = max(n_out, 3)
+    if n_out >= n:
+        return np.arange(n)
+
+    # Bucket edges, first and last points are buckets of their own
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+
+    # Average of every bucket, the last point closes the final bucket
+    sums_x = np.add.reduceat(x[1:-1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:-1], edges[:-1] - 1)
+    sizes = np.diff(edges)
+    avg_x = np.append(sums_x / sizes, x[-1])
+    avg_y = np.append(sums_y / sizes, y[-1])
+
+    picked = np.empty(n_out, dtype=np.int64)
+    picked[0] = 0
+    picked[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+
+        # Twice the triangle area, the constant factor does not matter
+        area = np.abs(
+            (x[a] - avg_x[i + 1]) * (y[start:stop] - y[a])
+            - (x[a] - x[start:stop]) * (avg_y[i + 1] - y[a])
+        )
+        a = start + int(np.argmax(area))
+        picked[i + 1] = a
+
+    return picked
+
+
+def min_max(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Pick the lowest and highest reading from each bucket.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        positions, ascending
+    y : np.ndarray
+        readings, no NaNs
+    n_out : int
+        points to keep
+
+    Returns
+    -------
+    np.ndarray
+        indices of the points kept, ascending
+    """
+    n = len(y)
+    n_buckets = n_out // 2
+    if n_out >= n or n_buckets < 1:
+        return np.arange(n)
+
+    edges = np.linspace(0, n, n_buckets + 1).astype(np.int64)
+    bucket = np.repeat(np.arange(n_buckets), np.diff(edges))
+
+    # Sort by bucket then reading, the first and last of each bucket are
+    # its min and max
+    ranked = np.lexsort((y, bucket))
+    picked = np.concatenate([ranked[edges[:-1]], ranked[edges[1:] - 1]])
+
+    return np.unique(picked)
+
+
+DOWNSAMPLERS: Dict[str, Callable[[np.ndarray, np.ndarray, int], np.ndarray]]
+DOWNSAMPLERS = {"lttb": lttb, "minmax": min_max}
+
+
+def downsample(
+    data: pd.DataFrame,
+    positions: np.ndarray,
+    max_points: int,
+    keep: Optional[np.ndarray] = None,
+    method: str = "lttb",
+    prefer: Optional[np.ndarray] = None,
+) -> pd.DataFrame:
+    """Reduce the readings of one location to about max_points.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        single test at one location, indexed by Unit SN and sorted by
+        position
+    positions : np.ndarray
+        position of each reading on the x axis, ascending
+    max_points : int
+        points to keep, more are kept if keep flags more than this
+    keep : Optional[np.ndarray], optional
+        boolean array of readings that must be kept, i.e. out of tolerance
+    method : str, optional
+        name of the reducer in DOWNSAMPLERS, by default "lttb"
+    prefer : Optional[np.ndarray], optional
+        boolean array of readings to keep while they fit in half of the
+        points left after keep, i.e. rule violations
+
+    Returns
+    -------
+    pd.DataFrame
+        the rows of data kept, in the same order
+
+    Raises
+    ------
+    ValueError
+        method is not a known reducer
+    """
+    if method not in DOWNSAMPLERS:
+        raise ValueError(
+            f"Unknown downsample method {method},"
+            f" expected one of {list(DOWNSAMPLERS)}"
+        )
+
+    if len(data) <= max_points:
+        return data
+
+    readings = data["Reading"].to_numpy(dtype=float)
+
+    kept = np.flatnonzero(keep) if keep is not None else np.array([], int)
+    budget = max_points - len(kept)
+
+    if prefer is not None:
+        preferred = np.setdiff1d(np.flatnonzero(prefer), kept)
+        n_preferred = min(len(preferred), max(budget // 2, 0))
+        preferred = preferred[
+            np.linspace(0, len(preferred) - 1, n_preferred).astype(np.int64)
+        ]
+        kept = np.union1d(kept, preferred)
+        budget -= n_preferred
+
+    # Blank readings are not drawn, only reduce the rest. The reducers
+    # keep at least 3 points, too few left is all kept points
+    valid = np.flatnonzero(~np.isnan(readings))
+    picked = np.array([], int)
+    if budget >= 3:
+        picked = valid[
+            DOWNSAMPLERS[method](
+                positions[valid].astype(float), readings[valid], budget
+            )
+        ]
+
+    picked = np.union1d(picked, kept)
+
+    log.debug(f"Downsampled {len(data)} readings to {len(picked)}")
+
+    return data.iloc[picked]
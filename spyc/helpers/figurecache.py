@@ -0,0 +1,149 @@
+"""In memory cache of serialised figures for the dash app.
+
+Building a figure means slicing the data, downsampling and validating
+every trace with plotly, while users often flick back to a selection
+they have just looked at. Figures are kept as JSON, which is compact and
+has a known size, and the least recently used are dropped once the
+cache holds more than its limit.
+"""
+
+# Imports
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+class FigureCache:
+    """Least recently used cache of figure JSON bounded by size.
+
+    Attributes
+    ----------
+    max_bytes : int
+        total size of the JSON held before the oldest entries are dropped
+    size : int
+        total size of the JSON held
+    hits : int
+        lookups that found a figure
+    misses : int
+        lookups that did not
+    log : logging.Logger
+        logging object
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        """Create an empty cache.
+
+        Parameters
+        ----------
+        max_bytes : int
+            total size of the JSON to hold, 0 to cache nothing
+        """
+        self.log: logging.Logger = logging.getLogger(__name__)
+
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        """Override the __repr__ function with a friendly output.
+
+        Returns
+        -------
+        str
+            String representation of the cache
+        """
+        return (
+            f"FigureCache: {len(self._entries)} figures,"
+            f" {self.size / 1e6:.1f}/{self.max_bytes / 1e6:.1f} MB,"
+            f" {self.hits} hits, {self.misses} misses"
+        )
+
+    def __len__(self) -> int:
+        """Get the number of figures held.
+
+        Returns
+        -------
+        int
+            number of figures
+        """
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Check for a figure without counting a hit or miss.
+
+        Parameters
+        ----------
+        key : Hashable
+            inputs the figure was built from
+
+        Returns
+        -------
+        bool
+            True if the figure is cached
+        """
+        return key in self._entries
+
+    def get(self, key: Hashable) -> Optional[str]:
+        """Look up a figure, marking it as most recently used.
+
+        Parameters
+        ----------
+        key : Hashable
+            inputs the figure was built from
+
+        Returns
+        -------
+        Optional[str]
+            figure JSON or None if not cached
+        """
+        with self._lock:
+            value = self._entries.get(key)
+
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+
+        self.log.debug(f"{'Miss' if value is None else 'Hit'}, {self}")
+
+        return value
+
+    def put(self, key: Hashable, value: str) -> None:
+        """Add a figure, dropping the least recently used to make room.
+
+        Figures bigger than the whole cache are not kept.
+
+        Parameters
+        ----------
+        key : Hashable
+            inputs the figure was built from
+        value : str
+            figure JSON
+        """
+        if len(value) > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+
+            self._entries[key] = value
+            self.size += len(value)
+
+            while self.size > self.max_bytes:
+                _, dropped = self._entries.popitem(last=False)
+                self.size -= len(dropped)
+
+    def clear(self) -> None:
+        """Drop every figure, the counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
@@ -0,0 +1,332 @@
+"""Background jobs for the dash app, run on a pool of processes.
+
+A job is a set of keyed tasks, i.e. one figure each, submitted for an
+owner such as a browser session. Each owner has at most one job, so
+submitting a new job cancels the tasks of the last one that have not
+started. Tasks are shared by key, so a job for a figure that is already
+being built (i.e. by a prefetch) waits on that task instead of running
+it again.
+
+Progress is the number of tasks finished, which the page polls for.
+Jobs hold their results until the owner cancels or replaces them, jobs
+of owners that stop polling (i.e. a closed tab) expire after max_idle
+seconds. A job submitted with keep=False, i.e. a prefetch whose results
+only go to on_done, is dropped as soon as it finishes.
+"""
+
+# Imports
+
+import logging
+import functools
+import threading
+import time
+from concurrent.futures import Executor, Future, CancelledError
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class Job:
+    """Tasks submitted together for one owner.
+
+    Attributes
+    ----------
+    keys : List[Hashable]
+        task keys, in order
+    results : Dict[Hashable, Any]
+        result of each task that has finished, None if it failed
+    cancelled : bool
+        True once a newer job replaced this one
+    keep : bool
+        False to drop the job from its queue once every task finished
+    used : float
+        time.monotonic() the job was last submitted or fetched
+    """
+
+    def __init__(self, keys: List[Hashable], keep: bool = True) -> None:
+        """Create a job with no results.
+
+        Parameters
+        ----------
+        keys : List[Hashable]
+            task keys, in order
+        keep : bool, optional
+            False to drop the job once every task finished, by default
+            True
+        """
+        self.keys = keys
+        self.results: Dict[Hashable, Any] = {}
+        self.cancelled = False
+        self.keep = keep
+        self.used = time.monotonic()
+
+    def __repr__(self) -> str:
+        """Override the __repr__ function with a friendly output.
+
+        Returns
+        -------
+        str
+            String representation of the job
+        """
+        done, total = self.progress
+        return f"Job: {done}/{total} tasks"
+
+    @property
+    def progress(self) -> Tuple[int, int]:
+        """Get the tasks finished and the total.
+
+        Returns
+        -------
+        Tuple[int, int]
+            tasks finished, tasks in the job
+        """
+        return len(self.results), len(self.keys)
+
+    @property
+    def done(self) -> bool:
+        """Check every task has finished.
+
+        Returns
+        -------
+        bool
+            True if every task has a result
+        """
+        return len(self.results) == len(self.keys)
+
+
+class JobQueue:
+    """Run jobs of keyed tasks on an executor, one job per owner.
+
+    Attributes
+    ----------
+    executor : Executor
+        pool the tasks are run on, usually a ProcessPoolExecutor
+    fn : Callable[..., Any]
+        function run for each task, must be picklable for processes
+    on_done : Optional[Callable[[Hashable, Any], None]]
+        called with the key and result of each task that succeeds
+    max_idle : float
+        seconds an owner's job is kept without being fetched
+    log : logging.Logger
+        logging object
+    """
+
+    def __init__(
+        self,
+        executor: Executor,
+        fn: Callable[..., Any],
+        on_done: Optional[Callable[[Hashable, Any], None]] = None,
+        max_idle: float = 600.0,
+    ) -> None:
+        """Create a queue with no jobs.
+
+        Parameters
+        ----------
+        executor : Executor
+            pool to run the tasks on
+        fn : Callable[..., Any]
+            function run for each task
+        on_done : Optional[Callable[[Hashable, Any], None]], optional
+            called with the key and result of each task that succeeds,
+            i.e. to cache it
+        max_idle : float, optional
+            seconds an owner's job is kept without being fetched, by
+            default 600
+        """
+        self.log: logging.Logger = logging.getLogger(__name__)
+
+        self.executor = executor
+        self.fn = fn
+        self.on_done = on_done
+        self.max_idle = max_idle
+
+        self._jobs: Dict[Hashable, Job] = {}
+        self._tasks: Dict[Hashable, Future] = {}
+        # Cancelling a task calls _finished straight away, holding the lock
+        self._lock = threading.RLock()
+
+    def __repr__(self) -> str:
+        """Override the __repr__ function with a friendly output.
+
+        Returns
+        -------
+        str
+            String representation of the queue
+        """
+        return f"JobQueue: {len(self._jobs)} jobs, {len(self._tasks)} tasks"
+
+    def submit(
+        self,
+        owner: Hashable,
+        tasks: Dict[Hashable, Tuple[Any, ...]],
+        keep: bool = True,
+    ) -> Job:
+        """Start a job, cancelling the owner's last job.
+
+        Parameters
+        ----------
+        owner : Hashable
+            owner of the job, i.e. a browser session
+        tasks : Dict[Hashable, Tuple[Any, ...]]
+            arguments for fn, key is the task key
+        keep : bool, optional
+            False to drop the job once every task finished, i.e. when
+            only on_done needs the results, by default True
+
+        Returns
+        -------
+        Job
+            the job started
+        """
+        job = Job(list(tasks), keep=keep)
+
+        with self._lock:
+            self._expire()
+
+            old = self._jobs.get(owner)
+            self._jobs[owner] = job
+
+            futures = []
+            for key, args in tasks.items():
+                future = self._tasks.get(key)
+                if future is None or future.cancelled():
+                    future = self.executor.submit(self.fn, *args)
+                    future.add_done_callback(
+                        functools.partial(self._finished, key)
+                    )
+                    self._tasks[key] = future
+                futures.append((key, future))
+
+            if old is not None:
+                self._cancel(old)
+
+        self.log.debug(f"Submitted {job} for {owner}, {self}")
+
+        # Outside the lock, finished futures call back straight away
+        for key, future in futures:
+            future.add_done_callback(
+                functools.partial(self._record, owner, job, key)
+            )
+
+        return job
+
+    def get(self, owner: Hashable) -> Optional[Job]:
+        """Get the owner's current job.
+
+        Parameters
+        ----------
+        owner : Hashable
+            owner of the job
+
+        Returns
+        -------
+        Optional[Job]
+            the job or None if the owner has not submitted one
+        """
+        job = self._jobs.get(owner)
+        if job is not None:
+            job.used = time.monotonic()
+
+        return job
+
+    def cancel(self, owner: Hashable) -> None:
+        """Cancel the owner's job, tasks already running still finish.
+
+        Parameters
+        ----------
+        owner : Hashable
+            owner of the job
+        """
+        with self._lock:
+            job = self._jobs.pop(owner, None)
+            if job is not None:
+                self._cancel(job)
+
+    def shutdown(self) -> None:
+        """Cancel every job and stop the pool."""
+        with self._lock:
+            for job in self._jobs.values():
+                self._cancel(job)
+            self._jobs.clear()
+
+        self.executor.shutdown(wait=False)
+
+    def _expire(self) -> None:
+        """Cancel the jobs of owners that have not fetched them lately.
+
+        Must be called holding the lock.
+        """
+        oldest = time.monotonic() - self.max_idle
+        idle = [
+            owner for owner, job in self._jobs.items() if job.used < oldest
+        ]
+
+        for owner in idle:
+            self.log.debug(f"Expired the job of {owner}")
+            self._cancel(self._jobs.pop(owner))
+
+    def _cancel(self, job: Job) -> None:
+        """Cancel the tasks of a job that no other job needs.
+
+        Must be called holding the lock.
+
+        Parameters
+        ----------
+        job : Job
+            job to cancel
+        """
+        job.cancelled = True
+        needed = {key for other in self._jobs.values() for key in other.keys}
+
+        for key in job.keys:
+            future = self._tasks.get(key)
+            if key not in needed and future is not None and future.cancel():
+                self.log.debug(f"Cancelled task {key}")
+
+    def _finished(self, key: Hashable, future: Future) -> None:
+        """Drop a finished task and pass its result on.
+
+        Parameters
+        ----------
+        key : Hashable
+            task key
+        future : Future
+            the finished task
+        """
+        with self._lock:
+            if self._tasks.get(key) is future:
+                del self._tasks[key]
+
+        if future.cancelled():
+            return
+
+        error = future.exception()
+        if error is not None:
+            self.log.error(f"Task {key} failed - {error}")
+        elif self.on_done is not None:
+            self.on_done(key, future.result())
+
+    def _record(
+        self, owner: Hashable, job: Job, key: Hashable, future: Future
+    ) -> None:
+        """Add the result of a finished task to a job.
+
+        Parameters
+        ----------
+        owner : Hashable
+            owner of the job
+        job : Job
+            job waiting on the task
+        key : Hashable
+            task key
+        future : Future
+            the finished task, None is recorded if it failed or was
+            cancelled
+        """
+        try:
+            job.results[key] = future.result()
+        except (CancelledError, Exception):  # pylint: disable=broad-except
+            job.results[key] = None
+
+        if not job.keep and job.done:
+            with self._lock:
+                if self._jobs.get(owner) is job:
+                    del self._jobs[owner]
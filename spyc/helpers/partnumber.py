@@ -5,24 +5,72 @@ Some basic structure to call on the SPCFigure library etc.
 
 # Imports
 
-import statistics
+import os
 import logging
-from typing import Union, Tuple, Optional, List, Dict, Any
+import threading
+from collections import OrderedDict
+from typing import Union, Tuple, Optional, List, Dict, Any, cast
 import pandas as pd  # type: ignore
 import numpy as np
-from .spcfigure import SPCFigure
+from .spcfigure import SPCPlot, SPCFigure
+from .cache import PartCache
+from .downsample import sn_order, sn_window
+from .capability import (
+    capability_table,
+    control_limits,
+    stats_from_moments,
+)
+from .rules import rule_table
+from .readers import (
+    EXCEL_ENGINES,
+    Mark,
+    StaleMark,
+    read_source,
+    read_header,
+    read_appended,
+)
 
 
 class PartNumber:
     """Object to represent a single part number.
 
     Includes associated test data and methods
-    See "Dummy Data.xlsx" for an example input data file
+    See "Dummy Data.xlsx" for an example input data file, a directory of
+    csv or parquet files (one per sheet) can be used instead
+
+    Lazy parts only read the header when created, tests and data are read
+    the first time they are used. At most max_resident lazy parts keep their
+    data in memory, the least recently used are unloaded beyond that.
+
+    Each part has its own lock, held while it reads its data, so a slow
+    workbook only holds up threads using that part. A part that is busy
+    in another thread is not unloaded, it goes the next time a part loads.
 
     Deleted Attributes
     ------------------
     log : logging:Logger
         logging object
+    filepath : str
+        path the data was read from
+    cache_dir : Optional[str]
+        directory of the parsed data cache
+    lazy : bool
+        only read tests and data when first used
+    engine : str
+        name of the excel reader in EXCEL_ENGINES
+    version : int
+        incremented every time the part is reloaded or updated
+    marks : dict[str, Mark]
+        how far each sheet has been read, used to only read appended rows
+    moments : dict[str, pd.DataFrame]
+        count, mean, sum of squared deviations (m2), min, max and out of
+        tolerance count (oot) of the readings for each test, key is location
+    stats : pd.DataFrame
+        statistics and capability of each test indexed by location and
+        Test_ID, built from moments whenever the data is read or updated
+    limits : pd.DataFrame
+        I-MR control limits of each test indexed by location and Test_ID,
+        built the first time they are used after the data is read
     data : dict[str, pd.Dataframe]
         Dictionary of data frames
         containing raw test data
@@ -32,13 +80,37 @@ class PartNumber:
         Dataframe with test descriptions
     """
 
-    def __init__(self, filepath: str) -> None:
+    # Lazy parts with data in memory, least recently used first
+    resident: "OrderedDict[int, PartNumber]" = OrderedDict()
+    max_resident: Optional[int] = None
+    # Only guards resident, never held while reading a part
+    resident_lock = threading.Lock()
+
+    # Tests kept in sn_positions for each part
+    max_positions = 8
+
+    def __init__(
+        self,
+        filepath: str,
+        cache_dir: Optional[str] = None,
+        lazy: bool = False,
+        engine: str = "pandas",
+    ) -> None:
         """Set up logging and read in data from filepath.
 
         Parameters
         ----------
         filepath : str
-            path to data file
+            path to data file or directory of tables
+        cache_dir : Optional[str], optional
+            directory of the parsed data cache, unchanged xlsx files are read
+            from the cache and others are added to it. Default is no cache
+        lazy : bool, optional
+            only read the header now, tests and data are read when first
+            used. Default is to read everything now
+        engine : str, optional
+            excel reader, "pandas" or "streaming" (openpyxl read only mode,
+            lower memory use for large sheets). Default is "pandas"
 
         Raises
         ------
@@ -48,73 +120,390 @@ class PartNumber:
         # self.log object
         self.log: logging.Logger = logging.getLogger(__name__)
 
-        # Read from excel
-        try:
+        self.filepath = filepath
+        self.cache_dir = cache_dir
+        self.lazy = lazy
+        self._lock = threading.RLock()
 
-            col_dtype = {
-                "Part Number": "string",
-                "Notes": "string",
-                "Test_ID": "string",
-                "Test_Name": "string",
-                "Min_Tol": np.float64,
-                "Max_Tol": np.float64,
-                "Units": "string",
-                "Reading": np.float64,
-                "Unit SN": "string",
-            }
+        if engine not in EXCEL_ENGINES:
+            raise ValueError(
+                f"Unknown engine {engine}, expected one of"
+                f" {list(EXCEL_ENGINES.keys())}"
+            )
+        self.engine = engine
 
-            # Single call to Excel
-            xls = pd.ExcelFile(filepath)
+        self.version = 0
 
-            # Generic header infomation
-            self.header: Dict[str, str] = (
-                pd.read_excel(
-                    xls, sheet_name="Header", header=0, dtype=col_dtype
-                )
-                .iloc[0]
-                .to_dict()
-            )
-            self.log.debug("Header Read")
-            self.log.debug(self.header)
-
-            # Test list
-            self.tests: pd.DataFrame = pd.read_excel(
-                xls, sheet_name="Test_List", header=0, dtype=col_dtype
-            ).set_index("Test_ID")
-            self.log.debug("Test_List Read")
-            self.log.debug(self.tests.head(5))
-
-            # Data from each site. Store in dict with key as sheetname
-            self.data: Dict[str, pd.DataFrame] = {}  # empty dict
-            for sheet_name in xls.sheet_names:
-
-                if sheet_name not in [
-                    "Header",
-                    "Test_List",
-                ]:  # reserved sheet names
-                    try:
-                        self.data[sheet_name] = pd.read_excel(
-                            xls,
-                            sheet_name=sheet_name,
-                            header=0,
-                            dtype=col_dtype,
-                        ).set_index(["Test_ID", "Unit SN"])
-                        self.log.debug(f"{sheet_name} loaded")
-                        self.log.debug(self.data[sheet_name].head(5))
-                    except Exception as e:
-                        self.log.info(f"{sheet_name} failed to load\n{e}")
-
-            # Return an error if no data sheets are loaded
-            if not self.data:
-                raise ValueError(f"No data sheets were read from {filepath}")
-
-            self.log.info(f"{filepath} loaded with {len(self.data)} locations")
-            self.log.debug(f"locations= {list(self.data.keys())}")
+        self.header: Dict[str, str] = {}
+        self._tests: Optional[pd.DataFrame] = None
+        self._data: Optional[Dict[str, pd.DataFrame]] = None
+        self.marks: Dict[str, Mark] = {}
+        self.moments: Dict[str, pd.DataFrame] = {}
+        self._stats: Optional[pd.DataFrame] = None
+        self._limits: Optional[pd.DataFrame] = None
+        self._positions: "OrderedDict[Tuple[Any, ...], Any]" = OrderedDict()
+
+        try:
+            if lazy:
+                self.header = self.read_header()
+                self.log.info(f"{filepath} header loaded")
+            else:
+                self.read()
 
         except ValueError as e:
             self.log.warning(f"{filepath} failed to load\n{e}")
             raise ValueError from e
 
+    @property
+    def tests(self) -> pd.DataFrame:
+        """Dataframe with test descriptions, read if not in memory.
+
+        Returns
+        -------
+        pd.DataFrame
+            test list indexed by Test_ID
+        """
+        if self.lazy:
+            return self.load()[0]
+
+        return self._tests
+
+    @property
+    def data(self) -> Dict[str, pd.DataFrame]:
+        """Dictionary of location data, read if not in memory.
+
+        Returns
+        -------
+        Dict[str, pd.DataFrame]
+            data indexed by Test_ID and Unit SN, key is location
+        """
+        if self.lazy:
+            return self.load()[1]
+
+        return cast(Dict[str, pd.DataFrame], self._data)
+
+    @property
+    def stats(self) -> pd.DataFrame:
+        """Statistics index, read if not in memory.
+
+        Returns
+        -------
+        pd.DataFrame
+            count, mean, SD, min, max, oot, limits, Cp, Cpk, Cpl and Cpu
+            indexed by location and Test_ID
+        """
+        if self.lazy:
+            return self.load()[2]
+
+        return self._stats
+
+    @property
+    def limits(self) -> pd.DataFrame:
+        """I-MR control limits, built the first time they are used.
+
+        Every test at a location is done at once and kept until the data
+        changes, so plotting a test only looks its limits up.
+
+        Returns
+        -------
+        pd.DataFrame
+            mean, MR, sigma, I_LCL, I_UCL and MR_UCL indexed by location
+            and Test_ID
+        """
+        with self._lock:
+            data = self.data
+            if self._limits is None:
+                self._limits = pd.concat(
+                    {
+                        location: control_limits(dataset)
+                        for location, dataset in data.items()
+                    },
+                    names=["Location"],
+                )
+
+            return self._limits
+
+    @property
+    def loaded(self) -> bool:
+        """Check if tests and data are in memory.
+
+        Returns
+        -------
+        bool
+            True if tests and data are in memory
+        """
+        return self._data is not None
+
+    def load(
+        self,
+    ) -> Tuple[pd.DataFrame, Dict[str, pd.DataFrame], pd.DataFrame]:
+        """Read tests and data if they are not in memory.
+
+        Marks the part as most recently used and unloads the least recently
+        used lazy parts if there are more than max_resident in memory.
+
+        Returns
+        -------
+        Tuple[pd.DataFrame, Dict[str, pd.DataFrame], pd.DataFrame]
+            tests, data and stats, still valid if the part is unloaded by
+            another thread
+
+        Raises
+        ------
+        ValueError
+            No data could be read from the file
+        """
+        with self._lock:
+            if not self.loaded:
+                self.log.debug(f"Loading {self.filepath}")
+                try:
+                    self.read()
+                except ValueError as e:
+                    self.log.warning(f"{self.filepath} failed to load\n{e}")
+                    raise ValueError from e
+
+            frames = (
+                self._tests,
+                cast(Dict[str, pd.DataFrame], self._data),
+                self._stats,
+            )
+
+        if self.lazy:
+            self._mark_used()
+
+        return frames
+
+    def _mark_used(self) -> None:
+        """Make the part the most recently used and unload the oldest.
+
+        Parts another thread is using are skipped rather than waited on.
+        """
+        with PartNumber.resident_lock:
+            PartNumber.resident[id(self)] = self
+            PartNumber.resident.move_to_end(id(self))
+
+            if PartNumber.max_resident is None:
+                return
+
+            excess = len(PartNumber.resident) - max(PartNumber.max_resident, 1)
+            oldest = [
+                part
+                for part in PartNumber.resident.values()
+                if part is not self
+            ][: max(excess, 0)]
+
+        for part in oldest:
+            if part._lock.acquire(blocking=False):
+                try:
+                    part._drop()
+                finally:
+                    part._lock.release()
+
+    def unload(self) -> None:
+        """Drop tests and data from memory, lazy parts only."""
+        if not self.lazy:
+            return
+
+        with self._lock:
+            self._drop()
+
+    def _drop(self) -> None:
+        """Drop tests and data, must be called holding the part's lock."""
+        self.log.debug(f"Unloading {self.filepath}")
+        self._tests = None
+        self._data = None
+        self.marks = {}
+        self.moments = {}
+        self._stats = None
+        self._limits = None
+        self._positions.clear()
+
+        with PartNumber.resident_lock:
+            PartNumber.resident.pop(id(self), None)
+
+    def reload(self) -> None:
+        """Read the part again after the data file has changed.
+
+        Lazy parts re-read the header and drop their data, which is read
+        again the next time it is used.
+
+        Raises
+        ------
+        ValueError
+            No data could be read from the file
+        """
+        with self._lock:
+            try:
+                if self.lazy:
+                    self.unload()
+                    self.header = self.read_header()
+                else:
+                    self.read()
+            except ValueError as e:
+                self.log.warning(f"{self.filepath} failed to reload\n{e}")
+                raise ValueError from e
+
+            self.version += 1
+            self.log.info(f"{self.filepath} reloaded")
+
+    def update(self) -> None:
+        """Read rows appended to the location sheets since the last read.
+
+        Only the new rows are read and added to the end of data, with the
+        test moments updated to match. Falls back to reload if anything
+        else in the file has changed or the reader used cannot tell (i.e.
+        the pandas excel engine, the cache or parquet files).
+
+        Raises
+        ------
+        ValueError
+            No data could be read from the file
+        """
+        with self._lock:
+            if not self.loaded:
+                # Nothing in memory to add to
+                self.reload()
+                return
+
+            cache = (
+                PartCache(self.cache_dir)
+                if self.cache_dir and os.path.isfile(self.filepath)
+                else None
+            )
+            fingerprint = (
+                cache.fingerprint(self.filepath) if cache is not None else {}
+            )
+
+            try:
+                appended, marks = read_appended(self.filepath, self.marks)
+            except StaleMark as e:
+                self.log.debug(f"Reading all of {self.filepath}, {e}")
+                self.reload()
+                return
+
+            data = cast(Dict[str, pd.DataFrame], self._data)
+            for location, rows in appended.items():
+                if len(rows) == 0:
+                    continue
+
+                data[location] = pd.concat([data[location], rows])
+                self.moments[location] = PartNumber.merge_moments(
+                    self.moments[location],
+                    PartNumber.test_moments(rows, self._tests),
+                )
+                self.log.info(
+                    f"{self.filepath} {len(rows)} rows added to {location}"
+                )
+
+            self.marks = marks
+            self._stats = self.build_stats()
+            self._limits = None
+            self.version += 1
+
+            if cache is not None:
+                cache.store(
+                    self.filepath, self.header, self._tests, data, fingerprint
+                )
+
+    def read(self) -> None:
+        """Read header, tests and data from the cache or data file.
+
+        Raises
+        ------
+        ValueError
+            No data sheets were read from the file
+        """
+        # Only workbooks are slow enough to be worth caching
+        cache = (
+            PartCache(self.cache_dir)
+            if self.cache_dir and os.path.isfile(self.filepath)
+            else None
+        )
+
+        cached = cache.load(self.filepath) if cache is not None else None
+
+        # Only readers that can read appended rows fill in marks
+        self.marks = {}
+
+        if cached is not None:
+            self.header, self._tests, self._data = cached
+        else:
+            # Before reading, a change while reading leaves the entry stale
+            fingerprint = (
+                cache.fingerprint(self.filepath) if cache is not None else {}
+            )
+            self.header, self._tests, self._data = read_source(
+                self.filepath, self.engine, marks=self.marks
+            )
+
+            if cache is not None and self._data:
+                cache.store(
+                    self.filepath,
+                    self.header,
+                    self._tests,
+                    self._data,
+                    fingerprint,
+                )
+
+        # Return an error if no data sheets are loaded
+        if not self._data:
+            raise ValueError(f"No data sheets were read from {self.filepath}")
+
+        self.moments = {
+            location: PartNumber.test_moments(dataset, self._tests)
+            for location, dataset in self._data.items()
+        }
+        self._stats = self.build_stats()
+        self._limits = None
+
+        self.log.info(
+            f"{self.filepath} loaded with {len(self._data)} locations"
+        )
+        self.log.debug(f"locations= {list(self._data.keys())}")
+
+    def read_header(self) -> Dict[str, str]:
+        """Read only the header from the cache or data file.
+
+        Returns
+        -------
+        Dict[str, str]
+            header infomation
+        """
+        if self.cache_dir and os.path.isfile(self.filepath):
+            header = PartCache(self.cache_dir).load_header(self.filepath)
+            if header is not None:
+                return header
+
+        header = read_header(self.filepath)
+        self.log.debug("Header Read")
+        self.log.debug(header)
+
+        return header
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Leave the lock out when the part is sent to another process.
+
+        Returns
+        -------
+        Dict[str, Any]
+            attributes of the part without the lock
+        """
+        state = self.__dict__.copy()
+        del state["_lock"]
+
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """Restore a part sent from another process with a new lock.
+
+        Parameters
+        ----------
+        state : Dict[str, Any]
+            attributes from __getstate__
+        """
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
     def __repr__(self) -> str:
         """Override the __repr__ function with a friendly output.
 
@@ -123,6 +512,9 @@ class PartNumber:
         str
             String representation of the partnumber object
         """
+        if not self.loaded:
+            return f"PN: {self.header['Part Number']}, not loaded"
+
         return (
             f"PN: {self.header['Part Number']}, locations ="
             f" {list(self.data.keys())}"
@@ -134,7 +526,7 @@ class PartNumber:
         test_id: Optional[Union[str, List[str]]] = None,
         capability_loc: Optional[str] = None,
         **kwargs: Any,
-    ) -> Dict[str, SPCFigure]:
+    ) -> Dict[str, SPCPlot]:
         """Plot an xbar chart (value against SN) using SPCFigure module.
 
         Args:
@@ -149,6 +541,11 @@ class PartNumber:
             violin (bool, optional): Plot a violin for each location
                 off bv default
             to plot data for, default is to plot all locations
+            webgl_threshold (Optional[int], optional): Points in a location
+                above which WebGL is used, default is to always use SVG
+            max_points (Optional[int], optional): Readings plotted per
+                location, the rest are downsampled, default is to plot all
+            downsampler (str, optional): lttb (default) or minmax
         """
         # Dict to hold all plots, title is the key
         figs = {}
@@ -194,7 +591,7 @@ class PartNumber:
         location: Optional[Union[str, List[str]]] = None,
         capability_loc: Optional[str] = None,
         **kwargs: Any,
-    ) -> Tuple[str, SPCFigure]:
+    ) -> Tuple[str, SPCPlot]:
         """Plot an xbar chart (value against SN) for 1 test.
 
         Uses SPCFigure module.
@@ -208,50 +605,30 @@ class PartNumber:
             violin (bool, optional): Plot a violin for each location
                 off bv default
             to plot data for, default is to plot all locations
+            webgl_threshold (Optional[int], optional): Points in a location
+                above which WebGL is used, default is to always use SVG
+            max_points (Optional[int], optional): Readings plotted per
+                location, the rest are downsampled, default is to plot all
+            downsampler (str, optional): lttb (default) or minmax
+            sn_range (Optional[Tuple[float, float]], optional): Only plot
+                SNs at these positions on the x axis, ignored unless the
+                test is downsampled
+            overscan (float, optional): Also plot this fraction of the width
+                of sn_range either side of it, default is 0
+            window_points (Optional[int], optional): Readings plotted per
+                location with sn_range, default is max_points
+            figure_class (type, optional): SPCPlot figure to plot on,
+                default is SPCFigure, SPCDictFigure for the dash app
+            rules (Optional[Union[str, List[str]]], optional): Highlight
+                readings breaking these rules or rule set, i.e.
+                western_electric, default is to not check
         """
         # Enforce string type
         test_id = str(test_id)
 
-        # Get Limits
-        lsl, usl = self.get_limits(test_id)
-
-        # Check if capability is set
-        if capability_loc is not None:
-
-            self.log.debug(
-                f"Calculating capability for {capability_loc}, test {test_id}"
-            )
-
-            # Calcualte cp and cpk for specified location
-            try:
-                cp, cpk = PartNumber.calculate_capability(
-                    PartNumber.extract_test(
-                        self.data[capability_loc], test_id
-                    ),
-                    lsl,
-                    usl,
-                )
-
-                title = (
-                    f"{self.header['Part Number']}  "
-                    f"{self.tests.loc[test_id,'Test_Name']}"
-                    f"  Cp/Cpk={cp:.2f}/{cpk:.2f} @ {capability_loc}"
-                )
-
-            except KeyError as e:
-                self.log.error(f"Invalid capability_loc -\n{e}")
-
-        else:
-            self.log.debug(
-                "Not calculating capability, capability_loc not set"
-            )
-
-            title = (
-                f"{self.header['Part Number']}  "
-                f"{self.tests.loc[test_id,'Test_Name']}"
-            )
+        title = self.plot_title(test_id, capability_loc)
 
-        fig = SPCFigure(title=title)
+        fig = kwargs.get("figure_class", SPCFigure)(title=title)
 
         # if location is none then it is all
         if location is None:
@@ -272,15 +649,247 @@ class PartNumber:
 
         self.log.debug(f"Plotting {len(datasets)} locations")
 
+        # Zoomed in on a downsampled test, only plot the SNs in view
+        max_points = kwargs.get("max_points")
+        sn_range = kwargs.get("sn_range")
+        order, positions = None, None
+        if max_points is not None and any(
+            len(data) > max_points for data in datasets.values()
+        ):
+            order, positions = self.sn_positions(test_id, list(datasets))
+
+            if sn_range is not None:
+                inside = {
+                    loc: sn_window(
+                        loc_positions, sn_range, kwargs.get("overscan", 0.0)
+                    )
+                    for loc, loc_positions in positions.items()
+                }
+                datasets = {
+                    loc: data[inside[loc]] for loc, data in datasets.items()
+                }
+                positions = {
+                    loc: loc_positions[inside[loc]]
+                    for loc, loc_positions in positions.items()
+                }
+                max_points = kwargs.get("window_points") or max_points
+        else:
+            sn_range = None
+
         fig.xbar_plot(
             datasets,
             self.tests.loc[test_id],
             meanline=kwargs.get("meanline", False),
             violin=kwargs.get("violin", False),
+            webgl_threshold=kwargs.get("webgl_threshold"),
+            max_points=max_points,
+            downsampler=kwargs.get("downsampler", "lttb"),
+            sn_order=order,
+            sn_positions=positions,
+            sn_range=sn_range,
+            means={
+                loc: self.stats.loc[(loc, test_id), "mean"] for loc in datasets
+            },
+            rules=kwargs.get("rules"),
+            sds={
+                loc: self.stats.loc[(loc, test_id), "SD"] for loc in datasets
+            },
+        )
+
+        # Let the dash app find the test again when zooming
+        fig.update_layout(
+            meta={"test_id": test_id, "downsampled": order is not None}
+        )
+
+        return title, fig
+
+    def imr(
+        self,
+        location: Optional[Union[str, List[str]]] = None,
+        test_id: Optional[Union[str, List[str]]] = None,
+        capability_loc: Optional[str] = None,
+        **kwargs: Any,
+    ) -> Dict[str, SPCPlot]:
+        """Plot I-MR charts (value and moving range against SN).
+
+        Args:
+            location (Optional[Union[str, list[str]]], optional):
+                Sheetname(s) to plot data for, default is all locations
+            test_id (Optional[Union[str, list[str]]], optional): id of the
+                test(s) in test list to plot, default to plot all tests
+                seperately
+            capability_loc (Optional[str], optional): Sheetname for cp &
+                cpk, default is to not show capability
+            **kwargs (Any): Passed to imr_plot
+
+        Returns:
+            Dict[str, SPCPlot]: Figures, title is the key
+        """
+        if test_id is None:
+            test_id = self.tests.index.get_level_values(0).unique()
+        elif isinstance(test_id, str):
+            test_id = [test_id]
+
+        figs = {}
+        for t_id in test_id:
+            self.log.debug(f"Plotting I-MR, test = {t_id}")
+
+            title, fig = self.imr_plot(
+                str(t_id),
+                location=location,
+                capability_loc=capability_loc,
+                **kwargs,
+            )
+            figs[title] = fig
+
+        return figs
+
+    def imr_plot(
+        self,
+        test_id: str,
+        location: Optional[Union[str, List[str]]] = None,
+        capability_loc: Optional[str] = None,
+        **kwargs: Any,
+    ) -> Tuple[str, SPCPlot]:
+        """Plot an I-MR chart for 1 test, one column per location.
+
+        Control limits come from limits, worked out once for every test.
+
+        Args:
+            test_id (str): id of the test in test list to plot
+            location (Optional[Union[str, list[str]]], optional):
+                Sheetname(s) to plot data for, default is all locations
+            capability_loc (Optional[str], optional): sheetname for cp & cpk
+            spec_limits (bool, optional): Plot the spec limits on the I
+                chart, off by default
+            rules (Optional[Union[str, List[str]]], optional): Highlight
+                readings breaking these rules or rule set, default is to
+                not check
+            webgl_threshold (Optional[int], optional): Points in a location
+                above which WebGL is used, default is to always use SVG
+            figure_class (type, optional): SPCPlot figure to plot on,
+                default is SPCFigure, SPCDictFigure for the dash app
+
+        Returns:
+            Tuple[str, SPCPlot]: Title and figure
+        """
+        test_id = str(test_id)
+
+        title = self.plot_title(test_id, capability_loc)
+        fig = kwargs.get("figure_class", SPCFigure)(title=title)
+
+        if location is None:
+            location = list(self.data.keys())
+        elif isinstance(location, str):
+            location = [location]
+
+        datasets = {
+            loc: PartNumber.extract_test(self.data[loc], test_id)
+            for loc in location
+        }
+
+        fig.imr_plot(
+            datasets,
+            self.tests.loc[test_id],
+            {loc: self.limits.loc[(loc, test_id)] for loc in datasets},
+            spec_limits=kwargs.get("spec_limits", False),
+            rules=kwargs.get("rules"),
+            webgl_threshold=kwargs.get("webgl_threshold"),
         )
 
+        # Let the dash app find the test, I-MR charts are never downsampled
+        fig.update_layout(meta={"test_id": test_id, "downsampled": False})
+
         return title, fig
 
+    def plot_title(
+        self, test_id: str, capability_loc: Optional[str] = None
+    ) -> str:
+        """Title of the plot of a test, with its capability if asked for.
+
+        Args:
+            test_id (str): id of the test in test list
+            capability_loc (Optional[str], optional): sheetname for cp & cpk
+
+        Returns:
+            str: Part Number, Test_Name and Cp/Cpk @ capability_loc
+        """
+        title = (
+            f"{self.header['Part Number']}  "
+            f"{self.tests.loc[test_id,'Test_Name']}"
+        )
+
+        # Check if capability is set
+        if capability_loc is not None:
+
+            self.log.debug(
+                f"Calculating capability for {capability_loc}, test {test_id}"
+            )
+
+            # Calcualte cp and cpk for specified location
+            try:
+                cp, cpk = self.capability(capability_loc, test_id)
+
+                title += f"  Cp/Cpk={cp:.2f}/{cpk:.2f} @ {capability_loc}"
+
+            except KeyError as e:
+                self.log.error(f"Invalid capability_loc -\n{e}")
+
+            except ValueError as e:
+                # No limits, plot the test without its capability
+                self.log.debug(f"No capability for {test_id} - {e}")
+
+        else:
+            self.log.debug(
+                "Not calculating capability, capability_loc not set"
+            )
+
+        return title
+
+    def sn_positions(
+        self, test_id: str, locations: List[str]
+    ) -> Tuple[pd.Index, Dict[str, np.ndarray]]:
+        """Get the position of each reading on a downsampled x axis.
+
+        Positions are kept for the last few tests plotted, so zooming and
+        panning do not look every SN up again.
+
+        Args:
+            test_id (str): id of the test in test list
+            locations (List[str]): Sheetnames plotted
+
+        Returns:
+            Tuple[pd.Index, Dict[str, np.ndarray]]: Order of Unit SN across
+                the locations and the position of each reading in it, key
+                is location
+        """
+        key = (self.version, test_id, tuple(locations))
+
+        with self._lock:
+            if key in self._positions:
+                self._positions.move_to_end(key)
+                return self._positions[key]
+
+        datasets = {
+            loc: PartNumber.extract_test(self.data[loc], test_id)
+            for loc in locations
+        }
+        order = sn_order(datasets)
+        positions = (
+            order,
+            {
+                loc: order.get_indexer(data.index)
+                for loc, data in datasets.items()
+            },
+        )
+
+        with self._lock:
+            self._positions[key] = positions
+            while len(self._positions) > PartNumber.max_positions:
+                self._positions.popitem(last=False)
+
+        return positions
+
     def get_limits(self, test_id: str) -> Tuple[float, float]:
         """Get upper and lower spec limits.
 
@@ -300,6 +909,101 @@ class PartNumber:
 
         return lsl, usl
 
+    def capability(self, location: str, test_id: str) -> Tuple[float, float]:
+        """Look up the capability of one test at one location.
+
+        Args:
+            location (str): Sheetname to calculate for
+            test_id (str): Test id in test list
+
+        Returns:
+            Tuple[float, float]: Cp, Cpk
+
+        Raises:
+            ValueError: Neither limit is set
+        """
+        stats = self.stats.loc[(location, test_id)]
+
+        if np.isnan(stats["LSL"]) and np.isnan(stats["USL"]):
+            self.log.error("Neither Min_Tol or Max_Tol is set")
+            raise ValueError("Neither Min_Tol or Max_Tol is set")
+
+        return stats["Cp"], stats["Cpk"]
+
+    def capability_table(
+        self, location: Optional[Union[str, List[str]]] = None
+    ) -> pd.DataFrame:
+        """Capability of every test at each location.
+
+        Args:
+            location (Optional[Union[str, List[str]]], optional):
+                Sheetname(s), default is all locations
+
+        Returns:
+            pd.DataFrame: One row per location and test with the count,
+                mean, SD, min, max, oot, limits, Cp, Cpk, Cpl and Cpu
+        """
+        table = self.stats.reset_index()
+
+        if location is None:
+            return table
+        if isinstance(location, str):
+            location = [location]
+
+        return table[table["Location"].isin(location)].reset_index(drop=True)
+
+    def rule_table(
+        self,
+        rules: Union[str, List[str]] = "western_electric",
+        location: Optional[Union[str, List[str]]] = None,
+    ) -> pd.DataFrame:
+        """Count the readings breaking control chart rules.
+
+        Every test at a location is checked in one pass against its mean
+        and SD in stats, see rules.py.
+
+        Args:
+            rules (Union[str, List[str]], optional): Rule set or rules,
+                default is western_electric
+            location (Optional[Union[str, List[str]]], optional):
+                Sheetname(s), default is all locations
+
+        Returns:
+            pd.DataFrame: One row per location and test with the readings
+                breaking each rule and any rule (violations)
+        """
+        if location is None:
+            location = list(self.data.keys())
+        elif isinstance(location, str):
+            location = [location]
+
+        tables = []
+        for loc in location:
+            table = rule_table(self.data[loc], self.stats.loc[loc], rules)
+            names = self.tests["Test_Name"].reindex(table.index).to_numpy()
+
+            table = table.reset_index()
+            table.insert(0, "Location", loc)
+            table.insert(2, "Test_Name", names)
+            tables.append(table)
+
+        return pd.concat(tables, ignore_index=True)
+
+    def build_stats(self) -> pd.DataFrame:
+        """Build the statistics index from the test moments.
+
+        Returns:
+            pd.DataFrame: count, mean, SD, min, max, oot, limits, Cp, Cpk,
+                Cpl and Cpu indexed by location and Test_ID
+        """
+        return capability_table(
+            {
+                location: stats_from_moments(moments)
+                for location, moments in self.moments.items()
+            },
+            self._tests,
+        ).set_index(["Location", "Test_ID"])
+
     @staticmethod
     def calculate_capability(
         test_dataset: pd.DataFrame,
@@ -308,18 +1012,45 @@ class PartNumber:
     ) -> Tuple[float, float]:
         """Calculate capability for a dataset.
 
-        Must be filtered to a single test and location
+        Must be filtered to a single test and location, blank readings
+        are skipped as in the stats index.
 
         Args:
             test_dataset (pd.DataFrame): Dataset reduced to a single test
            usl (Union[int, float, None]): Upper Spec Limit
             lsl (Union[int, float, None]): Lower Spec Limit
 
+        Returns:
+            Tuple[float, float]: Cp, Cpk
         """
-        log = logging.getLogger(__name__)
+        readings = test_dataset["Reading"].to_numpy(dtype=float)
+        mean = np.nanmean(readings)
+        SD = np.nanstd(readings, ddof=1)
 
-        mean = statistics.mean(test_dataset["Reading"])
-        SD = statistics.stdev(test_dataset["Reading"])
+        return PartNumber.capability_from_stats(mean, SD, lsl, usl)
+
+    @staticmethod
+    def capability_from_stats(
+        mean: float,
+        SD: float,
+        lsl: Union[int, float, None],
+        usl: Union[int, float, None],
+    ) -> Tuple[float, float]:
+        """Calculate capability from the mean and standard deviation.
+
+        Args:
+            mean (float): Mean of the readings
+            SD (float): Sample standard deviation of the readings
+            lsl (Union[int, float, None]): Lower Spec Limit
+            usl (Union[int, float, None]): Upper Spec Limit
+
+        Returns:
+            Tuple[float, float]: Cp, Cpk
+
+        Raises:
+            ValueError: Neither limit is set
+        """
+        log = logging.getLogger(__name__)
 
         # Error check
         if lsl is None and usl is None:
@@ -327,7 +1058,7 @@ class PartNumber:
             raise ValueError("Neither Min_Tol or Max_Tol is set")
 
         if usl is None:
-            cpk = (mean - lsl) / (3 * SD)
+            cpk = (mean - cast(float, lsl)) / (3 * SD)
             cp = np.nan
         elif lsl is None:
             cpk = (usl - mean) / (3 * SD)
@@ -338,6 +1069,101 @@ class PartNumber:
 
         return cp, cpk
 
+    @staticmethod
+    def test_moments(
+        dataset: pd.DataFrame, tests: Optional[pd.DataFrame] = None
+    ) -> pd.DataFrame:
+        """Calculate the moments of the readings of each test.
+
+        Args:
+            dataset (pd.DataFrame): Single location indexed by Test_ID and
+                Unit SN
+            tests (Optional[pd.DataFrame], optional): Test list indexed by
+                Test_ID, used to count out of tolerance readings
+
+        Returns:
+            pd.DataFrame: count, mean, m2 (sum of squared deviations
+                from the mean), min, max and oot (out of tolerance count,
+                only with tests) indexed by Test_ID
+        """
+        grouped = dataset["Reading"].groupby(level="Test_ID", sort=False)
+        count = grouped.count()
+
+        moments = pd.DataFrame(
+            {
+                "count": count,
+                "mean": grouped.mean(),
+                "m2": grouped.var(ddof=0) * count,
+                "min": grouped.min(),
+                "max": grouped.max(),
+            }
+        )
+
+        if tests is not None:
+            # Limits of the test of every reading
+            limits = tests.reindex(dataset.index.get_level_values("Test_ID"))
+            oot = SPCFigure.out_of_tolerance(
+                dataset["Reading"],
+                limits["Min_Tol"].to_numpy(dtype=float),
+                limits["Max_Tol"].to_numpy(dtype=float),
+            )
+            moments["oot"] = (
+                pd.Series(oot, index=dataset.index)
+                .groupby(level="Test_ID", sort=False)
+                .sum()
+                .astype(np.int64)
+            )
+
+        return moments
+
+    @staticmethod
+    def merge_moments(
+        first: pd.DataFrame, second: pd.DataFrame
+    ) -> pd.DataFrame:
+        """Combine the moments of two sets of readings.
+
+        Uses the pairwise update of Chan et al. so the data behind the
+        first set of moments is not needed.
+
+        Args:
+            first (pd.DataFrame): moments from test_moments
+            second (pd.DataFrame): moments from test_moments
+
+        Returns:
+            pd.DataFrame: moments of both sets of readings
+        """
+        index = first.index.append(second.index.difference(first.index))
+        first = first.reindex(index)
+        second = second.reindex(index)
+
+        # Extremes ignore a test missing from one side
+        extremes = {}
+        if "min" in first and "min" in second:
+            extremes["min"] = np.fmin(first["min"], second["min"])
+            extremes["max"] = np.fmax(first["max"], second["max"])
+
+        first = first.fillna(0)
+        second = second.fillna(0)
+
+        count = (first["count"] + second["count"]).astype(np.int64)
+        delta = second["mean"] - first["mean"]
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = first["mean"] + delta * second["count"] / count
+            m2 = (
+                first["m2"]
+                + second["m2"]
+                + delta**2 * first["count"] * second["count"] / count
+            )
+
+        merged = pd.DataFrame(
+            {"count": count, "mean": mean, "m2": m2, **extremes}
+        )
+        if "oot" in first and "oot" in second:
+            merged["oot"] = (first["oot"] + second["oot"]).astype(np.int64)
+
+        return merged
+
     @staticmethod
     def extract_test(dataset: pd.DataFrame, test_id: str) -> pd.DataFrame:
         """Return a dataset in the format needed by SPCFigure.
@@ -0,0 +1,740 @@
+"""Readers for part data files.
+
+A part is either an excel workbook or a directory of tables, one per sheet
+of the workbook, i.e. Header.csv, Test_List.csv and <location>.csv (or the
+same as .parquet files).
+
+Every reader takes the path of a part and returns the header, test
+list and location data in the shape PartNumber stores them:
+
+    * header, dict of the first row of the Header sheet
+    * tests, Test_List indexed by Test_ID
+    * data, dict of location sheets indexed by Test_ID and Unit SN
+"""
+
+# Imports
+
+import os
+import glob
+import logging
+import itertools
+import hashlib
+from typing import Dict, Tuple, Any, Callable, Iterator, List, Optional
+import pandas as pd  # type: ignore
+import numpy as np
+import openpyxl  # type: ignore
+import pyarrow as pa  # type: ignore
+import pyarrow.csv  # type: ignore
+import pyarrow.parquet  # type: ignore
+
+log = logging.getLogger(__name__)
+
+Frames = Tuple[Dict[str, Any], pd.DataFrame, Dict[str, pd.DataFrame]]
+
+# How much of a sheet has been read, rows (xlsx) or bytes (csv) and the
+# sha256 of them. Used to read only what has been appended since
+Mark = Tuple[int, str]
+
+# Column types in the data files
+COL_DTYPE = {
+    "Part Number": "string",
+    "Notes": "string",
+    "Test_ID": "string",
+    "Test_Name": "string",
+    "Min_Tol": np.float64,
+    "Max_Tol": np.float64,
+    "Units": "string",
+    "Reading": np.float64,
+    "Unit SN": "string",
+}
+
+# Sheets that are not locations
+RESERVED_SHEETS = ["Header", "Test_List"]
+
+
+class StaleMark(Exception):
+    """Data before a mark has changed, the source must be read in full."""
+
+
+def read_excel(filepath: str) -> Frames:
+    """Read a data file with pandas.
+
+    Args:
+        filepath (str): path to data file
+
+    Returns:
+        Frames: header, tests and data
+    """
+    # Single call to Excel
+    xls = pd.ExcelFile(filepath)
+
+    # Generic header infomation
+    header: Dict[str, Any] = (
+        pd.read_excel(xls, sheet_name="Header", header=0, dtype=COL_DTYPE)
+        .iloc[0]
+        .to_dict()
+    )
+    log.debug("Header Read")
+    log.debug(header)
+
+    # Test list
+    tests: pd.DataFrame = pd.read_excel(
+        xls, sheet_name="Test_List", header=0, dtype=COL_DTYPE
+    ).set_index("Test_ID")
+    log.debug("Test_List Read")
+    log.debug(tests.head(5))
+
+    # Data from each site. Store in dict with key as sheetname
+    data: Dict[str, pd.DataFrame] = {}  # empty dict
+    for sheet_name in xls.sheet_names:
+
+        if sheet_name not in RESERVED_SHEETS:
+            try:
+                data[sheet_name] = pd.read_excel(
+                    xls,
+                    sheet_name=sheet_name,
+                    header=0,
+                    dtype=COL_DTYPE,
+                ).set_index(["Test_ID", "Unit SN"])
+                log.debug(f"{sheet_name} loaded")
+                log.debug(data[sheet_name].head(5))
+            except Exception as e:
+                log.info(f"{sheet_name} failed to load\n{e}")
+
+    return header, tests, data
+
+
+def read_excel_streaming(
+    filepath: str,
+    chunksize: int = 50000,
+    marks: Optional[Dict[str, Mark]] = None,
+) -> Frames:
+    """Read a data file with openpyxl in read only mode.
+
+    Rows are streamed from the file and typed a chunk at a time, so the
+    whole workbook is never held in memory. Output matches read_excel for
+    the named columns, unnamed columns are dropped.
+
+    Args:
+        filepath (str): path to data file
+        chunksize (int, optional): rows to convert at a time
+        marks (Optional[Dict[str, Mark]], optional): filled with the mark
+            of every sheet read, see read_appended
+
+    Returns:
+        Frames: header, tests and data
+    """
+    wb = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+    marks = {} if marks is None else marks
+
+    try:
+        frame, marks["Header"] = stream_sheet(wb["Header"], chunksize)
+        header: Dict[str, Any] = frame.iloc[0].to_dict()
+        log.debug("Header Read")
+        log.debug(header)
+
+        frame, marks["Test_List"] = stream_sheet(wb["Test_List"], chunksize)
+        tests = frame.set_index("Test_ID")
+        log.debug("Test_List Read")
+        log.debug(tests.head(5))
+
+        data: Dict[str, pd.DataFrame] = {}
+        for sheet_name in wb.sheetnames:
+
+            if sheet_name not in RESERVED_SHEETS:
+                try:
+                    frame, mark = stream_sheet(wb[sheet_name], chunksize)
+                    data[sheet_name] = frame.set_index(["Test_ID", "Unit SN"])
+                    marks[sheet_name] = mark
+                    log.debug(f"{sheet_name} loaded")
+                    log.debug(data[sheet_name].head(5))
+                except Exception as e:
+                    log.info(f"{sheet_name} failed to load\n{e}")
+
+    except (KeyError, IndexError) as e:
+        raise ValueError(f"Header or Test_List sheet missing\n{e}") from e
+
+    finally:
+        # read only workbooks keep the file open until closed
+        wb.close()
+
+    return header, tests, data
+
+
+def read_sheet_streaming(sheet: Any, chunksize: int = 50000) -> pd.DataFrame:
+    """Read a worksheet opened in read only mode into a typed dataframe.
+
+    The first row is the column names. Fully blank rows are skipped and
+    known columns are converted to the types in COL_DTYPE.
+
+    Args:
+        sheet (Any): openpyxl read only worksheet
+        chunksize (int, optional): rows to convert at a time
+
+    Returns:
+        pd.DataFrame: sheet contents
+    """
+    return stream_sheet(sheet, chunksize)[0]
+
+
+def stream_sheet(
+    sheet: Any, chunksize: int = 50000, skip: Optional[Mark] = None
+) -> Tuple[pd.DataFrame, Mark]:
+    """Read a worksheet opened in read only mode, optionally only new rows.
+
+    Args:
+        sheet (Any): openpyxl read only worksheet
+        chunksize (int, optional): rows to convert at a time
+        skip (Optional[Mark], optional): mark from an earlier read, only
+            rows after it are returned
+
+    Returns:
+        Tuple[pd.DataFrame, Mark]: typed rows and the mark of the sheet
+
+    Raises:
+        StaleMark: rows before skip have changed since it was taken
+    """
+    # The stored sheet size can be missing or wrong, read to the end instead
+    sheet.reset_dimensions()
+
+    rows = HashedRows(sheet.iter_rows(values_only=True))
+
+    names = next(rows, None)
+    if names is None:
+        return pd.DataFrame(), rows.mark()
+
+    # Ignore columns with no name (formatted but empty cells)
+    keep = [i for i, name in enumerate(names) if name is not None]
+    columns = [str(names[i]) for i in keep]
+
+    if skip is not None:
+        for _ in itertools.islice(rows, skip[0] - 1):
+            pass
+
+        if rows.mark() != skip:
+            raise StaleMark(f"{sheet.title} changed before row {skip[0]}")
+
+    chunks = [
+        type_columns(pd.DataFrame.from_records(chunk, columns=columns))
+        for chunk in iter_chunks(rows, keep, chunksize)
+    ]
+
+    if not chunks:
+        return type_columns(pd.DataFrame(columns=columns)), rows.mark()
+
+    return pd.concat(chunks, ignore_index=True), rows.mark()
+
+
+class HashedRows:
+    """Iterator over sheet rows that counts and hashes the rows it yields.
+
+    Attributes
+    ----------
+    count : int
+        rows yielded so far
+    """
+
+    def __init__(self, rows: Iterator[Tuple[Any, ...]]) -> None:
+        """Wrap a row iterator.
+
+        Parameters
+        ----------
+        rows : Iterator[Tuple[Any, ...]]
+            row values
+        """
+        self.rows = rows
+        self.count = 0
+        self.digest = hashlib.sha256()
+
+    def __iter__(self) -> "HashedRows":
+        """Return the iterator.
+
+        Returns
+        -------
+        HashedRows
+            self
+        """
+        return self
+
+    def __next__(self) -> Tuple[Any, ...]:
+        """Hash and return the next row.
+
+        Returns
+        -------
+        Tuple[Any, ...]
+            row values
+        """
+        row = next(self.rows)
+        self.count += 1
+        self.digest.update(row_bytes(row))
+
+        return row
+
+    def mark(self) -> Mark:
+        """Get the mark of the rows yielded so far.
+
+        Returns
+        -------
+        Mark
+            row count and hash
+        """
+        return self.count, self.digest.hexdigest()
+
+
+def row_bytes(row: Tuple[Any, ...]) -> bytes:
+    """Encode row values for hashing, the same whatever type they were read as.
+
+    Numbers are encoded by their float value, so 2 and 2.0 match, blank
+    cells are one token and trailing blank cells are dropped.
+
+    Args:
+        row (Tuple[Any, ...]): row values
+
+    Returns:
+        bytes: encoded row
+    """
+    values = list(row)
+    while values and values[-1] is None:
+        values.pop()
+
+    tokens = []
+    for value in values:
+        if value is None:
+            tokens.append("\x00")
+        elif isinstance(value, (int, float, np.number)):
+            tokens.append(float(value).hex())
+        else:
+            tokens.append(repr(value))
+
+    return "\x1f".join(tokens).encode("utf-8") + b"\x1e"
+
+
+def iter_chunks(
+    rows: Iterator[Tuple[Any, ...]], keep: List[int], chunksize: int
+) -> Iterator[List[Tuple[Any, ...]]]:
+    """Split rows in to chunks of the kept columns, dropping blank rows.
+
+    Args:
+        rows (Iterator[Tuple[Any, ...]]): row values
+        keep (List[int]): column positions to keep
+        chunksize (int): rows per chunk
+
+    Yields:
+        List[Tuple[Any, ...]]: chunk of rows
+    """
+    width = max(keep) + 1
+
+    while True:
+        block = list(itertools.islice(rows, chunksize))
+        if not block:
+            return
+
+        chunk = []
+        for row in block:
+            # rows are not padded to the sheet width
+            if len(row) < width:
+                row = row + (None,) * (width - len(row))
+
+            row = tuple(row[i] for i in keep)
+
+            if any(value is not None for value in row):
+                chunk.append(row)
+
+        if chunk:
+            yield chunk
+
+
+def type_columns(frame: pd.DataFrame) -> pd.DataFrame:
+    """Convert known columns to the types in COL_DTYPE.
+
+    String columns match pandas.read_excel, whole numbers are written
+    without a decimal point (e.g. Test_ID 2 not 2.0).
+
+    Args:
+        frame (pd.DataFrame): frame of raw cell values
+
+    Returns:
+        pd.DataFrame: typed frame
+    """
+    for column, dtype in COL_DTYPE.items():
+        if column not in frame:
+            continue
+
+        if dtype == "string":
+            if frame[column].dtype.kind in "Of":
+                frame[column] = frame[column].map(
+                    cell_string, na_action="ignore"
+                )
+            frame[column] = frame[column].astype("string")
+        else:
+            frame[column] = frame[column].astype(dtype)
+
+    return frame
+
+
+def cell_string(value: Any) -> str:
+    """Convert a cell value to a string the way pandas.read_excel does.
+
+    Args:
+        value (Any): cell value
+
+    Returns:
+        str: value as a string
+    """
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+
+    return str(value)
+
+
+def read_table_dir(
+    dirpath: str,
+    read_table: Callable[[str], Tuple[pa.Table, Optional[Mark]]],
+    ext: str,
+    marks: Optional[Dict[str, Mark]] = None,
+) -> Frames:
+    """Read a directory of tables, one file per sheet.
+
+    Args:
+        dirpath (str): directory holding the tables
+        read_table (Callable[[str], Tuple[pa.Table, Optional[Mark]]]): reads
+            one file with pyarrow, returns the table and its mark if the
+            format can be appended to
+        ext (str): file extension of the tables, e.g. ".csv"
+        marks (Optional[Dict[str, Mark]], optional): filled with the mark
+            of every table read, see read_appended
+
+    Returns:
+        Frames: header, tests and data
+
+    Raises:
+        ValueError: Header or Test_List table is missing or empty
+    """
+    paths = table_paths(dirpath, ext)
+    tables: Dict[str, pd.DataFrame] = {}
+    marks = {} if marks is None else marks
+
+    def read(name: str) -> pd.DataFrame:
+        table, mark = read_table(paths[name])
+        if mark is not None:
+            marks[name] = mark
+        return table_frame(table)
+
+    try:
+        tables = {name: read(name) for name in RESERVED_SHEETS}
+        header: Dict[str, Any] = tables["Header"].iloc[0].to_dict()
+    except (KeyError, IndexError) as e:
+        raise ValueError(f"Header or Test_List missing from {dirpath}") from e
+
+    log.debug("Header Read")
+    log.debug(header)
+
+    tests = tables["Test_List"].set_index("Test_ID")
+    log.debug("Test_List Read")
+    log.debug(tests.head(5))
+
+    data: Dict[str, pd.DataFrame] = {}
+    for name in paths:
+
+        if name not in RESERVED_SHEETS:
+            try:
+                data[name] = read(name).set_index(["Test_ID", "Unit SN"])
+                log.debug(f"{name} loaded")
+                log.debug(data[name].head(5))
+            except Exception as e:
+                log.info(f"{name} failed to load\n{e}")
+
+    return header, tests, data
+
+
+def table_paths(dirpath: str, ext: str) -> Dict[str, str]:
+    """Find the tables in a directory.
+
+    Args:
+        dirpath (str): directory holding the tables
+        ext (str): file extension of the tables, e.g. ".csv"
+
+    Returns:
+        Dict[str, str]: path of each table, key is the sheet name
+    """
+    return {
+        os.path.splitext(os.path.basename(path))[0]: path
+        for path in sorted(glob.glob(os.path.join(dirpath, f"*{ext}")))
+    }
+
+
+def read_csv_table(path: str) -> Tuple[pa.Table, Optional[Mark]]:
+    """Read a csv file with the pyarrow multithreaded reader.
+
+    Args:
+        path (str): csv file
+
+    Returns:
+        Tuple[pa.Table, Optional[Mark]]: file contents and its mark
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+
+    return (
+        pyarrow.csv.read_csv(
+            pa.BufferReader(raw),
+            convert_options=pyarrow.csv.ConvertOptions(
+                column_types=ARROW_TYPES
+            ),
+        ),
+        (len(raw), hashlib.sha256(raw).hexdigest()),
+    )
+
+
+def read_csv_appended(path: str, skip: Mark) -> Tuple[pa.Table, Mark]:
+    """Read the rows added to the end of a csv file since it was marked.
+
+    Args:
+        path (str): csv file
+        skip (Mark): mark from an earlier read
+
+    Returns:
+        Tuple[pa.Table, Mark]: new rows and the mark of the file
+
+    Raises:
+        StaleMark: the file has changed before the mark
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+
+    size, digest = skip
+    if len(raw) < size or hashlib.sha256(raw[:size]).hexdigest() != digest:
+        raise StaleMark(f"{path} changed before byte {size}")
+
+    mark = (len(raw), hashlib.sha256(raw).hexdigest())
+
+    # Column names from the first line, the new rows have no header
+    names = pyarrow.csv.read_csv(
+        pa.BufferReader(raw.split(b"\n", 1)[0] + b"\n")
+    ).column_names
+
+    if not raw[size:].strip():
+        return pa.table({name: pa.array([]) for name in names}), mark
+
+    return (
+        pyarrow.csv.read_csv(
+            pa.BufferReader(raw[size:]),
+            read_options=pyarrow.csv.ReadOptions(column_names=names),
+            convert_options=pyarrow.csv.ConvertOptions(
+                column_types=ARROW_TYPES
+            ),
+        ),
+        mark,
+    )
+
+
+def read_parquet_table(path: str) -> Tuple[pa.Table, Optional[Mark]]:
+    """Read a parquet file with pyarrow.
+
+    Parquet files are rewritten rather than appended to, so have no mark.
+
+    Args:
+        path (str): parquet file
+
+    Returns:
+        Tuple[pa.Table, Optional[Mark]]: file contents and None
+    """
+    return pyarrow.parquet.read_table(path), None
+
+
+def table_frame(table: pa.Table) -> pd.DataFrame:
+    """Convert a pyarrow table to a dataframe with the types in COL_DTYPE.
+
+    Args:
+        table (pa.Table): table read by pyarrow
+
+    Returns:
+        pd.DataFrame: typed frame
+    """
+    return type_columns(
+        table.to_pandas(
+            types_mapper={
+                pa.string(): pd.StringDtype(),
+                pa.large_string(): pd.StringDtype(),
+            }.get
+        )
+    )
+
+
+def source_format(path: str) -> str:
+    """Get the format of a part data source.
+
+    Args:
+        path (str): workbook or directory of tables
+
+    Returns:
+        str: "xlsx", "csv" or "parquet"
+
+    Raises:
+        ValueError: path is not a part data source
+    """
+    if os.path.isdir(path):
+        for fmt, ext in TABLE_FORMATS.items():
+            if os.path.isfile(os.path.join(path, f"Header{ext}")):
+                return fmt
+
+    elif path.endswith(".xlsx"):
+        return "xlsx"
+
+    raise ValueError(f"{path} is not an xlsx file or directory of tables")
+
+
+def find_sources(dirpath: str) -> List[str]:
+    """Find the part data sources in a directory.
+
+    Args:
+        dirpath (str): directory to look in
+
+    Returns:
+        List[str]: xlsx files and directories of csv or parquet tables
+    """
+    sources = glob.glob(os.path.join(dirpath, "*.xlsx"))
+
+    for path in sorted(glob.glob(os.path.join(dirpath, "*", ""))):
+        path = os.path.dirname(path)
+        try:
+            source_format(path)
+            sources.append(path)
+        except ValueError:
+            continue
+
+    return sources
+
+
+def read_source(
+    path: str,
+    engine: str = "pandas",
+    marks: Optional[Dict[str, Mark]] = None,
+) -> Frames:
+    """Read a part data source of any format.
+
+    Args:
+        path (str): workbook or directory of tables
+        engine (str, optional): reader for xlsx files, key of EXCEL_ENGINES
+        marks (Optional[Dict[str, Mark]], optional): filled with the mark
+            of every sheet read if the reader supports it (streaming xlsx
+            and csv), see read_appended
+
+    Returns:
+        Frames: header, tests and data
+    """
+    fmt = source_format(path)
+
+    if fmt == "xlsx":
+        if engine == "streaming":
+            return read_excel_streaming(path, marks=marks)
+
+        return EXCEL_ENGINES[engine](path)
+
+    return read_table_dir(
+        path, TABLE_READERS[fmt], TABLE_FORMATS[fmt], marks=marks
+    )
+
+
+def read_appended(
+    path: str, marks: Dict[str, Mark]
+) -> Tuple[Dict[str, pd.DataFrame], Dict[str, Mark]]:
+    """Read only the location rows appended to a source since it was marked.
+
+    Args:
+        path (str): workbook or directory of tables
+        marks (Dict[str, Mark]): marks of every sheet from the last read
+
+    Returns:
+        Tuple[Dict[str, pd.DataFrame], Dict[str, Mark]]: new rows of each
+            location indexed by Test_ID and Unit SN, and the new marks
+
+    Raises:
+        StaleMark: the source has changed other than by appending rows to
+            the location sheets and must be read in full
+    """
+    fmt = source_format(path)
+
+    if fmt == "xlsx":
+        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            if set(wb.sheetnames) != set(marks):
+                raise StaleMark(f"Sheets of {path} have changed")
+
+            new = {
+                name: stream_sheet(wb[name], skip=mark)
+                for name, mark in marks.items()
+            }
+        finally:
+            wb.close()
+
+    elif fmt == "csv":
+        paths = table_paths(path, TABLE_FORMATS[fmt])
+        if set(paths) != set(marks):
+            raise StaleMark(f"Tables in {path} have changed")
+
+        new = {}
+        for name, mark in marks.items():
+            table, new_mark = read_csv_appended(paths[name], mark)
+            new[name] = table_frame(table), new_mark
+
+    else:
+        raise StaleMark(f"{fmt} files can only be read in full")
+
+    if any(len(new[name][0]) for name in RESERVED_SHEETS):
+        raise StaleMark(f"Header or Test_List of {path} have changed")
+
+    return (
+        {
+            name: frame.set_index(["Test_ID", "Unit SN"])
+            for name, (frame, _) in new.items()
+            if name not in RESERVED_SHEETS
+        },
+        {name: mark for name, (_, mark) in new.items()},
+    )
+
+
+def read_header(path: str) -> Dict[str, Any]:
+    """Read only the header of a part data source.
+
+    Args:
+        path (str): workbook or directory of tables
+
+    Returns:
+        Dict[str, Any]: header infomation
+    """
+    fmt = source_format(path)
+
+    if fmt == "xlsx":
+        frame = pd.read_excel(path, sheet_name="Header", dtype=COL_DTYPE)
+    else:
+        table, _ = TABLE_READERS[fmt](
+            os.path.join(path, f"Header{TABLE_FORMATS[fmt]}")
+        )
+        frame = table_frame(table)
+
+    try:
+        return frame.iloc[0].to_dict()
+    except IndexError as e:
+        raise ValueError(f"Header of {path} is empty") from e
+
+
+# Readers for excel files, key is the name used on the command line
+EXCEL_ENGINES: Dict[str, Callable[[str], Frames]] = {
+    "pandas": read_excel,
+    "streaming": read_excel_streaming,
+}
+
+# Directory of table formats and their file extension
+TABLE_FORMATS = {"parquet": ".parquet", "csv": ".csv"}
+
+TABLE_READERS: Dict[str, Callable[[str], Tuple[pa.Table, Optional[Mark]]]] = {
+    "parquet": read_parquet_table,
+    "csv": read_csv_table,
+}
+
+# Types for csv columns, the rest are inferred
+ARROW_TYPES = {
+    column: pa.string() if dtype == "string" else pa.float64()
+    for column, dtype in COL_DTYPE.items()
+}
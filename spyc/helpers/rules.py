@@ -0,0 +1,417 @@
+"""Western Electric and Nelson rules for readings out of statistical control.
+
+Readings are standardised against the centre line and sigma of the test,
+z = (reading - centre) / sigma, and each rule is a rolling window over z:
+
+    * beyond_3sd, 1 point more than 3 sigma from the centre line
+    * 2_of_3_beyond_2sd, 2 of 3 points more than 2 sigma, same side
+    * 4_of_5_beyond_1sd, 4 of 5 points more than 1 sigma, same side
+    * 8_same_side, 8 points in a row on one side of the centre line
+    * 9_same_side, 9 points in a row on one side of the centre line
+    * 6_trending, 6 points in a row all increasing or all decreasing
+    * 14_alternating, 14 points in a row alternating up and down
+    * 15_within_1sd, 15 points in a row within 1 sigma
+    * 8_beyond_1sd, 8 points in a row more than 1 sigma, either side
+
+Windows are counted with np.convolve, so a whole location is checked
+without a loop over its readings. Readings of several tests can be
+checked at once by passing the group of each reading, no window spans
+two groups. Every reading in a window that breaks a rule is flagged,
+blank (NaN) readings break every run.
+"""
+
+# Imports
+
+from typing import Callable, Dict, Iterable, List, Optional, Union
+import pandas as pd  # type: ignore
+import numpy as np
+
+# Rules of each rule set, in the order they are usually numbered
+RULE_SETS: Dict[str, List[str]] = {
+    "western_electric": [
+        "beyond_3sd",
+        "2_of_3_beyond_2sd",
+        "4_of_5_beyond_1sd",
+        "8_same_side",
+    ],
+    "nelson": [
+        "beyond_3sd",
+        "9_same_side",
+        "6_trending",
+        "14_alternating",
+        "2_of_3_beyond_2sd",
+        "4_of_5_beyond_1sd",
+        "15_within_1sd",
+        "8_beyond_1sd",
+    ],
+}
+
+
+def windows(
+    flags: np.ndarray,
+    window: int,
+    count: int,
+    groups: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Flag the points of every window with at least count flags.
+
+    Parameters
+    ----------
+    flags : np.ndarray
+        boolean array, the condition of the rule for each point
+    window : int
+        points in the window
+    count : int
+        flags needed in the window to break the rule
+    groups : Optional[np.ndarray], optional
+        group of each point, groups must be contiguous, default is one
+        group
+
+    Returns
+    -------
+    np.ndarray
+        boolean array, True where a flagged point is in a window that
+        breaks the rule
+    """
+    n = len(flags)
+    if n < window:
+        return np.zeros(n, dtype=bool)
+
+    # Flags in the window starting at each point
+    end = window - 1
+    sums = np.convolve(flags.astype(np.int64), np.ones(window, np.int64))
+    broken = sums[end:n] >= count
+    if groups is not None:
+        broken &= groups[: n - end] == groups[end:]
+
+    return spread(broken, window) & flags
+
+
+def spread(starts: np.ndarray, width: int) -> np.ndarray:
+    """Flag every point covered by a flagged span.
+
+    Parameters
+    ----------
+    starts : np.ndarray
+        boolean array, True where a span of width points starts
+    width : int
+        points in each span
+
+    Returns
+    -------
+    np.ndarray
+        boolean array of len(starts) + width - 1 points
+    """
+    return np.convolve(starts.astype(np.int64), np.ones(width, np.int64)) > 0
+
+
+def beyond(
+    z: np.ndarray,
+    sd: float,
+    window: int,
+    count: int,
+    groups: Optional[np.ndarray],
+) -> np.ndarray:
+    """Flag count of window points more than sd from the centre, one side.
+
+    Parameters
+    ----------
+    z : np.ndarray
+        standardised readings
+    sd : float
+        sigmas from the centre line
+    window : int
+        points in the window
+    count : int
+        points beyond sd needed in the window
+    groups : Optional[np.ndarray]
+        group of each point
+
+    Returns
+    -------
+    np.ndarray
+        boolean array of the points breaking the rule
+    """
+    with np.errstate(invalid="ignore"):
+        return windows(z > sd, window, count, groups) | windows(
+            z < -sd, window, count, groups
+        )
+
+
+def steps(z: np.ndarray, groups: Optional[np.ndarray]) -> np.ndarray:
+    """Get the sign of the step from each point to the next.
+
+    Parameters
+    ----------
+    z : np.ndarray
+        standardised readings
+    groups : Optional[np.ndarray]
+        group of each point, steps between groups are 0
+
+    Returns
+    -------
+    np.ndarray
+        -1, 0 or 1 for each of the len(z) - 1 steps, 0 if either point is
+        blank
+    """
+    step = np.nan_to_num(np.sign(np.diff(z)))
+    if groups is not None:
+        step[groups[1:] != groups[:-1]] = 0
+
+    return step
+
+
+def trending(z: np.ndarray, groups: Optional[np.ndarray]) -> np.ndarray:
+    """Flag 6 points in a row all increasing or all decreasing.
+
+    Parameters
+    ----------
+    z : np.ndarray
+        standardised readings
+    groups : Optional[np.ndarray]
+        group of each point
+
+    Returns
+    -------
+    np.ndarray
+        boolean array of the points breaking the rule
+    """
+    if len(z) < 6:
+        return np.zeros(len(z), dtype=bool)
+
+    step = steps(z, groups)
+    trend = windows(step > 0, 5, 5) | windows(step < 0, 5, 5)
+
+    return spread(trend, 2)
+
+
+def alternating(z: np.ndarray, groups: Optional[np.ndarray]) -> np.ndarray:
+    """Flag 14 points in a row alternating up and down.
+
+    Parameters
+    ----------
+    z : np.ndarray
+        standardised readings
+    groups : Optional[np.ndarray]
+        group of each point
+
+    Returns
+    -------
+    np.ndarray
+        boolean array of the points breaking the rule
+    """
+    if len(z) < 14:
+        return np.zeros(len(z), dtype=bool)
+
+    step = steps(z, groups)
+    turns = windows(step[1:] * step[:-1] < 0, 12, 12)
+
+    return spread(turns, 3)
+
+
+def within(z: np.ndarray, groups: Optional[np.ndarray]) -> np.ndarray:
+    """Flag 15 points in a row within 1 sigma of the centre line.
+
+    Parameters
+    ----------
+    z : np.ndarray
+        standardised readings
+    groups : Optional[np.ndarray]
+        group of each point
+
+    Returns
+    -------
+    np.ndarray
+        boolean array of the points breaking the rule
+    """
+    with np.errstate(invalid="ignore"):
+        return windows(np.abs(z) < 1, 15, 15, groups)
+
+
+def same_side(
+    z: np.ndarray, run: int, groups: Optional[np.ndarray]
+) -> np.ndarray:
+    """Flag run points in a row on one side of the centre line.
+
+    Parameters
+    ----------
+    z : np.ndarray
+        standardised readings
+    run : int
+        points in a row
+    groups : Optional[np.ndarray]
+        group of each point
+
+    Returns
+    -------
+    np.ndarray
+        boolean array of the points breaking the rule
+    """
+    return beyond(z, 0, run, run, groups)
+
+
+RULES: Dict[str, Callable[[np.ndarray, Optional[np.ndarray]], np.ndarray]]
+RULES = {
+    "beyond_3sd": lambda z, g: beyond(z, 3, 1, 1, g),
+    "2_of_3_beyond_2sd": lambda z, g: beyond(z, 2, 3, 2, g),
+    "4_of_5_beyond_1sd": lambda z, g: beyond(z, 1, 5, 4, g),
+    "8_same_side": lambda z, g: same_side(z, 8, g),
+    "9_same_side": lambda z, g: same_side(z, 9, g),
+    "6_trending": trending,
+    "14_alternating": alternating,
+    "15_within_1sd": within,
+    "8_beyond_1sd": lambda z, g: windows(np.abs(z) > 1, 8, 8, g),
+}
+
+
+def rule_names(rules: Union[str, Iterable[str]]) -> List[str]:
+    """Get the rules of a rule set.
+
+    Parameters
+    ----------
+    rules : Union[str, Iterable[str]]
+        rule set names in RULE_SETS and/or names of rules in RULES
+
+    Returns
+    -------
+    List[str]
+        names of rules in RULES
+
+    Raises
+    ------
+    ValueError
+        unknown rule or rule set
+    """
+    if isinstance(rules, str):
+        rules = [rules]
+
+    # Rule sets share rules, only check each once
+    names = list(
+        dict.fromkeys(
+            name for rule in rules for name in RULE_SETS.get(rule, [rule])
+        )
+    )
+    unknown = [name for name in names if name not in RULES]
+    if unknown:
+        raise ValueError(
+            f"Unknown rules {unknown}, expected one of"
+            f" {list(RULE_SETS) + list(RULES)}"
+        )
+
+    return names
+
+
+def check_rules(
+    readings: np.ndarray,
+    centre: Union[float, np.ndarray],
+    sigma: Union[float, np.ndarray],
+    rules: Union[str, Iterable[str]] = "western_electric",
+    groups: Optional[np.ndarray] = None,
+) -> Dict[str, np.ndarray]:
+    """Check readings against each rule.
+
+    Parameters
+    ----------
+    readings : np.ndarray
+        readings in the order they were taken
+    centre : Union[float, np.ndarray]
+        centre line, i.e. the mean, or the centre of each reading's group
+    sigma : Union[float, np.ndarray]
+        standard deviation, or that of each reading's group
+    rules : Union[str, Iterable[str]], optional
+        rule set or rules, by default western_electric
+    groups : Optional[np.ndarray], optional
+        group of each reading, i.e. test codes, readings of a group must
+        be contiguous. Default is one group
+
+    Returns
+    -------
+    Dict[str, np.ndarray]
+        boolean array for each rule, True where a reading breaks it
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = (np.asarray(readings, dtype=float) - centre) / sigma
+
+    return {name: RULES[name](z, groups) for name in rule_names(rules)}
+
+
+def violations(
+    readings: np.ndarray,
+    centre: Union[float, np.ndarray],
+    sigma: Union[float, np.ndarray],
+    rules: Union[str, Iterable[str]] = "western_electric",
+    groups: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Flag readings that break any rule, see check_rules.
+
+    Parameters
+    ----------
+    readings : np.ndarray
+        readings in the order they were taken
+    centre : Union[float, np.ndarray]
+        centre line
+    sigma : Union[float, np.ndarray]
+        standard deviation
+    rules : Union[str, Iterable[str]], optional
+        rule set or rules, by default western_electric
+    groups : Optional[np.ndarray], optional
+        group of each reading
+
+    Returns
+    -------
+    np.ndarray
+        boolean array, True where a reading breaks any rule
+    """
+    flags = np.zeros(len(readings), dtype=bool)
+    for broken in check_rules(readings, centre, sigma, rules, groups).values():
+        flags |= broken
+
+    return flags
+
+
+def rule_table(
+    dataset: pd.DataFrame,
+    stats: pd.DataFrame,
+    rules: Union[str, Iterable[str]] = "western_electric",
+) -> pd.DataFrame:
+    """Count the readings breaking each rule for every test of a location.
+
+    Every test is checked in one pass, readings are grouped by test in
+    the order they were taken.
+
+    Parameters
+    ----------
+    dataset : pd.DataFrame
+        single location indexed by Test_ID and Unit SN
+    stats : pd.DataFrame
+        mean and SD indexed by Test_ID, i.e. PartNumber.stats of the
+        location
+    rules : Union[str, Iterable[str]], optional
+        rule set or rules, by default western_electric
+
+    Returns
+    -------
+    pd.DataFrame
+        readings breaking each rule and any rule (violations) indexed by
+        Test_ID
+    """
+    codes, test_ids = pd.factorize(dataset.index.get_level_values("Test_ID"))
+    order = np.argsort(codes, kind="stable")
+    codes = codes[order]
+
+    limits = stats.reindex(test_ids)
+    broken = check_rules(
+        dataset["Reading"].to_numpy(dtype=float)[order],
+        limits["mean"].to_numpy(dtype=float)[codes],
+        limits["SD"].to_numpy(dtype=float)[codes],
+        rules,
+        groups=codes,
+    )
+    broken["violations"] = np.logical_or.reduce(list(broken.values()))
+
+    counts = {
+        name: np.bincount(codes[flags], minlength=len(test_ids))
+        for name, flags in broken.items()
+    }
+
+    return pd.DataFrame(counts, index=pd.Index(test_ids, name="Test_ID"))
@@ -1,47 +1,53 @@
 """Plotting library."""
 
 # Imports
-import statistics
+import copy
+import json
 import logging
-from typing import Optional, Dict, Any
+import functools
+from typing import TYPE_CHECKING, Optional, List, Dict, Tuple, Union, Any
 import pandas as pd  # type: ignore
 import plotly.graph_objects as go  # type: ignore
 import plotly.io as pio  # type: ignore
+import plotly.utils  # type: ignore
+from plotly import shapeannotation  # type: ignore
+from plotly.subplots import make_subplots  # type: ignore
 import numpy as np
+from .downsample import sn_order as get_sn_order, downsample
+from .rules import violations
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover
+    # Same JSON, just slower, plotly treats orjson as optional too
+    orjson = None  # type: ignore
 
 # Plot formattingpipen
 pio.templates.default = "plotly_white"
 
 
-class SPCFigure(go.FigureWidget):  # pylint: disable=too-many-ancestors
-    """Extenstion of plotly's graphical object figurewidget library.
+if TYPE_CHECKING:
+    # SPCPlot is only ever mixed in to a plotly figure
+    from plotly.graph_objects import Figure as FigureBase  # type: ignore
+else:
+    FigureBase = object
+
+
+class SPCPlot(FigureBase):
+    """SPC plots shared by the figure classes.
 
     Custom plots for SPC between mulitple sites,
     i.e can add meanlines and violin plots if requested.
+    Mixed in to a plotly figure class, see SPCFigure, SPCServerFigure
+    and SPCDictFigure.
     """
 
     colour_list = ["#fbaf00", "#007cbe", "#ffd639", "#ffa3af", "#00af54"]
+    # Readings that break a control chart rule
+    violation_colour = "#d62728"
 
-    def __init__(
-        self, *args: str, title: Optional[str] = None, **kwargs: Any
-    ) -> None:
-        """Override __init__ method to add title at creation.
-
-        Parameters
-        ----------
-        *args : str
-            FigureWidget *args
-        title : Optional[str], optional
-            title to include on plot
-        **kwargs : Any
-            FigureWidget **kwargs
-        """
-        # self.log object
-        self.log: logging.Logger = logging.getLogger(__name__)
-
-        print(title)
-        super().__init__(*args, **kwargs)
-        self.update_layout(title=title, font_family="Arial")
+    # plotly figures only allow known attributes to be set
+    log: logging.Logger = logging.getLogger(__name__)
 
     def xbar_plot(
         self,
@@ -49,6 +55,15 @@ class SPCFigure(go.FigureWidget):  # pylint: disable=too-many-ancestors
         test: pd.Series,
         meanline: bool = False,
         violin: bool = False,
+        webgl_threshold: Optional[int] = None,
+        max_points: Optional[int] = None,
+        downsampler: str = "lttb",
+        sn_order: Optional[pd.Index] = None,
+        sn_positions: Optional[Dict[str, np.ndarray]] = None,
+        sn_range: Optional[Tuple[float, float]] = None,
+        means: Optional[Dict[str, float]] = None,
+        rules: Optional[Union[str, List[str]]] = None,
+        sds: Optional[Dict[str, float]] = None,
     ):
         """Plot an xbar graph for a single test on to the figure.
 
@@ -58,6 +73,13 @@ class SPCFigure(go.FigureWidget):  # pylint: disable=too-many-ancestors
         and column = 'Reading'
         Test is a series = Test_Name, Min_Tol, Max_Tol, Units
         Options to include violin and meanline in plot
+        Large datasets are drawn with WebGL (go.Scattergl) instead of SVG
+
+        When any dataset has more than max_points readings (or sn_order is
+        given) x is the position of the Unit SN in sn_order and each
+        location is downsampled to max_points, keeping every out of
+        tolerance reading and as many rule violations as fit. Meanlines
+        and violins still use every reading.
 
         Parameters
         ----------
@@ -71,6 +93,30 @@ class SPCFigure(go.FigureWidget):  # pylint: disable=too-many-ancestors
             Plot meanline, default is False
         violin : bool, optional
             Plot violin, default is False
+        webgl_threshold : Optional[int], optional
+            Draw every location with WebGL when any has more points than
+            this, default is None to always use SVG
+        max_points : Optional[int], optional
+            Readings to plot per location, default is None to plot all
+        downsampler : str, optional
+            Reducer used to downsample, lttb (default) or minmax
+        sn_order : Optional[pd.Index], optional
+            Order of Unit SN on the x axis, default is the order seen in
+            datasets if downsampling
+        sn_positions : Optional[Dict[str, np.ndarray]], optional
+            Position of each reading in sn_order, key is location, default
+            is to look them up
+        sn_range : Optional[Tuple[float, float]], optional
+            x axis range to show when datasets are a window of sn_order
+        means : Optional[Dict[str, float]], optional
+            Mean reading of each location for the meanline, default is to
+            calculate it from datasets
+        rules : Optional[Union[str, List[str]]], optional
+            Rule set or rules to highlight readings that break, default is
+            None to not check any
+        sds : Optional[Dict[str, float]], optional
+            SD of the readings of each location for the rules, default is
+            to calculate it from datasets
         """
         if not isinstance(datasets, dict):
             # if not a dict then raise an error
@@ -109,6 +155,49 @@ class SPCFigure(go.FigureWidget):  # pylint: disable=too-many-ancestors
                 y0=lsl, y1=usl, line_width=0, fillcolor="#00af54", opacity=0.1
             )
 
+        # Switch to a numeric x axis of SN positions to downsample
+        if sn_order is None and (
+            max_points is not None
+            and any(len(data) > max_points for data in datasets.values())
+        ):
+            sn_order = get_sn_order(datasets)
+
+        # Readings to draw for each location
+        shown = {}
+        for location, data in datasets.items():
+            if sn_order is not None:
+                if sn_positions is not None:
+                    positions = sn_positions[location]
+                else:
+                    positions = sn_order.get_indexer(data.index)
+                data = data.iloc[np.argsort(positions, kind="stable")]
+
+            keep = SPCPlot.out_of_tolerance(data["Reading"], lsl, usl)
+            prefer = None
+            if rules is not None:
+                # Kept with the readings so downsampling keeps them aligned
+                data = data.assign(
+                    Violation=SPCPlot.rule_violations(
+                        data["Reading"], rules, means, sds, location
+                    )
+                )
+                prefer = data["Violation"].to_numpy()
+
+            if sn_order is not None and max_points is not None:
+                data = downsample(
+                    data,
+                    np.sort(positions, kind="stable"),
+                    max_points,
+                    keep=keep,
+                    method=downsampler,
+                    prefer=prefer,
+                )
+
+            shown[location] = data
+
+        # Same trace type for every location so they look the same
+        scatter = SPCPlot.scatter_type(shown, webgl_threshold)
+
         # loop through datasets and plot
         # Counter for colours so meanline and violinmatch in each legend group
         colour_count = 0
@@ -117,20 +206,34 @@ class SPCFigure(go.FigureWidget):  # pylint: disable=too-many-ancestors
                 colour_count
             ]  # Get colour for this dataset
 
-            # Marker style to flag OOT data
-            data["Marker"] = [
-                "x" if x < lsl or x > usl else "circle"
-                for x in data["Reading"]
-            ]
+            # Marker style to flag OOT data, kept out of data as the frame
+            # belongs to the part
+            points = shown[location]
+            markers = SPCPlot.oot_markers(points["Reading"], lsl, usl)
+
+            if sn_order is not None:
+                x = dict(
+                    x=sn_order.get_indexer(points.index),
+                    text=points.index,
+                    hovertemplate="%{text}<br>%{y}",
+                )
+            else:
+                x = dict(x=points.index)
+
+            if rules is not None:
+                x["marker_color"] = np.where(
+                    points["Violation"], self.violation_colour, colour
+                )
 
             # Plot data
             self.add_trace(
-                go.Scatter(
-                    x=data.index,
-                    y=data["Reading"],
+                self.trace(
+                    scatter,
+                    **x,
+                    y=points["Reading"],
                     mode="lines+markers",
                     name=location,
-                    marker_symbol=data["Marker"],
+                    marker_symbol=markers,
                     marker=dict(
                         size=12, line=dict(width=2, color="DarkSlateGrey")
                     ),
@@ -140,14 +243,16 @@ class SPCFigure(go.FigureWidget):  # pylint: disable=too-many-ancestors
                 )
             )
 
-            if meanline:
+            if meanline and len(data) > 0:
+                if means is not None:
+                    mean = means[location]
+                else:
+                    mean = float(np.mean(data["Reading"]))
+
                 self.add_hline(
-                    y=statistics.mean(data["Reading"]),
+                    y=mean,
                     line_dash="dash",
-                    annotation_text=(
-                        f"{location}-Mean ="
-                        f" {statistics.mean(data['Reading']):.2f}"
-                    ),
+                    annotation_text=f"{location}-Mean = {mean:.2f}",
                     annotation_position="top right",
                     line_color=colour,
                     line_width=3,
@@ -155,7 +260,8 @@ class SPCFigure(go.FigureWidget):  # pylint: disable=too-many-ancestors
                 )
             if violin:
                 self.add_trace(
-                    go.Violin(
+                    self.trace(
+                        go.Violin,
                         y=data["Reading"],
                         meanline_visible=True,
                         line=dict(color=colour),
@@ -173,6 +279,866 @@ class SPCFigure(go.FigureWidget):  # pylint: disable=too-many-ancestors
             legend=dict(
                 orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1
             ),
-            xaxis_title="Unit SN",
-            yaxis_title=f"{test['Test_Name']}, {test['Units']}",
+            xaxis_title_text="Unit SN",
+            yaxis_title_text=f"{test['Test_Name']}, {test['Units']}",
         )
+
+        if sn_order is not None:
+            self.sn_axis(sn_order, sn_range)
+
+    def imr_plot(
+        self,
+        datasets: Dict[str, pd.DataFrame],
+        test: pd.Series,
+        limits: Dict[str, pd.Series],
+        spec_limits: bool = False,
+        rules: Optional[Union[str, List[str]]] = None,
+        webgl_threshold: Optional[int] = None,
+    ):
+        """Plot individuals and moving range (I-MR) charts for a single test.
+
+        Each location is a column of subplots, the I chart above the MR
+        chart with the x axes linked. Control limits are looked up in
+        limits rather than calculated here, see capability.control_limits.
+        Readings outside the control limits, and with rules readings
+        breaking a rule, are highlighted. Out of tolerance readings are
+        marked with an x as on the xbar chart.
+
+        Parameters
+        ----------
+        datasets : Dict[str, pd.DataFrame]
+            Data to plot index = Unit SN and column = 'Reading'
+            Dict key is location
+        test : pd.Series
+            series = Test_Name, Min_Tol, Max_Tol, Units
+        limits : Dict[str, pd.Series]
+            mean, MR, sigma, I_LCL, I_UCL and MR_UCL of each location
+        spec_limits : bool, optional
+            Plot the lsl and usl on the I chart, default is False
+        rules : Optional[Union[str, List[str]]], optional
+            Rule set or rules to highlight readings that break, checked
+            against the moving range sigma, default is None to not check
+        webgl_threshold : Optional[int], optional
+            Draw every location with WebGL when any has more points than
+            this, default is None to always use SVG
+        """
+        if not isinstance(datasets, dict):
+            self.log.error(
+                f"{type(datasets)} passed to imr_plot, expected a dict"
+            )
+            raise ValueError
+
+        lsl = test["Min_Tol"]
+        usl = test["Max_Tol"]
+
+        self.set_subplots(
+            rows=2,
+            cols=max(len(datasets), 1),
+            shared_xaxes=True,
+            vertical_spacing=0.06,
+            row_heights=[0.65, 0.35],
+            column_titles=list(datasets),
+        )
+
+        scatter = SPCPlot.scatter_type(datasets, webgl_threshold)
+
+        for col, (location, data) in enumerate(datasets.items(), start=1):
+            colour = self.colour_list[(col - 1) % len(self.colour_list)]
+            limit = limits[location]
+
+            readings = data["Reading"].to_numpy(dtype=float)
+            ranges = np.abs(np.diff(readings, prepend=np.nan))
+
+            out_of_control = SPCPlot.out_of_tolerance(
+                readings, limit["I_LCL"], limit["I_UCL"]
+            )
+            if rules is not None:
+                out_of_control |= violations(
+                    readings, limit["mean"], limit["sigma"], rules
+                )
+
+            self.add_trace(
+                self.trace(
+                    scatter,
+                    x=data.index,
+                    y=readings,
+                    mode="lines+markers",
+                    name=location,
+                    marker_symbol=SPCPlot.oot_markers(readings, lsl, usl),
+                    marker_color=np.where(
+                        out_of_control, self.violation_colour, colour
+                    ),
+                    marker=dict(
+                        size=8, line=dict(width=1, color="DarkSlateGrey")
+                    ),
+                    legendgroup=location,
+                    line=dict(color=colour, width=2),
+                ),
+                row=1,
+                col=col,
+            )
+            self.add_trace(
+                self.trace(
+                    scatter,
+                    x=data.index,
+                    y=ranges,
+                    mode="lines+markers",
+                    name=f"{location} MR",
+                    marker_color=np.where(
+                        SPCPlot.out_of_tolerance(
+                            ranges, None, limit["MR_UCL"]
+                        ),
+                        self.violation_colour,
+                        colour,
+                    ),
+                    marker=dict(
+                        size=6, line=dict(width=1, color="DarkSlateGrey")
+                    ),
+                    legendgroup=location,
+                    showlegend=False,
+                    line=dict(color=colour, width=2),
+                ),
+                row=2,
+                col=col,
+            )
+
+            # Control limits, NaN when a location has too few readings
+            for row, centre in ((1, limit["mean"]), (2, limit["MR"])):
+                if not np.isnan(centre):
+                    self.add_hline(
+                        y=centre,
+                        row=row,
+                        col=col,
+                        line_color=colour,
+                        line_width=2,
+                        opacity=0.75,
+                        annotation_text=f"CL = {centre:.3g}",
+                        annotation_position="top right",
+                    )
+            for row, name, value, position in (
+                (1, "UCL", limit["I_UCL"], "top right"),
+                (1, "LCL", limit["I_LCL"], "bottom right"),
+                (2, "UCL", limit["MR_UCL"], "top right"),
+            ):
+                if not np.isnan(value):
+                    self.add_hline(
+                        y=value,
+                        row=row,
+                        col=col,
+                        line_dash="dash",
+                        line_color="#d62728",
+                        line_width=2,
+                        opacity=0.5,
+                        annotation_text=f"{name} = {value:.3g}",
+                        annotation_position=position,
+                    )
+
+            # Spec limits, ignore if np.nan (i.e left blank on input data)
+            if spec_limits:
+                for name, value, position in (
+                    ("lsl", lsl, "bottom right"),
+                    ("usl", usl, "top right"),
+                ):
+                    if not np.isnan(value):
+                        self.add_hline(
+                            y=value,
+                            row=1,
+                            col=col,
+                            line_dash="dot",
+                            annotation_text=name,
+                            annotation_position=position,
+                            line_color="#333F48",
+                            line_width=3,
+                            opacity=0.25,
+                        )
+
+            self.update_xaxes(row=2, col=col, title_text="Unit SN")
+
+        self.update_yaxes(
+            row=1, col=1, title_text=f"{test['Test_Name']}, {test['Units']}"
+        )
+        self.update_yaxes(row=2, col=1, title_text="Moving Range")
+        self.update_layout(
+            height=650,
+            showlegend=True,
+            legend=dict(
+                orientation="h", yanchor="bottom", y=1.05, xanchor="right", x=1
+            ),
+        )
+
+    def sn_axis(
+        self,
+        sn_order: pd.Index,
+        sn_range: Optional[Tuple[float, float]] = None,
+        n_ticks: int = 10,
+    ) -> None:
+        """Label a numeric x axis of SN positions with the Unit SN.
+
+        Parameters
+        ----------
+        sn_order : pd.Index
+            Order of Unit SN on the x axis
+        sn_range : Optional[Tuple[float, float]], optional
+            x axis range to show, default is every SN
+        n_ticks : int, optional
+            Number of SNs to label, by default 10
+        """
+        if len(sn_order) == 0:
+            return
+
+        start, stop = sn_range if sn_range else (0, len(sn_order) - 1)
+        ticks = np.unique(
+            np.linspace(
+                max(start, 0), min(stop, len(sn_order) - 1), n_ticks
+            ).round()
+        ).astype(np.int64)
+
+        self.update_xaxes(
+            tickmode="array",
+            tickvals=ticks,
+            ticktext=sn_order[ticks].astype(str),
+        )
+        if sn_range:
+            self.update_xaxes(range=list(sn_range))
+
+    def trace(self, trace_class: Any, **kwargs: Any) -> Any:
+        """Create a trace to add to the figure.
+
+        Parameters
+        ----------
+        trace_class : Any
+            plotly trace class, i.e. go.Scatter
+        **kwargs : Any
+            trace properties, validated if the figure is
+
+        Returns
+        -------
+        Any
+            trace object
+        """
+        return trace_class(_validate=self._validate, **kwargs)
+
+    @staticmethod
+    def scatter_type(
+        datasets: Dict[str, pd.DataFrame], webgl_threshold: Optional[int]
+    ) -> Any:
+        """Pick the scatter trace class for the datasets.
+
+        SVG gets slow in the browser past tens of thousands of points, so
+        switch to WebGL when any dataset has more than webgl_threshold.
+
+        Parameters
+        ----------
+        datasets : Dict[str, pd.DataFrame]
+            Data to plot, dict key is location
+        webgl_threshold : Optional[int]
+            Maximum points in one dataset for SVG, None to always use SVG
+
+        Returns
+        -------
+        Any
+            go.Scattergl or go.Scatter
+        """
+        if webgl_threshold is not None and any(
+            len(data) > webgl_threshold for data in datasets.values()
+        ):
+            return go.Scattergl
+
+        return go.Scatter
+
+    @staticmethod
+    def rule_violations(
+        readings: pd.Series,
+        rules: Union[str, List[str]],
+        means: Optional[Dict[str, float]],
+        sds: Optional[Dict[str, float]],
+        location: str,
+    ) -> np.ndarray:
+        """Flag the readings of one location that break the rules.
+
+        Parameters
+        ----------
+        readings : pd.Series
+            readings in the order plotted
+        rules : Union[str, List[str]]
+            rule set or rules, see rules.py
+        means : Optional[Dict[str, float]]
+            mean reading of each location, None to calculate it
+        sds : Optional[Dict[str, float]]
+            SD of the readings of each location, None to calculate it
+        location : str
+            location of the readings
+
+        Returns
+        -------
+        np.ndarray
+            boolean array, True where a reading breaks a rule
+        """
+        values = readings.to_numpy(dtype=float)
+        mean = means[location] if means is not None else np.nanmean(values)
+        sd = sds[location] if sds is not None else np.nanstd(values, ddof=1)
+
+        return violations(values, mean, sd, rules)
+
+    @staticmethod
+    def out_of_tolerance(
+        readings: Any, lsl: Optional[float], usl: Optional[float]
+    ) -> np.ndarray:
+        """Flag readings outside the tolerance limits.
+
+        A limit that is None or NaN (i.e left blank on input data) is not
+        applied, NaN readings are never out of tolerance.
+
+        Parameters
+        ----------
+        readings : Any
+            array like of readings
+        lsl : Optional[float]
+            lower spec limit
+        usl : Optional[float]
+            upper spec limit
+
+        Returns
+        -------
+        np.ndarray
+            boolean array, True where the reading is out of tolerance
+        """
+        values = np.asarray(readings, dtype=float)
+        oot = np.zeros(values.shape, dtype=bool)
+
+        # Comparisons against NaN are False so blank limits flag nothing
+        with np.errstate(invalid="ignore"):
+            if lsl is not None:
+                oot |= values < lsl
+            if usl is not None:
+                oot |= values > usl
+
+        return oot
+
+    @staticmethod
+    def oot_markers(
+        readings: Any, lsl: Optional[float], usl: Optional[float]
+    ) -> np.ndarray:
+        """Get the marker symbol for each reading.
+
+        Parameters
+        ----------
+        readings : Any
+            array like of readings
+        lsl : Optional[float]
+            lower spec limit
+        usl : Optional[float]
+            upper spec limit
+
+        Returns
+        -------
+        np.ndarray
+            "x" for out of tolerance readings, "circle" otherwise
+        """
+        return np.where(
+            SPCPlot.out_of_tolerance(readings, lsl, usl), "x", "circle"
+        )
+
+
+class SPCFigure(
+    SPCPlot, go.FigureWidget
+):  # pylint: disable=too-many-ancestors
+    """Extenstion of plotly's graphical object figurewidget library.
+
+    For use in notebooks, see SPCDictFigure for the dash app.
+    """
+
+    def __init__(
+        self, *args: str, title: Optional[str] = None, **kwargs: Any
+    ) -> None:
+        """Override __init__ method to add title at creation.
+
+        Parameters
+        ----------
+        *args : str
+            FigureWidget *args
+        title : Optional[str], optional
+            title to include on plot
+        **kwargs : Any
+            FigureWidget **kwargs
+        """
+        # self.log object
+        self.log: logging.Logger = logging.getLogger(__name__)
+
+        print(title)
+        super().__init__(*args, **kwargs)
+        self.update_layout(title_text=title, font_family="Arial")
+
+
+class SPCServerFigure(SPCPlot, go.Figure):
+    """SPC plots on a plain plotly figure, for figures sent to the browser.
+
+    Skips the widget machinery of FigureWidget and plotly's property
+    validation, the dash app only turns the figure in to JSON.
+    """
+
+    def __init__(
+        self, *args: str, title: Optional[str] = None, **kwargs: Any
+    ) -> None:
+        """Override __init__ method to add title at creation.
+
+        Parameters
+        ----------
+        *args : str
+            Figure *args
+        title : Optional[str], optional
+            title to include on plot
+        **kwargs : Any
+            Figure **kwargs, validation is off unless _validate is passed
+        """
+        kwargs.setdefault("_validate", False)
+        super().__init__(*args, **kwargs)
+        self.update_layout(title_text=title, font_family="Arial")
+
+
+class SPCDictFigure(SPCPlot):
+    """SPC plots built straight in to a figure dict, for the dash app.
+
+    Traces, shapes and annotations are plain dicts, so none of plotly's
+    property validation or axis spanning shape handling is run, and the
+    figure is serialised with orjson when it is installed. The JSON is
+    the same as SPCFigure and SPCServerFigure give for the same plot.
+
+    Only the parts of the plotly figure API SPCPlot uses are provided.
+
+    Attributes
+    ----------
+    data : List[Dict[str, Any]]
+        traces
+    layout : Dict[str, Any]
+        figure layout, including the default template
+    """
+
+    _validate = False
+
+    def __init__(self, title: Optional[str] = None) -> None:
+        """Create an empty figure with a title.
+
+        Parameters
+        ----------
+        title : Optional[str], optional
+            title to include on plot
+        """
+        self.data: List[Dict[str, Any]] = []
+        self._axes: Dict[Tuple[int, int], Tuple[str, str]] = {}
+        self.layout: Dict[str, Any] = {
+            "template": SPCDictFigure.template(pio.templates.default)
+        }
+        self.update_layout(title_text=title, font_family="Arial")
+
+    def trace(self, trace_class: Any, **kwargs: Any) -> Dict[str, Any]:
+        """Create a trace dict to add to the figure.
+
+        Parameters
+        ----------
+        trace_class : Any
+            plotly trace class, i.e. go.Scatter, only used for its type
+        **kwargs : Any
+            trace properties, magic underscores are expanded
+
+        Returns
+        -------
+        Dict[str, Any]
+            trace dict
+        """
+        return {"type": trace_class._path_str, **expand(kwargs)}
+
+    def set_subplots(self, rows: int, cols: int, **kwargs: Any) -> None:
+        """Lay the figure out as a grid of subplots.
+
+        Parameters
+        ----------
+        rows : int
+            rows of subplots
+        cols : int
+            columns of subplots
+        **kwargs : Any
+            make_subplots arguments, i.e. shared_xaxes, must be JSON
+        """
+        layout, self._axes = SPCDictFigure.subplots(
+            rows, cols, json.dumps(kwargs, sort_keys=True)
+        )
+        merge(self.layout, copy.deepcopy(layout))
+
+    def add_trace(
+        self,
+        trace: Dict[str, Any],
+        row: Optional[int] = None,
+        col: Optional[int] = None,
+    ) -> None:
+        """Add a trace to the figure.
+
+        Parameters
+        ----------
+        trace : Dict[str, Any]
+            trace dict, see trace
+        row : Optional[int], optional
+            subplot row, 1 is the top, default is to not use subplots
+        col : Optional[int], optional
+            subplot column, 1 is the left
+        """
+        if row is not None and col is not None:
+            xaxis, yaxis = self._axes[(row, col)]
+            trace.update(xaxis=axis_id(xaxis), yaxis=axis_id(yaxis))
+
+        self.data.append(trace)
+
+    def add_hline(
+        self,
+        y: float,
+        row: Optional[int] = None,
+        col: Optional[int] = None,
+        **kwargs: Any,
+    ) -> None:
+        """Add a horizontal line across the plot.
+
+        Parameters
+        ----------
+        y : float
+            y of the line
+        row : Optional[int], optional
+            subplot row, default is to not use subplots
+        col : Optional[int], optional
+            subplot column
+        **kwargs : Any
+            shape properties, annotation_ properties for its label
+        """
+        self._add_spanning_shape(
+            "hline",
+            dict(type="line", x0=0, x1=1, y0=y, y1=y),
+            kwargs,
+            row,
+            col,
+        )
+
+    def add_hrect(
+        self,
+        y0: float,
+        y1: float,
+        row: Optional[int] = None,
+        col: Optional[int] = None,
+        **kwargs: Any,
+    ) -> None:
+        """Add a rectangle across the plot.
+
+        Parameters
+        ----------
+        y0 : float
+            bottom of the rectangle
+        y1 : float
+            top of the rectangle
+        row : Optional[int], optional
+            subplot row, default is to not use subplots
+        col : Optional[int], optional
+            subplot column
+        **kwargs : Any
+            shape properties, annotation_ properties for its label
+        """
+        self._add_spanning_shape(
+            "hrect",
+            dict(type="rect", x0=0, x1=1, y0=y0, y1=y1),
+            kwargs,
+            row,
+            col,
+        )
+
+    def update_layout(self, **kwargs: Any) -> None:
+        """Update the layout, magic underscores are expanded.
+
+        Parameters
+        ----------
+        **kwargs : Any
+            layout properties
+        """
+        merge(self.layout, expand(kwargs))
+
+    def update_xaxes(
+        self,
+        row: Optional[int] = None,
+        col: Optional[int] = None,
+        **kwargs: Any,
+    ) -> None:
+        """Update the x axis, or that of one subplot.
+
+        Parameters
+        ----------
+        row : Optional[int], optional
+            subplot row, default is the first x axis
+        col : Optional[int], optional
+            subplot column
+        **kwargs : Any
+            axis properties, magic underscores are expanded
+        """
+        xaxis = "xaxis"
+        if row is not None and col is not None:
+            xaxis = self._axes[(row, col)][0]
+
+        self.update_layout(**{xaxis: expand(kwargs)})
+
+    def update_yaxes(
+        self,
+        row: Optional[int] = None,
+        col: Optional[int] = None,
+        **kwargs: Any,
+    ) -> None:
+        """Update the y axis, or that of one subplot.
+
+        Parameters
+        ----------
+        row : Optional[int], optional
+            subplot row, default is the first y axis
+        col : Optional[int], optional
+            subplot column
+        **kwargs : Any
+            axis properties, magic underscores are expanded
+        """
+        yaxis = "yaxis"
+        if row is not None and col is not None:
+            yaxis = self._axes[(row, col)][1]
+
+        self.update_layout(**{yaxis: expand(kwargs)})
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the figure as a dict, arrays are not converted.
+
+        Returns
+        -------
+        Dict[str, Any]
+            data and layout
+        """
+        return {"data": self.data, "layout": self.layout}
+
+    def to_json(self, validate: bool = False) -> str:
+        """Serialise the figure.
+
+        Parameters
+        ----------
+        validate : bool, optional
+            ignored, there is nothing to validate, same signature as
+            go.Figure.to_json
+
+        Returns
+        -------
+        str
+            figure JSON
+        """
+        return dumps(self.to_dict())
+
+    def _add_spanning_shape(
+        self,
+        shape_type: str,
+        shape_args: Dict[str, Any],
+        kwargs: Dict[str, Any],
+        row: Optional[int] = None,
+        col: Optional[int] = None,
+    ) -> None:
+        """Add a shape spanning the x axis and its annotation.
+
+        Matches go.Figure.add_hline/add_hrect on one subplot, or on a
+        figure without subplots, the annotation is placed by plotly's own
+        rules.
+
+        Parameters
+        ----------
+        shape_type : str
+            hline or hrect
+        shape_args : Dict[str, Any]
+            type and position of the shape
+        kwargs : Dict[str, Any]
+            shape properties, annotation_ properties for its label
+        row : Optional[int], optional
+            subplot row, default is to not use subplots
+        col : Optional[int], optional
+            subplot column
+        """
+        shape_kwargs, annotation_kwargs = (
+            shapeannotation.split_dict_by_key_prefix(kwargs, "annotation_")
+        )
+        annotation = shapeannotation.axis_spanning_shape_annotation(
+            None, shape_type, shape_args, annotation_kwargs
+        )
+
+        shape = expand({**shape_args, **shape_kwargs})
+        if row is not None and col is not None:
+            xref, shape["yref"] = map(axis_id, self._axes[(row, col)])
+        else:
+            xref = "x"
+            shape.setdefault("yref", "y")
+        shape["xref"] = f"{xref} domain"
+        self.layout.setdefault("shapes", []).append(shape)
+
+        if annotation is not None:
+            annotation = expand(annotation)
+            annotation.setdefault("yref", shape["yref"])
+            annotation["xref"] = f"{xref} domain"
+            self.layout.setdefault("annotations", []).append(annotation)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def subplots(
+        rows: int, cols: int, kwargs: str
+    ) -> Tuple[Dict[str, Any], Dict[Tuple[int, int], Tuple[str, str]]]:
+        """Get the layout of a grid of subplots, made once.
+
+        Parameters
+        ----------
+        rows : int
+            rows of subplots
+        cols : int
+            columns of subplots
+        kwargs : str
+            JSON of the other make_subplots arguments
+
+        Returns
+        -------
+        Tuple[Dict[str, Any], Dict[Tuple[int, int], Tuple[str, str]]]
+            layout without a template, shared so must not be changed, and
+            the x and y axis of each subplot, key is (row, col)
+        """
+        fig = make_subplots(rows, cols, **json.loads(kwargs))
+
+        layout = fig.layout.to_plotly_json()
+        layout.pop("template", None)
+
+        axes = {}
+        for row in range(1, rows + 1):
+            for col in range(1, cols + 1):
+                subplot = fig.get_subplot(row, col)
+                axes[(row, col)] = (
+                    subplot.xaxis.plotly_name,
+                    subplot.yaxis.plotly_name,
+                )
+
+        return layout, axes
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def template(name: str) -> Dict[str, Any]:
+        """Get a plotly template as a dict, looked up once.
+
+        Parameters
+        ----------
+        name : str
+            name of the template in pio.templates
+
+        Returns
+        -------
+        Dict[str, Any]
+            template, shared by every figure so must not be changed
+        """
+        return pio.templates[name].to_plotly_json()
+
+
+def axis_id(name: str) -> str:
+    """Get the id traces and shapes use for an axis.
+
+    Parameters
+    ----------
+    name : str
+        layout name of the axis, i.e. xaxis2
+
+    Returns
+    -------
+    str
+        i.e. x2
+    """
+    return name.replace("axis", "")
+
+
+def expand(props: Dict[str, Any]) -> Dict[str, Any]:
+    """Expand plotly's magic underscores in to nested dicts.
+
+    i.e. {"marker_symbol": "x"} is {"marker": {"symbol": "x"}}, every
+    property SPCPlot sets is a path when split on underscores. Only the
+    keys of props are expanded, dict values are taken as they are, so
+    data such as layout.meta is left alone.
+
+    Parameters
+    ----------
+    props : Dict[str, Any]
+        properties
+
+    Returns
+    -------
+    Dict[str, Any]
+        nested properties
+    """
+    expanded: Dict[str, Any] = {}
+    for key, value in props.items():
+        *path, name = key.split("_")
+        node = expanded
+        for part in path:
+            node = node.setdefault(part, {})
+        merge(node, {name: value})
+
+    return expanded
+
+
+def merge(target: Dict[str, Any], update: Dict[str, Any]) -> None:
+    """Recursively update a nested dict in place.
+
+    Parameters
+    ----------
+    target : Dict[str, Any]
+        dict to update
+    update : Dict[str, Any]
+        values to set, dicts are merged in to dicts already in target
+    """
+    for key, value in update.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            merge(target[key], value)
+        else:
+            target[key] = value
+
+
+def dumps(obj: Any) -> str:
+    """Serialise a figure dict, or part of one, to JSON.
+
+    Uses orjson when it is installed, numpy and pandas arrays become
+    lists and NaN becomes null either way.
+
+    Parameters
+    ----------
+    obj : Any
+        figure dict
+
+    Returns
+    -------
+    str
+        JSON
+    """
+    if orjson is None:
+        return json.dumps(obj, cls=plotly.utils.PlotlyJSONEncoder)
+
+    return orjson.dumps(
+        obj, default=to_list, option=orjson.OPT_SERIALIZE_NUMPY
+    ).decode()
+
+
+def to_list(obj: Any) -> Any:
+    """Convert what orjson can not serialise, i.e. pandas or string arrays.
+
+    Parameters
+    ----------
+    obj : Any
+        value orjson has no encoder for
+
+    Returns
+    -------
+    Any
+        list of the values
+
+    Raises
+    ------
+    TypeError
+        obj is not array like
+    """
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
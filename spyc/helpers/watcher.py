@@ -0,0 +1,186 @@
+"""Watch a directory for changes to part data sources.
+
+Polls the directory and compares snapshots of the size and mtime of every
+source, so it works the same on local and network drives.
+"""
+
+# Imports
+
+import os
+import logging
+import threading
+from typing import Dict, List, Tuple, Callable, Optional, Any
+from .readers import find_sources
+
+# Added, modified and deleted sources
+Changes = Tuple[List[str], List[str], List[str]]
+
+
+class DirectoryWatcher:
+    """Poll a directory for added, modified and deleted part data sources.
+
+    A change is only reported once the source has looked the same for two
+    polls in a row, so files that are still being written are not read.
+
+    Attributes
+    ----------
+    dirpath : str
+        directory being watched
+    interval : float
+        seconds between polls
+    callback : Optional[Callable[[List[str], List[str], List[str]], Any]]
+        called with added, modified and deleted sources when there are
+        changes, only used when running in a thread
+    log : logging.Logger
+        logging object
+    snapshot : Dict[str, Any]
+        signature of each source as last reported
+    """
+
+    def __init__(
+        self,
+        dirpath: str,
+        interval: float = 5.0,
+        callback: Optional[
+            Callable[[List[str], List[str], List[str]], Any]
+        ] = None,
+    ) -> None:
+        """Take the initial snapshot of the directory.
+
+        Parameters
+        ----------
+        dirpath : str
+            directory to watch, made absolute so sources match
+            PartNumber.filepath
+        interval : float, optional
+            seconds between polls, by default 5
+        callback : Optional[Callable], optional
+            called with added, modified and deleted sources when running
+            in a thread
+        """
+        self.log: logging.Logger = logging.getLogger(__name__)
+
+        self.dirpath = os.path.abspath(dirpath)
+        self.interval = interval
+        self.callback = callback
+
+        self.snapshot: Dict[str, Any] = self.scan()
+        self._last_scan = dict(self.snapshot)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def scan(self) -> Dict[str, Any]:
+        """Get the signature of every source in the directory.
+
+        Returns
+        -------
+        Dict[str, Any]
+            signature of each source, key is the path
+        """
+        signatures = {}
+        for path in find_sources(self.dirpath):
+            try:
+                signatures[path] = DirectoryWatcher.signature(path)
+            except OSError:
+                # deleted while scanning
+                continue
+
+        return signatures
+
+    @staticmethod
+    def signature(path: str) -> Any:
+        """Get the size and mtime of a source.
+
+        Parameters
+        ----------
+        path : str
+            xlsx file or directory of tables
+
+        Returns
+        -------
+        Any
+            comparable signature, changes when the source does
+        """
+        if os.path.isdir(path):
+            return tuple(
+                (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+                for entry in sorted(os.scandir(path), key=lambda e: e.name)
+                if entry.is_file()
+            )
+
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def poll(self) -> Changes:
+        """Scan the directory and report changes since the last poll.
+
+        Returns
+        -------
+        Changes
+            added, modified and deleted sources
+        """
+        scan = self.scan()
+
+        # Only trust signatures that have not changed since the last scan
+        stable = {
+            path: sig
+            for path, sig in scan.items()
+            if self._last_scan.get(path) == sig
+        }
+        gone = [
+            path
+            for path in self.snapshot
+            if path not in scan and path not in self._last_scan
+        ]
+        self._last_scan = scan
+
+        added = [path for path in stable if path not in self.snapshot]
+        modified = [
+            path
+            for path, sig in stable.items()
+            if path in self.snapshot and self.snapshot[path] != sig
+        ]
+
+        for path in added + modified:
+            self.snapshot[path] = stable[path]
+        for path in gone:
+            del self.snapshot[path]
+
+        if added or modified or gone:
+            self.log.info(
+                f"{len(added)} added, {len(modified)} modified and"
+                f" {len(gone)} deleted in {self.dirpath}"
+            )
+
+        return added, modified, gone
+
+    def start(self) -> None:
+        """Poll in a background thread, calling callback on changes."""
+        if self._thread is not None:
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self.run, name="spyc-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def run(self) -> None:
+        """Poll until stopped, calling callback with any changes."""
+        while not self._stop.wait(self.interval):
+            try:
+                added, modified, deleted = self.poll()
+
+                if (added or modified or deleted) and self.callback:
+                    self.callback(added, modified, deleted)
+
+            except Exception as e:
+                # Keep watching, the next poll may work
+                self.log.error(f"Failed to refresh {self.dirpath}\n{e}")
@@ -1,7 +1,21 @@
 """SPYC (pronounced spicy).
   
   Usage:
-      spyc plot <dir> [--verbose|--debug]
+      spyc plot <dir> [--workers=<n>] [--cache=<path>|--no-cache]
+                [--lazy [--max-loaded=<n>]] [--engine=<name>]
+                [--watch [--poll=<s>]] [--fig-cache=<mb>]
+                [--plot-workers=<n>] [--verbose|--debug]
+      spyc summary <dir> [--workers=<n>] [--cache=<path>|--no-cache]
+                [--engine=<name>] [--verbose|--debug]
+      spyc export <dir> <out> [--format=<list>] [--options=<list>]
+                [--workers=<n>] [--cache=<path>|--no-cache]
+                [--engine=<name>] [--verbose|--debug]
+      spyc report <dir> <out> [--options=<list>] [--workers=<n>]
+                [--cache=<path>|--no-cache] [--engine=<name>]
+                [--verbose|--debug]
+      spyc rules <dir> <out> [--rules=<list>] [--workers=<n>]
+                [--cache=<path>|--no-cache] [--engine=<name>]
+                [--verbose|--debug]
       spyc -h | --help
       spyc --version
   
@@ -10,468 +24,194 @@
       --version              Show version.
       -v --verbose           Verbose
       -d --debug             Debug Output
+      -w --workers=<n>       Processes used to read data files, or to
+                             export, report on or check parts, 0 to use
+                             all CPUs [default: 1]
+      -c --cache=<path>      Directory to cache parsed data files in
+                             [default: ~/.spyc_cache]
+      --no-cache             Always read from the data files
+      -l --lazy              Only read the header of each data file at
+                             startup, the rest when a part is selected
+      --max-loaded=<n>       Parts kept fully loaded with --lazy
+                             [default: 10]
+      -e --engine=<name>     Excel reader, pandas or streaming (lower
+                             memory for large sheets) [default: pandas]
+      --watch                Reload data files that change while running
+      --poll=<s>             Seconds between checks with --watch
+                             [default: 5]
+      --fig-cache=<mb>       Memory for figures already plotted, 0 to
+                             always plot again [default: 256]
+      --plot-workers=<n>     Processes plotting figures in the background,
+                             0 to plot in the web server [default: 2]
+      -f --format=<list>     Comma separated formats to export, html, png
+                             and/or svg (needs kaleido) [default: html]
+      --options=<list>       Comma separated xbar options to export or
+                             report, i.e. meanline,violin [default: meanline]
+      --rules=<list>         Comma separated rule sets, western_electric
+                             and/or nelson, or rules to check
+                             [default: western_electric]
   
   Attributes:
-      arguments (TYPE): Description
-      console (TYPE): Description
-      external_stylesheets (list): Description
-      log (TYPE): Description
+      log (logging.Logger): Logger of the cli, the commands import their
+          modules when they are run so importing spyc.main stays cheap
   
   """  # noqa
 
 # Imports
 
-import os
-import glob
 import logging
-from typing import List, Dict, Any, Union
-import json
+from typing import Any, Dict, List, Optional
 
 from mainentry import entry
 from docopt import docopt  # type: ignore
 
-# import pandas as pd  # type: ignore
-
-import dash  # type: ignore
-import dash_core_components as dcc  # type: ignore
-import dash_html_components as html  # type: ignore
-from dash.dependencies import Input, Output  # type: ignore
-
 # these imports will not work if ran as a script
 # use python -m main
 from .__init__ import __version__  # type: ignore
-from .helpers.partnumber import PartNumber
-from .helpers.spcfigure import SPCFigure
 
 # create logger
 log = logging.getLogger(__name__)
 
-# Argument handling and setup
-arguments = docopt(__doc__, version=f"SPYC {__version__}")
 
-external_stylesheets = ["https://codepen.io/chriddyp/pen/bWLwgP.css"]
+def setup_logging(verbose: bool, debug: bool) -> None:
+    """Manage verbose and debug output levels.
 
-# Get plot options from json source file
-with open("spyc/plot_options.json") as f:
-    plot_types: Dict[str, Any] = json.load(f)
+    Args:
+        verbose (bool): Log info messages
+        debug (bool): Log debug messages
+    """
+    if verbose:
+        logging.basicConfig(format="%(levelname)s: %(message)s", level=20)
 
-# Manage verbose and debug output levels
-if arguments["--verbose"]:
-    logging.basicConfig(format="%(levelname)s: %(message)s", level=20)
+    elif debug:
+        # set to debug level
+        logging.basicConfig(format="%(levelname)s: %(message)s", level=10)
+    else:
+        # Set logging threshold at info
+        logging.basicConfig(format="%(levelname)s: %(message)s", level=30)
 
-elif arguments["--debug"]:
-    # set to debug level
-    logging.basicConfig(format="%(levelname)s: %(message)s", level=10)
-else:
-    # Set logging threshold at info
-    logging.basicConfig(format="%(levelname)s: %(message)s", level=30)
 
+def run(arguments: Dict[str, Any]) -> None:
+    """Run the command passed.
 
-def make_parts(filepath: str) -> Dict[str, PartNumber]:
-    """Create list of parts in the target directory.
+    dash, plotly and pandas are only imported here, by the commands that
+    use them, so --help and --version return straight away.
 
     Args:
-        filepath (str): Directory to look within
-
-    Returns:
-        Dict[str, PartNumber]: Partslist, key is part number string
-
-    Raises:
-        ValueError: Description
+        arguments (Dict[str, Any]): Arguments parsed by docopt
     """
-    if not os.path.isabs(filepath):
+    if arguments["plot"]:
+        log.debug("Plot command")
 
-        filepath = os.path.abspath(filepath)
-        log.debug(f"dir input is not absolute, new dir is: {filepath}")
+        from .app import dash_app
 
-    log.debug(f"Looking in dir: {filepath}")
+        # Launch dash app
+        dash_app(
+            filepath=arguments["<dir>"],
+            debug=arguments["--debug"],
+            workers=int(arguments["--workers"]),
+            cache_dir=(
+                None if arguments["--no-cache"] else arguments["--cache"]
+            ),
+            lazy=arguments["--lazy"],
+            max_loaded=int(arguments["--max-loaded"]),
+            engine=arguments["--engine"],
+            watch=float(arguments["--poll"]) if arguments["--watch"] else None,
+            fig_cache=int(float(arguments["--fig-cache"]) * 1e6),
+            plot_workers=int(arguments["--plot-workers"]),
+        )
 
-    # Look up xlsx file in the specified directory
-    data_files = glob.glob(f"{filepath}/*.xlsx")
+    elif arguments["summary"]:
+        log.debug("Summary command")
 
-    log.info(f"{len(data_files)} files found in {filepath}")
+        from .app import summary_app
 
-    # create Part_Number Object for each file
-    parts = {}
-    for file in data_files:
-        log.debug(f"Reading from {file}")
-        try:
-            part = PartNumber(file)
-            if part.header["Part Number"] in parts:
-                raise ValueError(
-                    "Duplicate PN in source directory,"
-                    f" {part.header['Part Number']}"
-                )
-            parts[part.header["Part Number"]] = part
-        except ValueError as e:
-            log.warning(e)
+        summary_app(
+            filepath=arguments["<dir>"],
+            debug=arguments["--debug"],
+            workers=int(arguments["--workers"]),
+            cache_dir=(
+                None if arguments["--no-cache"] else arguments["--cache"]
+            ),
+            engine=arguments["--engine"],
+        )
 
-    return parts
+    elif arguments["export"]:
+        log.debug("Export command")
+
+        from .export import export_parts
+
+        export_parts(
+            filepath=arguments["<dir>"],
+            out=arguments["<out>"],
+            formats=split_list(arguments["--format"]),
+            options=split_list(arguments["--options"]),
+            workers=int(arguments["--workers"]),
+            cache_dir=(
+                None if arguments["--no-cache"] else arguments["--cache"]
+            ),
+            engine=arguments["--engine"],
+        )
 
+    elif arguments["report"]:
+        log.debug("Report command")
 
-def dash_app(filepath: str, debug: bool = False):
-    """Create a dash app.
+        from .report import report_parts
 
-    Args:
-        filepath (str): Description
-        debug (bool, optional): Description
+        report_parts(
+            filepath=arguments["<dir>"],
+            out=arguments["<out>"],
+            options=split_list(arguments["--options"]),
+            workers=int(arguments["--workers"]),
+            cache_dir=(
+                None if arguments["--no-cache"] else arguments["--cache"]
+            ),
+            engine=arguments["--engine"],
+        )
 
-    Raises:
-        FileNotFoundError: Description
-    """
-    app = dash.Dash(
-        __name__, external_stylesheets=external_stylesheets, title="SPYC"
-    )
-    app.config["suppress_callback_exceptions"] = True
+    elif arguments["rules"]:
+        log.debug("Rules command")
 
-    # Get PartNumber objects
-    part_dict = make_parts(filepath)
+        from .violations import violation_parts
 
-    if not part_dict:
-        raise FileNotFoundError(
-            f"No Parts generated from dir = {arguments['<dir>']}"
+        violation_parts(
+            filepath=arguments["<dir>"],
+            out=arguments["<out>"],
+            rules=split_list(arguments["--rules"]),
+            workers=int(arguments["--workers"]),
+            cache_dir=(
+                None if arguments["--no-cache"] else arguments["--cache"]
+            ),
+            engine=arguments["--engine"],
         )
 
-    # Build dict for part selection drop down
-    part_dd_options = []
-    for pn in list(part_dict.keys()):
-
-        part_dd_options.append({"label": pn, "value": pn})
-
-    # Elements to always display. The rest are generate by the code
-    disp_elements = [
-        html.H1(children="SPYC"),
-        dcc.Dropdown(
-            id="part_dd",
-            options=part_dd_options,
-            placeholder="Select a Part Number",
-            clearable=True,
-        ),
-        html.Div(id="loc_title"),
-        dcc.Checklist(id="loc_dd", labelStyle={"display": "inline-block"}),
-        dcc.Dropdown(
-            id="test_dd",
-            placeholder="Select tests to plot, leave blank to plot all",
-            multi=True,
-            clearable=True,
-        ),
-        dcc.RadioItems(id="plot_dd", labelStyle={"display": "inline-block"}),
-        html.Div(id="cap_title"),
-        dcc.RadioItems(
-            id="cap_dd", labelStyle={"display": "inline-block"}, value="None"
-        ),
-        html.Div(id="option_title"),
-        dcc.Checklist(id="option_dd", labelStyle={"display": "inline-block"}),
-        html.Div(id="fig_container"),
-    ]
-
-    @app.callback(Output("loc_title", "children"), Input("part_dd", "value"))
-    def show_loc_title(pn: str) -> str:
-        """Show location title only if PN is selected.
-
-        Args:
-            pn (str): pn to plot
-
-        Returns:
-            str: location title
-        """
-        if pn:
-            return "Plot data for:"
-        return ""
-
-    @app.callback(
-        Output("cap_title", "children"),
-        [Input("part_dd", "value"), Input("plot_dd", "value")],
-    )
-    def show_cap_title(pn: str, ptype: str) -> str:
-        """Show capability title only if PN is selected and plot allows capability.
-
-        Args:
-            pn (str): pn to plot
-            ptype (str): plot type
-
-        Returns:
-            str: Capability title
-        """
-        if pn and ptype:
-            if plot_types[ptype]["capability"]:
-                return "Measure capability from:"
-        return ""
-
-    @app.callback(
-        Output("option_title", "children"), Input("plot_dd", "value")
-    )
-    def show_option_title(ptype: str) -> str:
-        """Show option title only if PN is selected.
-
-        Args:
-            ptype (str): plot type
-
-        Returns:
-            str: plot options title
-        """
-        # only disaply if the plot type has options
-        if ptype and len(plot_types[ptype]["options"]) > 0:
-            return "Plot Options:"
-        return ""
-
-    @app.callback(Output("loc_dd", "options"), [Input("part_dd", "value")])
-    def get_loc(value: str) -> List[Dict[str, str]]:
-        """Display graphs selected by part number dropdown.
-
-        Parameters
-        ----------
-        value : str
-            part number
-
-        Returns
-        -------
-        List[Dict[str:str]]
-            checklist options for locations
-        """
-        loc_dd_options = []
-
-        if value is not None:
-
-            part = part_dict[value]
-
-            # build dict for part slection drop down
-
-            for loc in list(part.data.keys()):
-                loc_dd_options.append({"label": loc, "value": loc})
-
-            return loc_dd_options
-        return []
-
-    @app.callback(Output("test_dd", "options"), [Input("part_dd", "value")])
-    def get_test_id(pn: str) -> List[Dict[str, str]]:
-        """Display plot types avaialable.
-
-        Parameters
-        ----------
-        pn: str
-            Part Number to plot
-
-        Returns
-        -------
-        List[Dict[str,str]]
-            Dropdown options for tests types
-        """
-        if pn:
-            test_dd_options = []
-            # get part
-            part = part_dict[pn]
-
-            for test_id in part.tests.index.get_level_values(0).unique():
-                test_dd_options.append(
-                    {
-                        "label": part.tests.loc[test_id]["Test_Name"],
-                        "value": test_id,
-                    }
-                )
-
-            return test_dd_options
-
-        return []
-
-    @app.callback(Output("plot_dd", "options"), [Input("loc_dd", "value")])
-    def get_plot_type(locs: List[str]) -> List[Dict[str, str]]:
-        """Display plot types avaialable.
-
-        Parameters
-        ----------
-        locs: List[str]
-            List of Locations selected
-
-        Returns
-        -------
-        List[Dict[str,str]]
-            Radio options for plot types
-        """
-        if locs:
-            plot_dd_options = []
-            for ptype in plot_types:
-                # Filter Plot Options Based On Maximum # Locations to plot
-                max_locs = plot_types[ptype]["max_locs"]
-
-                if max_locs is None or max_locs >= len(locs):
-                    plot_dd_options.append({"label": ptype, "value": ptype})
-
-            return plot_dd_options
-
-        return []
-
-    @app.callback(
-        Output("cap_dd", "options"),
-        [Input("loc_dd", "value"), Input("plot_dd", "value")],
-    )
-    def get_capability_loc(
-        locs: List[str], ptype: str
-    ) -> List[Dict[str, str]]:
-        """Display plot types avaialable.
-
-        Parameters
-        ----------
-        locs: List[str]
-            List of Locations selected
-        ptype: str
-            Selected plot type
-
-        Returns
-        -------
-        List[Dict[str,str]]
-            Radio options for capability location
-        """
-        if locs and ptype and plot_types[ptype]["capability"]:
-            cap_dd_options = [{"label": "None", "value": "None"}]
-
-            for loc in locs:
-                cap_dd_options.append({"label": loc, "value": loc})
-
-            return cap_dd_options
-
-        return []
-
-    @app.callback(Output("option_dd", "options"), Input("plot_dd", "value"))
-    def get_options(ptype: str) -> List[Dict[str, str]]:
-        """Display plot types avaialable.
-
-        Parameters
-        ptype: str
-            Selected plot type
-
-        Returns
-        -------
-        List[Dict[str,str]]
-            Checklist options for plot options
-        """
-        if ptype and len(plot_types[ptype]["options"]) > 0:
-            option_dd_options = []
-
-            for option in plot_types[ptype]["options"]:
-                print(option)
-                option_dd_options.append({"label": option, "value": option})
-
-            return option_dd_options
-
-        return []
-
-    @app.callback(
-        Output("fig_container", "children"),
-        [
-            Input("part_dd", "value"),
-            Input("loc_dd", "value"),
-            Input("plot_dd", "value"),
-            Input("test_dd", "value"),
-            Input("cap_dd", "value"),
-            Input("option_dd", "value"),
-        ],
-    )
-    def plot_figure(
-        pn: str,
-        locs: List[str],
-        ptype: str,
-        test_id: Union[List[str], None],
-        capability_loc: Union[str, None],
-        options: Union[List[str], None],
-    ):
-        """Plot the figures.
-
-        Args:
-            pn (str): Part Number to plot
-            locs (List[str]): Locations to plot
-            ptype (str): Type of plot
-            test_id (Union[List[str], None]): Tests to plot
-            capability_loc (str): Location to calculate cpability for
-            options (List(str)): options selected by the user
-
-        Returns:
-            List[Any]: Elements to display
-        """
-        # Get all inputs first (except test_id as that can be None)
-        if locs and pn and ptype:
-
-            # if test_id is empty then change to None
-            if not test_id:
-                test_id = None
-
-            # get part
-            part = part_dict[pn]
-
-            # Convert "None" option to NoneType
-            if capability_loc == "None":
-                capability_loc = None
-
-            # handle no options slected case
-            if options is None:
-                options = []
-
-            elements = []
-
-            for title, fig in plot_factory(
-                part, ptype, locs, test_id, capability_loc, options
-            ).items():
-                if fig is not None:
-                    elements.append(
-                        dcc.Graph(
-                            id=title, figure=fig, config={"displaylogo": False}
-                        )
-                    )
-                    elements.append(html.Hr())
-
-            return elements
-
-    app.layout = html.Div(children=disp_elements)
-
-    app.run_server(debug=debug)
-
-
-def plot_factory(
-    part: PartNumber,
-    plot_type: str,
-    locations: Union[List[str], None],
-    test_id: Union[List[str], str, None],
-    capability_loc: Union[str, None],
-    options: List[str],
-) -> Union[Dict[str, SPCFigure], Dict[None, None]]:
-    """Create plot using parameters from the dash interface.
+
+def split_list(value: str) -> List[str]:
+    """Split a comma separated option.
 
     Args:
-        part (PartNumber): PartNubmer object to plot for object
-        plot_type (str): Type of plot
-        locations (Union[List[str], None]): List of locations to plot for
-        test_id (Union[List[str], str]): Test_ids to plot for
-        capability_loc (str): Lcoation to calcualte capability for
+        value (str): Option value, i.e. "html,png"
+
+    Returns:
+        List[str]: Items, blanks removed
     """
-    # Select plot type
-    if plot_type == "xbar":
-
-        # Plots for all sites all tests,
-        # calculate capability for Portland
-        return part.xbar(
-            location=locations,
-            test_id=test_id,
-            capability_loc=capability_loc,
-            meanline="meanline" in options,
-            violin="violin" in options,
-        )
-    else:
-        return {None: None}
+    return [item.strip() for item in value.split(",") if item.strip()]
 
 
 @entry
-def main():
-    """Read user input from cli and call plot functions as required."""
-    # Run command passed
-    if arguments["plot"]:
-        log.debug("Plot command")
-
-        # Launch dash app
-        dash_app(filepath=arguments["<dir>"], debug=arguments["--debug"])
+def main(argv: Optional[List[str]] = None):
+    """Read user input from cli and call plot functions as required.
 
-
-# Catch exceptions to use them as breakpoints
-try:
-    main()
-except Exception as e:
-    log.error(e)
+    Args:
+        argv (Optional[List[str]], optional): Arguments, default is
+            sys.argv
+    """
+    # Argument handling and setup
+    arguments = docopt(__doc__, argv=argv, version=f"SPYC {__version__}")
+    setup_logging(arguments["--verbose"], arguments["--debug"])
+
+    # Catch exceptions to use them as breakpoints
+    try:
+        run(arguments)
+    except Exception as e:
+        log.error(e)
@@ -0,0 +1,330 @@
+"""One HTML report per part with the xbar chart of every test.
+
+A report is a single HTML file, <out>/<Part Number>.html, with the part
+header, the capability table and a chart for each test. Every report in
+<out> loads one shared copy of plotly.js.
+
+To keep reports small the plotly template is written once per report
+rather than once per chart, and numeric trace data is written as base64
+typed arrays (plotly.js bdata) instead of JSON numbers. plotly.js only
+reads typed arrays from v2.28, so with an older plotly installed the
+data is written as plain lists instead.
+
+Charts are only drawn when they are scrolled in to view, so a report of
+hundreds of tests opens quickly.
+"""
+
+# Imports
+
+import os
+import html
+import base64
+import logging
+from string import Template
+from typing import List, Dict, Any, Iterable, Optional
+
+import numpy as np
+import pandas as pd  # type: ignore
+import plotly.offline  # type: ignore
+
+from .app import make_parts, plot_factory
+from .export import map_parts, write_plotly_js, safe_name, PLOTLY_JS
+from .helpers.partnumber import PartNumber
+from .helpers.spcfigure import dumps
+
+# create logger
+log = logging.getLogger(__name__)
+
+# Trace properties written as typed arrays
+TYPED_ARRAY_KEYS = ["x", "y"]
+
+# First plotly.js to read {"dtype", "bdata"} typed arrays
+TYPED_ARRAY_PLOTLYJS = (2, 28)
+
+REPORT_STYLE = """
+body { font-family: Arial, sans-serif; margin: 2em; }
+table.capability { border-collapse: collapse; font-size: 0.9em; }
+table.capability td, table.capability th { padding: 2px 8px; }
+table.capability tr:nth-child(even) { background: #f2f2f2; }
+.spc-figure { height: 450px; }
+"""
+
+# Draw each chart when it is scrolled in to view
+REPORT_SCRIPT = """
+const observer = new IntersectionObserver((entries) => {
+  entries.forEach((entry) => {
+    if (!entry.isIntersecting) return;
+    const fig = figures[Number(entry.target.dataset.figure)];
+    fig.layout.template = template;
+    Plotly.newPlot(entry.target, fig.data, fig.layout,
+                   {displaylogo: false, responsive: true});
+    observer.unobserve(entry.target);
+  });
+}, {rootMargin: "500px"});
+document.querySelectorAll(".spc-figure").forEach((div) => {
+  observer.observe(div);
+});
+"""
+
+REPORT_HTML = Template("""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>$title</title>
+<script src="$plotly_js"></script>
+<style>$style</style>
+</head>
+<body>
+<h1>$title</h1>
+$header
+<h2>Capability</h2>
+$capability
+<h2>xbar charts</h2>
+$figures
+<script>
+const template = $template;
+const figures = $data;
+$script
+</script>
+</body>
+</html>
+""")
+
+
+def report_parts(
+    filepath: str,
+    out: str,
+    options: Iterable[str] = (),
+    workers: int = 1,
+    cache_dir: Optional[str] = None,
+    engine: str = "pandas",
+) -> List[str]:
+    """Write a report for every part in a directory.
+
+    Args:
+        filepath (str): Directory of data files
+        out (str): Directory to write the reports to
+        options (Iterable[str], optional): xbar options, i.e. meanline
+        workers (int, optional): Processes writing reports, 0 to use all
+            CPUs
+        cache_dir (Optional[str], optional): Directory of the parsed data
+            cache, default is to not use a cache
+        engine (str, optional): Excel reader, pandas or streaming
+
+    Returns:
+        List[str]: Reports written
+
+    Raises:
+        FileNotFoundError: No parts in filepath
+    """
+    # Only the headers, each process reads the parts it reports on
+    parts = make_parts(filepath, cache_dir=cache_dir, lazy=True, engine=engine)
+    if not parts:
+        raise FileNotFoundError(f"No Parts generated from dir = {filepath}")
+
+    os.makedirs(out, exist_ok=True)
+    write_plotly_js(out)
+
+    part_kwargs: Dict[str, Any] = dict(cache_dir=cache_dir, engine=engine)
+    reports = map_parts(
+        report_part,
+        [
+            (part.filepath, out, list(options), part_kwargs)
+            for part in parts.values()
+        ],
+        workers,
+    )
+
+    log.info(f"Wrote {len(reports)} reports to {out}")
+
+    return reports
+
+
+def report_part(
+    data_file: str,
+    out: str,
+    options: List[str],
+    part_kwargs: Dict[str, Any],
+) -> str:
+    """Write the report of one part.
+
+    Args:
+        data_file (str): Data file of the part
+        out (str): Directory to write the report to
+        options (List[str]): xbar options, i.e. meanline
+        part_kwargs (Dict[str, Any]): Passed to PartNumber
+
+    Returns:
+        str: Report written
+    """
+    part = PartNumber(data_file, **part_kwargs)
+    pn = part.header["Part Number"]
+    path = os.path.join(out, f"{safe_name(pn)}.html")
+
+    figures = []
+    for fig in plot_factory(part, "xbar", None, None, None, options).values():
+        if fig is not None:
+            figures.append(fig.to_dict())
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(
+            report_html(
+                pn,
+                part.header,
+                part.capability_table(),
+                figures,
+                os.path.relpath(os.path.join(out, PLOTLY_JS), out),
+                encode=supports_typed_arrays(),
+            )
+        )
+
+    log.info(f"Wrote {path}, {len(figures)} tests")
+    part.unload()
+
+    return path
+
+
+def report_html(
+    title: str,
+    header: Dict[str, Any],
+    capability: pd.DataFrame,
+    figures: List[Dict[str, Any]],
+    plotly_js: str,
+    encode: bool = True,
+) -> str:
+    """Build the HTML of a report.
+
+    Args:
+        title (str): Title of the report, i.e. the Part Number
+        header (Dict[str, Any]): Part header, shown as a list
+        capability (pd.DataFrame): Capability table
+        figures (List[Dict[str, Any]]): Figure dicts, all with the same
+            template
+        plotly_js (str): src of plotly.js
+        encode (bool, optional): Write numeric data as typed arrays, only
+            if plotly_js reads them, see supports_typed_arrays
+
+    Returns:
+        str: HTML
+    """
+    template: Dict[str, Any] = {}
+    data = []
+    for fig in figures:
+        layout = dict(fig["layout"])
+        template = layout.pop("template", template)
+        data.append(
+            {
+                "data": [
+                    typed_arrays(trace) if encode else trace
+                    for trace in fig["data"]
+                ],
+                "layout": layout,
+            }
+        )
+
+    header_html = "<ul>{}</ul>".format(
+        "".join(
+            f"<li><b>{html.escape(str(key))}</b>:"
+            f" {html.escape(str(value))}</li>"
+            for key, value in header.items()
+        )
+    )
+    figures_html = "\n".join(
+        f'<div class="spc-figure" data-figure="{i}"></div>'
+        for i in range(len(data))
+    )
+
+    return REPORT_HTML.substitute(
+        title=html.escape(str(title)),
+        plotly_js=html.escape(plotly_js.replace(os.sep, "/")),
+        style=REPORT_STYLE,
+        header=header_html,
+        capability=capability.to_html(
+            index=False,
+            classes="capability",
+            border=0,
+            float_format=lambda value: f"{value:.3g}",
+            na_rep="",
+        ),
+        figures=figures_html,
+        template=script_json(template),
+        data=script_json(data),
+        script=REPORT_SCRIPT,
+    )
+
+
+def typed_arrays(trace: Dict[str, Any]) -> Dict[str, Any]:
+    """Write the numeric data of a trace as base64 typed arrays.
+
+    Args:
+        trace (Dict[str, Any]): Trace dict
+
+    Returns:
+        Dict[str, Any]: Copy of trace with TYPED_ARRAY_KEYS encoded where
+            they are numeric
+    """
+    trace = dict(trace)
+    for key in TYPED_ARRAY_KEYS:
+        if key in trace:
+            trace[key] = typed_array(trace[key])
+
+    return trace
+
+
+def supports_typed_arrays() -> bool:
+    """Check the plotly.js shipped with plotly reads typed arrays.
+
+    Returns:
+        bool: True if the bundled plotly.js is TYPED_ARRAY_PLOTLYJS or newer
+    """
+    version = plotly.offline.get_plotlyjs_version()
+    try:
+        major, minor = (int(part) for part in version.split(".")[:2])
+    except ValueError:
+        log.warning(f"Unknown plotly.js version {version}")
+        return False
+
+    return (major, minor) >= TYPED_ARRAY_PLOTLYJS
+
+
+def typed_array(values: Any) -> Any:
+    """Encode numbers as a plotly.js typed array.
+
+    Float data is float64 so hover values are unchanged, integers that fit
+    are int32. NaN readings are still gaps in the plot.
+
+    Args:
+        values (Any): Array like
+
+    Returns:
+        Any: {"dtype", "bdata"} dict, or values unchanged if not numeric
+    """
+    array = np.asarray(values)
+
+    if array.dtype.kind in "iu" and (
+        array.size == 0 or (array.min() >= -(2**31) and array.max() < 2**31)
+    ):
+        dtype = "i4"
+    elif array.dtype.kind in "fiu":
+        dtype = "f8"
+    else:
+        return values
+
+    return {
+        "dtype": dtype,
+        "bdata": base64.b64encode(array.astype(f"<{dtype}").tobytes()).decode(
+            "ascii"
+        ),
+    }
+
+
+def script_json(obj: Any) -> str:
+    """Serialise to JSON that is safe inside a script tag.
+
+    Args:
+        obj (Any): Value to serialise
+
+    Returns:
+        str: JSON, with </ escaped so it can not close the tag
+    """
+    return dumps(obj).replace("</", "<\\/")
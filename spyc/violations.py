@@ -0,0 +1,105 @@
+"""Check every part against control chart rules, i.e. for nightly SPC audits.
+
+Every test of every part is checked at each location against a Western
+Electric or Nelson rule set (see helpers/rules.py), and the readings
+breaking each rule are counted in one CSV. Parts are checked in
+parallel, one part per process.
+"""
+
+# Imports
+
+import os
+import logging
+from typing import List, Dict, Any, Optional, Union
+
+import pandas as pd  # type: ignore
+
+from .app import make_parts
+from .export import map_parts
+from .helpers.partnumber import PartNumber
+from .helpers.rules import rule_names
+
+# create logger
+log = logging.getLogger(__name__)
+
+
+def violation_parts(
+    filepath: str,
+    out: str,
+    rules: Union[str, List[str]] = "western_electric",
+    workers: int = 1,
+    cache_dir: Optional[str] = None,
+    engine: str = "pandas",
+) -> pd.DataFrame:
+    """Count the rule violations of every part in a directory.
+
+    Args:
+        filepath (str): Directory of data files
+        out (str): CSV file to write
+        rules (Union[str, List[str]], optional): Rule set or rules,
+            default is western_electric
+        workers (int, optional): Processes checking parts, 0 to use all
+            CPUs
+        cache_dir (Optional[str], optional): Directory of the parsed data
+            cache, default is to not use a cache
+        engine (str, optional): Excel reader, pandas or streaming
+
+    Returns:
+        pd.DataFrame: One row per part, location and test with the
+            readings breaking each rule
+
+    Raises:
+        FileNotFoundError: No parts in filepath
+    """
+    # Fail before reading any data
+    rules = rule_names(rules)
+
+    # Only the headers, each process reads the parts it checks
+    parts = make_parts(filepath, cache_dir=cache_dir, lazy=True, engine=engine)
+    if not parts:
+        raise FileNotFoundError(f"No Parts generated from dir = {filepath}")
+
+    part_kwargs: Dict[str, Any] = dict(cache_dir=cache_dir, engine=engine)
+    table = pd.concat(
+        map_parts(
+            violation_part,
+            [(part.filepath, rules, part_kwargs) for part in parts.values()],
+            workers,
+        ),
+        ignore_index=True,
+    )
+
+    if os.path.dirname(out):
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+    table.to_csv(out, index=False)
+
+    log.info(
+        f"Wrote {out}, {(table['violations'] > 0).sum()} of {len(table)}"
+        " tests break a rule"
+    )
+
+    return table
+
+
+def violation_part(
+    data_file: str, rules: List[str], part_kwargs: Dict[str, Any]
+) -> pd.DataFrame:
+    """Count the rule violations of one part.
+
+    Args:
+        data_file (str): Data file of the part
+        rules (List[str]): Rules to check
+        part_kwargs (Dict[str, Any]): Passed to PartNumber
+
+    Returns:
+        pd.DataFrame: rule_table of the part, with the Part Number
+    """
+    part = PartNumber(data_file, **part_kwargs)
+
+    table = part.rule_table(rules)
+    table.insert(0, "Part Number", part.header["Part Number"])
+
+    log.info(f"Checked {part.header['Part Number']}, {len(table)} tests")
+    part.unload()
+
+    return table
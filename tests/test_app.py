@@ -0,0 +1,285 @@
+import os
+import shutil
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import pytest
+from spyc import app
+from spyc.helpers.readers import read_excel
+
+DATA = os.path.join(os.path.dirname(__file__), "Dummy Data.xlsx")
+DATA_2 = os.path.join(os.path.dirname(__file__), "Dummy Data 2.xlsx")
+
+
+@pytest.fixture
+def spawn_pool(monkeypatch):
+    # Workers import spyc afresh, as on Windows and macOS
+    pool = functools.partial(
+        ProcessPoolExecutor, mp_context=multiprocessing.get_context("spawn")
+    )
+    monkeypatch.setattr(app, "ProcessPoolExecutor", pool)
+    return pool
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    for path in [DATA, DATA_2]:
+        shutil.copy(path, tmp_path)
+    return str(tmp_path)
+
+
+@pytest.fixture
+def no_limits_dir(data_dir):
+    # Second part as csv files, with no limits for its first test
+    header, tests, data = read_excel(DATA_2)
+    tests.loc[tests.index[0], ["Min_Tol", "Max_Tol"]] = None
+    os.remove(os.path.join(data_dir, os.path.basename(DATA_2)))
+    part_dir = os.path.join(data_dir, "part")
+    os.mkdir(part_dir)
+    pd.DataFrame([header]).to_csv(
+        os.path.join(part_dir, "Header.csv"), index=False
+    )
+    tests.reset_index().to_csv(
+        os.path.join(part_dir, "Test_List.csv"), index=False
+    )
+    for location, dataset in data.items():
+        dataset.reset_index().to_csv(
+            os.path.join(part_dir, f"{location}.csv"), index=False
+        )
+    return data_dir, header["Part Number"], tests.index[0]
+
+
+def test_make_parts_with_spawned_workers(spawn_pool, data_dir):
+    parts = app.make_parts(data_dir, workers=2)
+
+    assert parts.keys() == app.make_parts(data_dir).keys()
+    assert all(part.loaded for part in parts.values())
+
+
+def test_plot_task_with_spawned_workers(spawn_pool):
+    part = app.PartNumber(DATA)
+    location = list(part.data)[0]
+    test_id = part.tests.index[0]
+    pn = part.header["Part Number"]
+    key = (pn, (location,), "xbar", test_id, None, (), 0)
+
+    with spawn_pool(
+        max_workers=1, initializer=app.init_plot_worker, initargs=(1,)
+    ) as pool:
+        figure = pool.submit(app.plot_task, DATA, key, {}).result()
+
+    assert figure is not None
+    assert figure == app.plot_json(part, key)
+
+
+@pytest.fixture
+def plot_worker(monkeypatch):
+    # Run plot_task in this process as a worker keeping one part
+    monkeypatch.setattr(app.PartNumber, "max_resident", None)
+    app.init_plot_worker(1)
+    yield app.worker_parts
+    app.worker_parts.clear()
+
+
+def plot_key(filepath, version=0):
+    part = app.PartNumber(filepath)
+    location = list(part.data)[0]
+    test_id = part.tests.index[0]
+    pn = part.header["Part Number"]
+    return (pn, (location,), "xbar", test_id, None, (), version)
+
+
+def test_plot_worker_keeps_max_loaded_parts(plot_worker):
+    keys = {path: plot_key(path) for path in [DATA, DATA_2]}
+
+    for path in [DATA, DATA_2, DATA]:
+        assert app.plot_task(path, keys[path], {}) is not None
+        assert list(plot_worker) == [path]
+
+    part = plot_worker[DATA][1]
+    app.plot_task(DATA, plot_key(DATA, version=1), {})
+
+    assert plot_worker[DATA][0] == 1
+    assert plot_worker[DATA][1] is not part
+    assert not part.loaded
+
+
+def test_task_without_figure_is_not_cached(monkeypatch, data_dir):
+    made = {}
+
+    def record(cls):
+        def make(*args, **kwargs):
+            made[cls.__name__] = cls(*args, **kwargs)
+            return made[cls.__name__]
+
+        return make
+
+    for cls in [app.FigureCache, app.JobQueue]:
+        monkeypatch.setattr(app, cls.__name__, record(cls))
+    monkeypatch.setattr(app, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(app.dash.Dash, "run_server", lambda *a, **k: None)
+    app.dash_app(data_dir, fig_cache=10**6, plot_workers=1)
+
+    jobs = made["JobQueue"]
+    figure_cache = made["FigureCache"]
+    jobs.on_done(("key", None), None)
+    jobs.on_done(("key", "xbar"), "{}")
+    jobs.executor.shutdown()
+
+    assert ("key", None) not in figure_cache
+    assert figure_cache.get(("key", "xbar")) == "{}"
+
+
+@pytest.mark.parametrize(
+    "n_figures, page_size, pages",
+    [(0, 10, 1), (1, 10, 1), (10, 10, 1), (11, 10, 2), (25, None, 1)],
+)
+def test_page_count(n_figures, page_size, pages):
+    assert app.page_count(n_figures, page_size) == pages
+
+
+def test_selected_tests():
+    part = app.PartNumber(DATA)
+
+    assert app.selected_tests(part, ["2", "1.1"]) == ["2", "1.1"]
+    for blank in [None, []]:
+        assert app.selected_tests(part, blank) == list(part.tests.index)
+
+
+def test_summary_table_rows(data_dir):
+    parts = app.make_parts(data_dir)
+
+    table = app.summary_table(parts)
+
+    assert list(table.columns) == app.SUMMARY_COLUMNS
+    assert len(table) == sum(
+        len(part.data) * len(part.tests) for part in parts.values()
+    )
+    cpk = table["Cpk"].dropna()
+    assert cpk.is_monotonic_increasing
+    for row in table.itertuples(index=False):
+        part = parts[row[0]]
+        dataset = part.data[row.Location]
+        readings = dataset.loc[row.Test_ID, "Reading"].dropna()
+        test = part.tests.loc[row.Test_ID]
+        assert row.Test_Name == test["Test_Name"]
+        assert row.count == len(readings)
+        assert row.mean == pytest.approx(readings.mean())
+        assert row.SD == pytest.approx(readings.std(ddof=1))
+        assert row.min == readings.min()
+        assert row.max == readings.max()
+        assert np.array_equal(
+            [row.LSL, row.USL],
+            test[["Min_Tol", "Max_Tol"]].to_numpy(dtype=float),
+            equal_nan=True,
+        )
+
+
+def test_summary_table_without_limits(no_limits_dir):
+    data_dir, pn, test_id = no_limits_dir
+    parts = app.make_parts(data_dir)
+
+    table = app.summary_table(parts)
+
+    rows = table[(table["Part Number"] == pn) & (table["Test_ID"] == test_id)]
+    assert len(rows) == len(parts[pn].data)
+    assert (rows["count"] > 0).all()
+    assert rows[["LSL", "USL", "Cp", "Cpk"]].isna().all(axis=None)
+    # Tests without a Cpk go last
+    last = len(table) - len(rows)
+    assert list(rows.index) == list(table.index[last:])
+    assert table["Cpk"].iloc[:last].notna().all()
+
+
+def test_summary_table_no_parts():
+    assert list(app.summary_table({}).columns) == app.SUMMARY_COLUMNS
+
+
+def test_summary_app_rows(monkeypatch, no_limits_dir):
+    data_dir = no_limits_dir[0]
+    served = []
+    monkeypatch.setattr(
+        app.dash.Dash, "run_server", lambda self, **_: served.append(self)
+    )
+
+    app.summary_app(data_dir)
+
+    table = served[0].layout.children[1]
+    assert table.id == "summary_table"
+    pd.testing.assert_frame_equal(
+        pd.DataFrame(table.data, columns=app.SUMMARY_COLUMNS),
+        app.summary_table(app.make_parts(data_dir)),
+        check_dtype=False,
+    )
+
+
+def test_summary_app_no_parts(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        app.summary_app(str(tmp_path))
+
+
+def plot_figure_payload(tests, options):
+    state = [
+        ("part_dd", "value", "789120-2"),
+        ("plot_dd", "value", "xbar"),
+        ("test_dd", "value", tests),
+        ("data_version", "data", 0),
+        ("session", "data", "session"),
+    ]
+    inputs = [
+        ("page", "data", 0),
+        ("loc_dd", "value", ["Portland", "Miami"]),
+        ("cap_dd", "value", "None"),
+        ("option_dd", "value", options),
+        ("job_interval", "n_intervals", None),
+    ]
+    return {
+        "output": "..fig_container.children...job_interval.disabled..",
+        "outputs": [
+            {"id": "fig_container", "property": "children"},
+            {"id": "job_interval", "property": "disabled"},
+        ],
+        "inputs": [{"id": i, "property": p, "value": v} for i, p, v in inputs],
+        "state": [{"id": i, "property": p, "value": v} for i, p, v in state],
+        "changedPropIds": ["option_dd.value"],
+    }
+
+
+def test_plot_figure_only_plots_new_figures(monkeypatch, data_dir):
+    served = []
+    monkeypatch.setattr(
+        app.dash.Dash, "run_server", lambda self, **_: served.append(self)
+    )
+    plotted = []
+
+    def plot_json(part, key):
+        plotted.append((key[3], key[5]))
+        return plot_json.wrapped(part, key)
+
+    plot_json.wrapped = app.plot_json
+    monkeypatch.setattr(app, "plot_json", plot_json)
+    app.dash_app(data_dir, fig_cache=10**7)
+    client = served[0].server.test_client()
+
+    def plot(tests, options=()):
+        plotted.clear()
+        response = client.post(
+            "/_dash-update-component",
+            json=plot_figure_payload(tests, list(options)),
+        )
+        assert response.status_code == 200
+        return sorted(plotted)
+
+    assert plot(["1.1"]) == [("1.1", ())]
+    # Adding a test only plots that test
+    assert plot(["1.1", "2"]) == [("2", ())]
+    assert plot(["2", "1.1"]) == []
+    # New options plot every test again, going back to them plots none
+    assert plot(["1.1", "2"], ["meanline"]) == [
+        ("1.1", ("meanline",)),
+        ("2", ("meanline",)),
+    ]
+    assert plot(["1.1", "2", "3"]) == [("3", ())]
+    assert plot(["1.1", "2"], ["meanline"]) == []
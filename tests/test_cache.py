@@ -0,0 +1,80 @@
+import os
+import shutil
+import pandas as pd
+import pytest
+from spyc.helpers.cache import PartCache
+from spyc.helpers.readers import read_excel
+
+DATA = os.path.join(os.path.dirname(__file__), "Dummy Data.xlsx")
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    return str(shutil.copy(DATA, tmp_path / "part.xlsx"))
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PartCache(str(tmp_path / "cache"))
+
+
+def assert_frames_equal(loaded, expected):
+    assert loaded[0] == expected[0]
+    pd.testing.assert_frame_equal(loaded[1], expected[1])
+    assert loaded[2].keys() == expected[2].keys()
+    for location, frame in expected[2].items():
+        pd.testing.assert_frame_equal(loaded[2][location], frame)
+
+
+def store(cache, data_file):
+    fingerprint = PartCache.fingerprint(data_file)
+    cache.store(data_file, *read_excel(data_file), fingerprint)
+
+
+def test_round_trip(cache, data_file):
+    fingerprint = PartCache.fingerprint(data_file)
+    frames = read_excel(data_file)
+    assert cache.load(data_file) is None
+
+    cache.store(data_file, *frames, fingerprint)
+
+    assert_frames_equal(cache.load(data_file), frames)
+    assert cache.load_header(data_file) == frames[0]
+
+
+def test_touched_file_is_not_stale(cache, data_file):
+    store(cache, data_file)
+    stat = os.stat(data_file)
+    os.utime(data_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert cache.check(data_file) is not None
+
+
+@pytest.mark.parametrize("append", [True, False])
+def test_changed_file_is_stale(cache, data_file, append):
+    store(cache, data_file)
+
+    with open(data_file, "r+b") as f:
+        if append:
+            f.seek(0, os.SEEK_END)
+            f.write(b"\0")
+        else:
+            # Same size, different content
+            last = f.seek(-1, os.SEEK_END)
+            byte = f.read(1)
+            f.seek(last)
+            f.write(bytes([byte[0] ^ 0xFF]))
+
+    assert cache.load(data_file) is None
+    assert cache.load_header(data_file) is None
+
+
+def test_changed_while_reading_is_stale(cache, data_file):
+    fingerprint = PartCache.fingerprint(data_file)
+    frames = read_excel(data_file)
+    with open(data_file, "ab") as f:
+        f.write(b"\0")
+
+    cache.store(data_file, *frames, fingerprint)
+
+    assert cache.load(data_file) is None
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+from spyc.helpers import downsample
+
+RNG = np.random.default_rng(0)
+
+
+@pytest.fixture
+def readings():
+    n = 10_000
+    y = RNG.normal(size=n)
+    y[[17, 5_000, 9_998]] = [50.0, -50.0, 40.0]
+    y[[100, 200]] = np.nan
+    return pd.DataFrame(
+        {"Reading": y}, index=pd.Index([f"SN{i}" for i in range(n)])
+    )
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_reducer_budget(method):
+    x = np.arange(1_000, dtype=float)
+    y = RNG.normal(size=1_000)
+
+    picked = downsample.DOWNSAMPLERS[method](x, y, 100)
+
+    assert len(picked) <= 100
+    assert np.all(np.diff(picked) > 0)
+    assert picked[0] >= 0 and picked[-1] < 1_000
+
+
+def test_lttb_keeps_ends_and_spikes():
+    x = np.arange(1_000, dtype=float)
+    y = np.zeros(1_000)
+    y[500] = 10.0
+
+    picked = downsample.lttb(x, y, 50)
+
+    assert {0, 500, 999} <= set(picked)
+
+
+def test_min_max_keeps_extremes():
+    x = np.arange(1_000, dtype=float)
+    y = RNG.normal(size=1_000)
+
+    picked = downsample.min_max(x, y, 20)
+
+    assert {int(np.argmin(y)), int(np.argmax(y))} <= set(picked)
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_downsample_keeps_out_of_tolerance(readings, method):
+    keep = (readings["Reading"].abs() > 3).to_numpy()
+    keep[[3, 4_242]] = True
+    positions = np.arange(len(readings))
+
+    kept = downsample.downsample(readings, positions, 500, keep, method)
+
+    assert len(kept) < 600
+    assert set(readings.index[keep]) <= set(kept.index)
+    assert np.all(np.diff(readings.index.get_indexer(kept.index)) > 0)
+    assert not kept["Reading"].isna().any()
+
+
+def test_downsample_leaves_small_data(readings):
+    small = readings.iloc[:100]
+
+    assert downsample.downsample(small, np.arange(100), 500) is small
+
+
+def test_unknown_method(readings):
+    with pytest.raises(ValueError):
+        downsample.downsample(
+            readings, np.arange(len(readings)), 10, None, "x"
+        )
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_violations_thinned_to_budget(readings, method):
+    keep = (readings["Reading"].abs() > 3).to_numpy()
+    prefer = np.zeros(len(readings), dtype=bool)
+    prefer[::2] = True
+
+    kept = downsample.downsample(
+        readings, np.arange(len(readings)), 500, keep, method, prefer=prefer
+    )
+
+    assert len(kept) <= 500
+    assert set(readings.index[keep]) <= set(kept.index)
+    assert prefer[readings.index.get_indexer(kept.index)].sum() >= 200
@@ -0,0 +1,85 @@
+import os
+import shutil
+import pandas as pd
+import pytest
+from spyc import export
+from spyc.helpers.readers import read_excel
+
+DATA = os.path.join(os.path.dirname(__file__), "Dummy Data.xlsx")
+
+
+@pytest.mark.parametrize(
+    "name, safe",
+    [
+        ("789120-2", "789120-2"),
+        ("1.1", "1.1"),
+        ("a/b\\c:d", "a_b_c_d"),
+        ("New York", "New_York"),
+        (2, "2"),
+    ],
+)
+def test_safe_name(name, safe):
+    assert export.safe_name(name) == safe
+
+
+def test_figure_path():
+    path = export.figure_path("out", "PN/1", "New York", "1.1", "html")
+
+    assert path == os.path.join("out", "PN_1", "New_York", "1.1.html")
+
+
+def test_export_html(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    shutil.copy(DATA, data_dir)
+    out = str(tmp_path / "out")
+
+    written = export.export_parts(str(data_dir), out)
+
+    files = [
+        os.path.join(root, name)
+        for root, _, names in os.walk(out)
+        for name in names
+        if name.endswith(".html")
+    ]
+    assert written == len(files) > 0
+    assert os.path.isfile(os.path.join(out, export.PLOTLY_JS))
+    for path in files:
+        assert os.path.dirname(os.path.relpath(path, out)).startswith(
+            "789120-2" + os.sep
+        )
+        with open(path, encoding="utf-8") as f:
+            assert 'src="../../plotly.min.js"' in f.read()
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        export.export_parts(str(tmp_path), str(tmp_path), ["pdf"])
+
+
+def test_export_svg(tmp_path):
+    pytest.importorskip("kaleido")
+
+    files = export.export_part(DATA, str(tmp_path), ["svg"], [], {})
+
+    assert files
+    for path in files:
+        with open(path, encoding="utf-8") as f:
+            assert f.read().lstrip().startswith("<svg")
+
+
+def test_export_test_without_limits(tmp_path):
+    header, tests, data = read_excel(DATA)
+    tests.loc[tests.index[0], ["Min_Tol", "Max_Tol"]] = None
+    part_dir = tmp_path / "data" / "part"
+    part_dir.mkdir(parents=True)
+    pd.DataFrame([header]).to_csv(part_dir / "Header.csv", index=False)
+    tests.reset_index().to_csv(part_dir / "Test_List.csv", index=False)
+    for location, dataset in data.items():
+        dataset.reset_index().to_csv(part_dir / f"{location}.csv", index=False)
+
+    written = export.export_parts(
+        str(tmp_path / "data"), str(tmp_path / "out")
+    )
+
+    assert written == len(tests) * len(data)
@@ -0,0 +1,53 @@
+from spyc.helpers.figurecache import FigureCache
+
+
+def test_hits_and_misses():
+    cache = FigureCache(100)
+    cache.put("a", "x" * 10)
+
+    assert cache.get("a") == "x" * 10
+    assert cache.get("b") is None
+    assert "b" not in cache
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_dropped_for_size():
+    cache = FigureCache(30)
+    for key in "abc":
+        cache.put(key, key * 10)
+    cache.get("a")
+
+    cache.put("d", "d" * 10)
+
+    assert "b" not in cache
+    assert all(key in cache for key in "acd")
+    assert cache.size == 30
+
+
+def test_replaced_figure_size():
+    cache = FigureCache(30)
+    cache.put("a", "a" * 10)
+    cache.put("a", "a" * 20)
+
+    assert len(cache) == 1
+    assert cache.size == 20
+
+
+def test_too_big_or_disabled():
+    cache = FigureCache(10)
+    cache.put("a", "a" * 11)
+
+    disabled = FigureCache(0)
+    disabled.put("a", "a")
+
+    assert len(cache) == len(disabled) == 0
+
+
+def test_clear_keeps_counters():
+    cache = FigureCache(10)
+    cache.put("a", "a")
+    cache.get("a")
+
+    cache.clear()
+
+    assert (len(cache), cache.size, cache.hits) == (0, 0, 1)
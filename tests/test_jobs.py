@@ -0,0 +1,99 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from spyc.helpers.jobs import JobQueue
+
+
+@pytest.fixture
+def pool():
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        yield executor
+
+
+def test_kept_job_holds_results(pool):
+    queue = JobQueue(pool, lambda x: x * 2)
+    queue.submit("session", {"a": (1,)})
+    pool.submit(lambda: None).result()
+
+    assert queue.get("session").results == {"a": 2}
+
+
+def test_prefetch_job_dropped_when_done(pool):
+    cached = {}
+    queue = JobQueue(pool, lambda x: x * 2, on_done=cached.__setitem__)
+    queue.submit(("session", "prefetch"), {"a": (1,), "b": (2,)}, keep=False)
+    pool.submit(lambda: None).result()
+
+    assert cached == {"a": 2, "b": 4}
+    assert queue.get(("session", "prefetch")) is None
+    assert not queue._jobs
+
+
+def test_idle_owner_expires(pool):
+    release = threading.Event()
+    queue = JobQueue(pool, lambda x: release.wait(), max_idle=0)
+    closed = queue.submit("closed tab", {"a": (1,), "b": (2,)})
+    queue.submit("open tab", {"c": (3,)})
+    release.set()
+
+    assert closed.cancelled
+    assert queue.get("closed tab") is None
+    assert queue.get("open tab") is not None
+
+
+@pytest.fixture
+def blocked():
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def task(x):
+        calls.append(x)
+        started.set()
+        release.wait(timeout=5)
+        return x * 2
+
+    yield task, started, release, calls
+    release.set()
+
+
+def test_new_job_cancels_tasks_not_started(pool, blocked):
+    task, started, release, calls = blocked
+    queue = JobQueue(pool, task)
+
+    old = queue.submit("session", {"a": (1,), "b": (2,)})
+    started.wait(timeout=5)
+    job = queue.submit("session", {"c": (3,)})
+    release.set()
+    pool.submit(lambda: None).result()
+
+    assert old.cancelled and not job.cancelled
+    assert calls == [1, 3]
+    assert old.results == {"a": 2, "b": None}
+    assert job.results == {"c": 6}
+
+
+def test_jobs_share_tasks(pool, blocked):
+    task, started, release, calls = blocked
+    queue = JobQueue(pool, task)
+
+    prefetch = queue.submit(("session", "prefetch"), {"a": (1,), "b": (2,)})
+    started.wait(timeout=5)
+    job = queue.submit("session", {"b": (2,)})
+    queue.cancel(("session", "prefetch"))
+    release.set()
+    pool.submit(lambda: None).result()
+
+    assert prefetch.cancelled
+    assert calls == [1, 2]
+    assert job.results == {"b": 4}
+    assert job.done
+
+
+def test_cancel_drops_job(pool):
+    queue = JobQueue(pool, lambda x: x)
+    queue.submit("session", {"a": (1,)})
+
+    queue.cancel("session")
+
+    assert queue.get("session") is None
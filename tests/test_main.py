@@ -0,0 +1,33 @@
+import sys
+import subprocess
+
+
+def run_python(code):
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+
+def test_import_is_light():
+    loaded = run_python(
+        "import sys, spyc.main;"
+        " print(' '.join(m for m in ('dash', 'plotly', 'pandas')"
+        " if m in sys.modules))"
+    )
+
+    assert loaded.strip() == ""
+
+
+def test_help():
+    usage = run_python(
+        "import spyc.main\n"
+        "try:\n"
+        "    spyc.main.main(['--help'])\n"
+        "except SystemExit:\n"
+        "    pass\n"
+    )
+
+    assert "spyc plot <dir>" in usage
@@ -0,0 +1,315 @@
+import os
+import shutil
+import threading
+from unittest import mock
+import numpy as np
+import openpyxl
+import pandas as pd
+import pytest
+from spyc.helpers.partnumber import PartNumber
+from spyc.helpers.readers import read_excel
+
+DATA = os.path.join(os.path.dirname(__file__), "Dummy Data.xlsx")
+DATA_2 = os.path.join(os.path.dirname(__file__), "Dummy Data 2.xlsx")
+
+
+@pytest.fixture
+def lazy_parts(tmp_path):
+    PartNumber.max_resident = 1
+    yield [
+        PartNumber(path, lazy=True, cache_dir=str(tmp_path))
+        for path in [DATA, DATA_2]
+    ]
+    PartNumber.max_resident = None
+    PartNumber.resident.clear()
+
+
+def test_lazy_part_reads_only_header(lazy_parts):
+    part, _ = lazy_parts
+
+    assert part.header["Part Number"]
+    assert not part.loaded
+
+
+def test_least_recently_used_part_is_unloaded(lazy_parts):
+    part, other = lazy_parts
+    PartNumber.max_resident = 2
+    third = PartNumber(DATA, lazy=True)
+
+    for used in [part, other, part, third]:
+        used.load()
+
+    assert part.loaded and third.loaded
+    assert not other.loaded
+    assert list(PartNumber.resident.values()) == [part, third]
+
+
+def test_unloaded_part_reads_again(lazy_parts):
+    part, other = lazy_parts
+    stats = part.stats
+
+    other.load()
+
+    assert not part.loaded
+    pd.testing.assert_frame_equal(part.stats, stats)
+    assert not other.loaded
+
+
+@pytest.mark.parametrize("name", ["tests", "data", "stats"])
+def test_property_not_evicted_before_read(monkeypatch, lazy_parts, name):
+    part, other = lazy_parts
+    load = PartNumber.load
+
+    def load_then_evict(self):
+        frames = load(self)
+        if self is part:
+            # Another thread loads the other part, evicting this one
+            thread = threading.Thread(target=load, args=(other,))
+            thread.start()
+            thread.join(timeout=5)
+        return frames
+
+    monkeypatch.setattr(PartNumber, "load", load_then_evict)
+
+    assert getattr(part, name) is not None
+    assert not part.loaded
+
+
+def test_slow_read_does_not_block_other_parts(monkeypatch, lazy_parts):
+    part, other = lazy_parts
+    PartNumber.max_resident = 2
+    other.load()
+    reading = threading.Event()
+    release = threading.Event()
+    read = PartNumber.read
+
+    def slow_read(self):
+        if self is part:
+            reading.set()
+            release.wait(timeout=5)
+        read(self)
+
+    monkeypatch.setattr(PartNumber, "read", slow_read)
+    thread = threading.Thread(target=part.load)
+    thread.start()
+    reading.wait(timeout=5)
+
+    try:
+        # Used and unloaded while part is still being read
+        assert other.stats is not None
+        other.unload()
+        assert not part.loaded
+    finally:
+        release.set()
+        thread.join()
+
+    assert part.loaded
+
+
+def test_busy_part_is_not_unloaded(lazy_parts):
+    part, other = lazy_parts
+    part.load()
+    holding = threading.Event()
+    release = threading.Event()
+
+    def use_part():
+        with part._lock:
+            holding.set()
+            release.wait(timeout=5)
+
+    thread = threading.Thread(target=use_part)
+    thread.start()
+    holding.wait(timeout=5)
+    other.load()
+    release.set()
+    thread.join()
+
+    assert part.loaded and other.loaded
+    part.load()
+    assert not other.loaded
+
+
+def test_calculate_capability_skips_blank_readings():
+    readings = pd.DataFrame({"Reading": [1.0, np.nan, 2.0, 4.0]})
+
+    cp, cpk = PartNumber.calculate_capability(readings, 0.0, 6.0)
+
+    sd = np.std([1.0, 2.0, 4.0], ddof=1)
+    assert cp == pytest.approx(6 / (6 * sd))
+    assert cpk == pytest.approx((7 / 3) / (3 * sd))
+
+
+def direct_stats(part):
+    # Statistics index worked out from each test's readings on their own
+    rows = {}
+    for location, dataset in part.data.items():
+        for test_id in dataset.index.unique("Test_ID"):
+            readings = dataset.loc[test_id, "Reading"].dropna()
+            readings = readings.to_numpy(dtype=float)
+            limits = part.tests.reindex([test_id])[["Min_Tol", "Max_Tol"]]
+            lsl, usl = limits.to_numpy(dtype=float)[0]
+            mean = readings.mean()
+            sd = readings.std(ddof=1) if len(readings) > 1 else np.nan
+            with np.errstate(invalid="ignore", divide="ignore"):
+                cpl = (mean - lsl) / (3 * sd)
+                cpu = (usl - mean) / (3 * sd)
+                cp = (usl - lsl) / (6 * sd)
+                oot = (readings < lsl) | (readings > usl)
+            rows[(location, test_id)] = {
+                "count": len(readings),
+                "mean": mean,
+                "SD": sd,
+                "min": readings.min(),
+                "max": readings.max(),
+                "oot": oot.sum(),
+                "LSL": lsl,
+                "USL": usl,
+                "Cp": cp,
+                "Cpk": np.fmin(cpl, cpu),
+                "Cpl": cpl,
+                "Cpu": cpu,
+            }
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def assert_stats_match_readings(part):
+    expected = direct_stats(part)
+    stats = part.stats
+
+    assert sorted(stats.index) == sorted(expected.index)
+    for column in expected:
+        assert np.allclose(
+            stats.loc[expected.index, column].to_numpy(dtype=float),
+            expected[column].to_numpy(dtype=float),
+            equal_nan=True,
+        ), column
+
+
+def test_stats_match_readings(source):
+    assert_stats_match_readings(PartNumber(source, engine="streaming"))
+
+
+@pytest.mark.parametrize("lsl, usl", [(1.5, 3.5), (1.5, None), (None, 3.5)])
+def test_capability_from_stats_matches_readings(lsl, usl):
+    readings = PartNumber(DATA).data["Miami"].loc["1.1", "Reading"]
+    mean = readings.mean()
+    sd = np.std(readings.to_numpy(dtype=float), ddof=1)
+    cpl = (mean - lsl) / (3 * sd) if lsl is not None else np.nan
+    cpu = (usl - mean) / (3 * sd) if usl is not None else np.nan
+
+    cp, cpk = PartNumber.capability_from_stats(mean, sd, lsl, usl)
+
+    assert cpk == pytest.approx(np.nanmin([cpl, cpu]))
+    if lsl is None or usl is None:
+        assert np.isnan(cp)
+    else:
+        assert cp == pytest.approx((usl - lsl) / (6 * sd))
+
+
+def test_capability_from_stats_needs_a_limit():
+    with pytest.raises(ValueError):
+        PartNumber.capability_from_stats(1.0, 1.0, None, None)
+
+
+def test_stats_index_matches_capability_from_stats():
+    columns = ["mean", "SD", "LSL", "USL", "Cp", "Cpk"]
+    # numpy floats as from calculate_capability, a zero SD gives inf
+    for mean, sd, lsl, usl, cp, cpk in (
+        PartNumber(DATA).stats[columns].to_numpy(dtype=float)
+    ):
+        with np.errstate(divide="ignore"):
+            expected = PartNumber.capability_from_stats(
+                mean,
+                sd,
+                None if np.isnan(lsl) else lsl,
+                None if np.isnan(usl) else usl,
+            )
+        assert np.allclose([cp, cpk], expected, equal_nan=True)
+
+
+def test_merge_moments_matches_all_readings():
+    dataset = PartNumber(DATA).data["Portland"]
+    # The second half has a test the first does not
+    first = dataset.iloc[: len(dataset) // 2]
+    first = first.drop(first.index.get_level_values("Test_ID")[-1], level=0)
+    second = dataset.drop(first.index)
+
+    merged = PartNumber.merge_moments(
+        PartNumber.test_moments(first), PartNumber.test_moments(second)
+    )
+
+    pd.testing.assert_frame_equal(
+        merged.sort_index(),
+        PartNumber.test_moments(dataset).sort_index(),
+        check_like=True,
+    )
+
+
+def append_rows(path, location, rows):
+    if path.endswith(".xlsx"):
+        workbook = openpyxl.load_workbook(path)
+        for row in rows:
+            workbook[location].append(row)
+        workbook.save(path)
+    else:
+        with open(os.path.join(path, f"{location}.csv"), "a") as f:
+            f.writelines(",".join(map(str, row)) + "\n" for row in rows)
+
+
+@pytest.fixture(params=["xlsx", "csv"])
+def source(request, tmp_path):
+    if request.param == "xlsx":
+        return str(shutil.copy(DATA, tmp_path / "part.xlsx"))
+
+    header, tests, data = read_excel(DATA)
+    path = tmp_path / "part"
+    path.mkdir()
+    pd.DataFrame([header]).to_csv(path / "Header.csv", index=False)
+    tests.reset_index().to_csv(path / "Test_List.csv", index=False)
+    for location, dataset in data.items():
+        dataset.reset_index().to_csv(path / f"{location}.csv", index=False)
+    return str(path)
+
+
+def test_update_matches_full_read(source):
+    part = PartNumber(source, engine="streaming")
+    version = part.version
+    test_id = part.tests.index[0]
+    append_rows(
+        source,
+        "Portland",
+        [(test_id, f"NEW{i}", 100.0 + i) for i in range(3)]
+        + [("NEW_TEST", "NEW3", 2)],
+    )
+
+    with mock.patch.object(part, "reload", wraps=part.reload) as reload:
+        part.update()
+
+    full = PartNumber(source, engine="streaming")
+    assert not reload.called
+    assert part.version == version + 1
+    pd.testing.assert_frame_equal(part.data["Portland"], full.data["Portland"])
+    pd.testing.assert_frame_equal(part.stats, full.stats, check_like=True)
+
+
+def test_stats_match_readings_after_update(source):
+    part = PartNumber(source, engine="streaming")
+    test_id = part.tests.index[0]
+
+    for rows in (
+        [(test_id, f"NEW{i}", 100.0 + i) for i in range(3)],
+        [
+            (test_id, "NEW3", -50.0),
+            ("NEW_TEST", "NEW4", 2),
+            ("NEW_TEST", "NEW5", 4),
+        ],
+    ):
+        append_rows(source, "Portland", rows)
+        part.update()
+
+        assert_stats_match_readings(part)
+
+    stats = part.stats.loc[("Portland", test_id)]
+    assert stats["max"] == 102.0
+    assert stats["min"] == -50.0
+    assert part.stats.loc[("Portland", "NEW_TEST"), "count"] == 2
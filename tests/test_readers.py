@@ -0,0 +1,77 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from spyc.helpers import readers
+
+TESTS = os.path.dirname(__file__)
+WORKBOOKS = [
+    os.path.join(TESTS, "Dummy Data.xlsx"),
+    os.path.join(TESTS, "Dummy Data 2.xlsx"),
+]
+
+
+def assert_frames_equal(frames, expected):
+    header, tests, data = frames
+
+    assert header == expected[0]
+    pd.testing.assert_frame_equal(tests, expected[1])
+    assert data.keys() == expected[2].keys()
+    for location, dataset in expected[2].items():
+        pd.testing.assert_frame_equal(data[location], dataset)
+
+
+def mark(rows):
+    hashed = readers.HashedRows(iter(rows))
+    list(hashed)
+    return hashed.mark()
+
+
+def test_row_hash_ignores_number_types():
+    assert mark([("SN1", 2, None)]) == mark([("SN1", 2.0)])
+    assert mark([("SN1", np.float32(0.5))]) == mark([("SN1", 0.5)])
+
+
+def test_row_hash_sees_changes():
+    assert mark([("SN1", 2)]) != mark([("SN1", 3)])
+    assert mark([("SN1", 2)]) != mark([("SN1", "2")])
+    assert mark([("SN1", None, 2)]) != mark([("SN1", 2)])
+    assert mark([("SN1",), ("SN2",)]) != mark([("SN1", "SN2")])
+
+
+@pytest.mark.parametrize("path", WORKBOOKS)
+def test_streaming_matches_pandas(path):
+    marks = {}
+    frames = readers.read_source(path, engine="streaming", marks=marks)
+
+    assert_frames_equal(frames, readers.read_excel(path))
+    assert set(marks) == {"Header", "Test_List", *frames[2]}
+
+
+def write_tables(frames, dirpath, fmt):
+    header, tests, data = frames
+    tables = {"Header": pd.DataFrame([header]), "Test_List": tests}
+    tables.update(data)
+
+    os.makedirs(dirpath)
+    for name, table in tables.items():
+        path = os.path.join(dirpath, name + readers.TABLE_FORMATS[fmt])
+        if table.index.names != [None]:
+            table = table.reset_index()
+        if fmt == "csv":
+            table.to_csv(path, index=False)
+        else:
+            table.to_parquet(path, index=False)
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet"])
+@pytest.mark.parametrize("path", WORKBOOKS)
+def test_table_dir_matches_workbook(tmp_path, path, fmt):
+    expected = readers.read_excel(path)
+    dirpath = str(tmp_path / "part")
+    write_tables(expected, dirpath, fmt)
+
+    frames = readers.read_source(dirpath)
+
+    assert readers.source_format(dirpath) == fmt
+    assert_frames_equal(frames, expected)
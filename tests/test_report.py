@@ -0,0 +1,114 @@
+import os
+import re
+import json
+import base64
+import shutil
+import numpy as np
+import pandas as pd
+import plotly.offline
+import pytest
+from spyc import report
+from spyc.helpers.partnumber import PartNumber
+
+DATA = os.path.join(os.path.dirname(__file__), "Dummy Data.xlsx")
+
+
+def decode(array):
+    return np.frombuffer(
+        base64.b64decode(array["bdata"]), dtype=f"<{array['dtype']}"
+    )
+
+
+@pytest.mark.parametrize(
+    "values, dtype",
+    [
+        ([1.5, np.nan, -2.25, 1e-300], "f8"),
+        (np.arange(5), "i4"),
+        (np.array([0, 2**40]), "f8"),
+    ],
+)
+def test_typed_array_decodes_to_readings(values, dtype):
+    array = report.typed_array(values)
+
+    assert array["dtype"] == dtype
+    np.testing.assert_array_equal(decode(array), np.asarray(values, float))
+
+
+def test_typed_array_leaves_text():
+    assert report.typed_array(["SN1", "SN2"]) == ["SN1", "SN2"]
+
+
+@pytest.mark.parametrize(
+    "version, supported",
+    [("2.2.0", False), ("2.27.1", False), ("2.28.0", True), ("3.0.1", True)],
+)
+def test_supports_typed_arrays(monkeypatch, version, supported):
+    monkeypatch.setattr(
+        plotly.offline, "get_plotlyjs_version", lambda: version
+    )
+
+    assert report.supports_typed_arrays() == supported
+
+
+def test_plain_lists_without_typed_arrays():
+    fig = {
+        "data": [
+            {"type": "scatter", "x": ["a", "b"], "y": np.array([1.5, 2])}
+        ],
+        "layout": {"template": {}},
+    }
+
+    typed = report.report_html("PN", {}, pd.DataFrame(), [fig], "p.js")
+    plain = report.report_html(
+        "PN", {}, pd.DataFrame(), [fig], "p.js", encode=False
+    )
+
+    assert '"bdata"' in typed
+    assert '"bdata"' not in plain
+    assert '"y":[1.5,2.0]' in plain
+
+
+def report_figures(text):
+    data = re.search(r"^const figures = (.*);$", text, re.M).group(1)
+    return json.loads(data.replace("<\\/", "</"))
+
+
+def test_report_parts(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    shutil.copy(DATA, data_dir)
+    out = tmp_path / "out"
+
+    paths = report.report_parts(str(data_dir), str(out))
+
+    assert paths == [str(out / "789120-2.html")]
+    assert (out / "plotly.min.js").is_file()
+    with open(paths[0], encoding="utf-8") as f:
+        text = f.read()
+
+    part = PartNumber(DATA)
+    figures = report_figures(text)
+    assert '<script src="plotly.min.js"></script>' in text
+    assert text.count('class="spc-figure"') == len(figures)
+    assert len(figures) == len(part.tests)
+    assert text.count("</tr>") == len(part.capability_table()) + 1
+    assert all("template" not in fig["layout"] for fig in figures)
+
+
+def test_report_escapes_text():
+    html = report.report_html(
+        "PN <1>",
+        {"Notes": "</script><b>"},
+        pd.DataFrame({"Test_Name": ["</script>"]}),
+        [
+            {
+                "data": [{"type": "scatter", "text": ["</script>"]}],
+                "layout": {"title": {"text": "</script>"}},
+            }
+        ],
+        "p.js",
+    )
+
+    assert html.count("</script>") == 2
+    assert "<title>PN &lt;1&gt;</title>" in html
+    assert report_figures(html)[0]["data"][0]["text"] == ["</script>"]
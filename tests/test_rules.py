@@ -0,0 +1,56 @@
+import os
+import numpy as np
+import pytest
+from spyc.helpers.partnumber import PartNumber
+from spyc.helpers.rules import check_rules, rule_names, violations
+
+DATA = os.path.join(os.path.dirname(__file__), "Dummy Data.xlsx")
+
+
+@pytest.mark.parametrize(
+    "rule, readings, expected",
+    [
+        ("beyond_3sd", [0, 3.5, 0, -3.5], [1, 3]),
+        ("2_of_3_beyond_2sd", [2.5, 0, 2.5, 0, -2.5, 2.5], [0, 2]),
+        ("4_of_5_beyond_1sd", [0, 1.5, 1.5, 0, 1.5, 1.5, 0], [1, 2, 4, 5]),
+        ("8_same_side", [-1] + [0.5] * 8 + [-1], list(range(1, 9))),
+        ("6_trending", [1, 0, 1, 2, 3, 4, 5, 0], list(range(1, 7))),
+        ("14_alternating", [0.5, -0.5] * 7 + [0.5, 0.5], list(range(15))),
+        ("15_within_1sd", [2] + [0.5] * 15, list(range(1, 16))),
+        ("8_beyond_1sd", [1.5, -1.5] * 4 + [0], list(range(8))),
+    ],
+)
+def test_rule(rule, readings, expected):
+    flags = check_rules(np.array(readings, float), 0.0, 1.0, [rule])[rule]
+
+    assert np.flatnonzero(flags).tolist() == expected
+
+
+def test_runs_stop_at_groups():
+    readings = np.full(10, 0.5)
+    groups = np.repeat([0, 1], 5)
+
+    assert violations(readings, 0.0, 1.0, "8_same_side").all()
+    assert not violations(readings, 0.0, 1.0, "8_same_side", groups).any()
+
+
+def test_rule_names():
+    assert rule_names(["western_electric", "beyond_3sd"]) == rule_names(
+        "western_electric"
+    )
+    with pytest.raises(ValueError):
+        rule_names("bad")
+
+
+def test_rule_table_matches_each_test():
+    part = PartNumber(DATA)
+    table = part.rule_table("nelson").set_index(["Location", "Test_ID"])
+
+    for (location, test_id), row in table.iterrows():
+        data = PartNumber.extract_test(part.data[location], test_id)
+        stats = part.stats.loc[(location, test_id)]
+        flags = violations(
+            data["Reading"], stats["mean"], stats["SD"], "nelson"
+        )
+
+        assert row["violations"] == flags.sum()
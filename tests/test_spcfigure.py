@@ -0,0 +1,182 @@
+import os
+import json
+import pytest
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+from spyc.helpers.partnumber import PartNumber
+from spyc.helpers.spcfigure import SPCFigure, SPCDictFigure
+
+DATA = os.path.join(os.path.dirname(__file__), "Dummy Data.xlsx")
+
+
+@pytest.fixture(scope="module")
+def part():
+    return PartNumber(DATA)
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {},
+        {"meanline": True, "violin": True, "capability_loc": "Portland"},
+        {"meanline": True, "max_points": 2, "webgl_threshold": 1},
+        {"location": "Miami", "max_points": 2, "sn_range": (1.0, 3.0)},
+        {"rules": "nelson", "max_points": 2},
+    ],
+)
+def test_dict_figure_matches_spcfigure(part, options):
+    expected = part.xbar(**options)
+    figs = part.xbar(figure_class=SPCDictFigure, **options)
+
+    assert list(figs) == list(expected)
+    for title, fig in figs.items():
+        assert json.loads(fig.to_json()) == json.loads(
+            pio.to_json(expected[title])
+        )
+
+
+def test_dict_figure_is_serialisable_by_dash(part):
+    _, fig = part.xbar_plot("1.1", figure_class=SPCDictFigure)
+    _, expected = part.xbar_plot("1.1", figure_class=SPCFigure)
+
+    assert json.loads(pio.to_json(fig.to_dict())) == json.loads(
+        pio.to_json(expected)
+    )
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{}, {"spec_limits": True, "rules": "nelson", "location": "Miami"}],
+)
+def test_imr_dict_figure_matches_spcfigure(part, options):
+    expected = part.imr(**options)
+    figs = part.imr(figure_class=SPCDictFigure, **options)
+
+    assert list(figs) == list(expected)
+    for title, fig in figs.items():
+        assert json.loads(fig.to_json()) == json.loads(
+            pio.to_json(expected[title])
+        )
+
+
+def test_imr_limits(part):
+    readings = part.data["Portland"].loc["1.1", "Reading"].to_numpy(float)
+    limits = part.limits.loc[("Portland", "1.1")]
+    mr = np.abs(np.diff(readings)).mean()
+
+    assert limits["MR"] == pytest.approx(mr)
+    assert limits["I_UCL"] == pytest.approx(readings.mean() + 2.66 * mr, 1e-3)
+    assert limits["MR_UCL"] == pytest.approx(3.267 * mr)
+
+
+def test_rule_violations_within_max_points():
+    n = 30_000
+    readings = np.sin(np.arange(n) / 50) * 2
+    data = pd.DataFrame(
+        {"Reading": readings},
+        index=pd.Index([f"SN{i:05d}" for i in range(n)], name="Unit SN"),
+    )
+    test = pd.Series(
+        {"Test_Name": "Width", "Min_Tol": -1.9, "Max_Tol": 10.0, "Units": ""}
+    )
+    fig = SPCDictFigure()
+
+    fig.xbar_plot(
+        {"A": data},
+        test,
+        max_points=5_000,
+        rules="nelson",
+        means={"A": 0.0},
+        sds={"A": 1.0},
+    )
+
+    trace = fig.to_dict()["data"][0]
+    colours = np.asarray(trace["marker"]["color"])
+    symbols = np.asarray(trace["marker"]["symbol"])
+    assert len(trace["x"]) <= 5_000
+    assert (symbols == "x").sum() == (readings < -1.9).sum()
+    assert (colours == fig.violation_colour).sum() > 1_000
+
+
+@pytest.mark.parametrize(
+    "lsl, usl, expected",
+    [
+        (1.0, 2.0, ["x", "circle", "circle", "x", "circle"]),
+        (None, 2.0, ["circle", "circle", "circle", "x", "circle"]),
+        (np.nan, 2.0, ["circle", "circle", "circle", "x", "circle"]),
+        (1.0, np.nan, ["x", "circle", "circle", "circle", "circle"]),
+        (None, None, ["circle"] * 5),
+    ],
+)
+def test_oot_markers(lsl, usl, expected):
+    readings = pd.Series([0.5, 1.0, 2.0, 2.5, np.nan])
+
+    assert list(SPCFigure.oot_markers(readings, lsl, usl)) == expected
+
+
+def test_xbar_oot_markers(part):
+    before = {loc: data.copy() for loc, data in part.data.items()}
+    test = part.tests.loc["1.1"]
+
+    _, fig = part.xbar_plot("1.1", figure_class=SPCDictFigure)
+
+    traces = fig.to_dict()["data"]
+    assert [trace["name"] for trace in traces] == list(part.data)
+    for colour, trace in zip(SPCFigure.colour_list, traces):
+        readings = part.data[trace["name"]].loc["1.1", "Reading"]
+        oot = (readings < test["Min_Tol"]) | (readings > test["Max_Tol"])
+        assert oot.any() and not oot.all()
+        assert list(trace["marker"]["symbol"]) == [
+            "x" if flag else "circle" for flag in oot
+        ]
+        assert trace["line"]["color"] == colour
+        assert "color" not in trace["marker"]
+    # Markers are not written in to the part's data
+    for loc, data in part.data.items():
+        pd.testing.assert_frame_equal(data, before[loc])
+
+
+def xbar_traces(n, **options):
+    data = pd.DataFrame(
+        {"Reading": np.arange(n, dtype=float)},
+        index=pd.Index([f"SN{i:05d}" for i in range(n)], name="Unit SN"),
+    )
+    test = pd.Series(
+        {"Test_Name": "Width", "Min_Tol": 5.0, "Max_Tol": n - 5.0, "Units": ""}
+    )
+    fig = SPCDictFigure()
+    fig.xbar_plot({"A": data, "B": data.iloc[:10]}, test, **options)
+    return json.loads(fig.to_json())["data"]
+
+
+@pytest.mark.parametrize(
+    "options, trace_type",
+    [
+        ({}, "scatter"),
+        ({"webgl_threshold": 100}, "scatter"),
+        ({"webgl_threshold": 99}, "scattergl"),
+        ({"webgl_threshold": 50, "max_points": 50}, "scatter"),
+        ({"webgl_threshold": 40, "max_points": 50}, "scattergl"),
+    ],
+)
+def test_webgl_threshold(options, trace_type):
+    traces = xbar_traces(100, **options)
+
+    # Every location is drawn the same way
+    assert [trace["type"] for trace in traces] == [trace_type] * 2
+
+
+def test_webgl_traces_match_svg():
+    rules = dict(
+        rules="nelson", means={"A": 50.0, "B": 5.0}, sds={"A": 5.0, "B": 1.0}
+    )
+    svg = xbar_traces(100, **rules)
+    webgl = xbar_traces(100, webgl_threshold=1, **rules)
+
+    for trace in webgl:
+        assert trace.pop("type") == "scattergl"
+    for trace in svg:
+        assert trace.pop("type") == "scatter"
+    assert webgl == svg
+    assert svg[0]["marker"]["color"].count(SPCFigure.violation_colour) > 0
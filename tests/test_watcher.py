@@ -0,0 +1,111 @@
+import os
+import shutil
+import threading
+import pytest
+from spyc.app import make_parts, update_parts
+from spyc.helpers.watcher import DirectoryWatcher
+
+DATA = os.path.join(os.path.dirname(__file__), "Dummy Data.xlsx")
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    shutil.copy(DATA, tmp_path / "a.xlsx")
+    return tmp_path
+
+
+def touch(path, seconds):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 10**9))
+
+
+def test_no_changes(data_dir):
+    watcher = DirectoryWatcher(str(data_dir))
+
+    assert watcher.poll() == ([], [], [])
+
+
+def test_added_once_stable(data_dir):
+    watcher = DirectoryWatcher(str(data_dir))
+    path = str(shutil.copy(DATA, data_dir / "b.xlsx"))
+
+    assert watcher.poll() == ([], [], [])
+    assert watcher.poll() == ([path], [], [])
+    assert watcher.poll() == ([], [], [])
+
+
+def test_modified_waits_for_writes_to_stop(data_dir):
+    watcher = DirectoryWatcher(str(data_dir))
+    path = str(data_dir / "a.xlsx")
+
+    touch(path, 1)
+    assert watcher.poll() == ([], [], [])
+    touch(path, 1)
+    assert watcher.poll() == ([], [], [])
+    assert watcher.poll() == ([], [path], [])
+
+
+def test_deleted(data_dir):
+    watcher = DirectoryWatcher(str(data_dir))
+    path = str(data_dir / "a.xlsx")
+
+    os.remove(path)
+
+    assert watcher.poll() == ([], [], [])
+    assert watcher.poll() == ([], [], [path])
+    assert path not in watcher.snapshot
+
+
+def test_deleted_and_restored_is_not_reported(data_dir):
+    watcher = DirectoryWatcher(str(data_dir))
+    path = data_dir / "a.xlsx"
+    sig = DirectoryWatcher.signature(str(path))
+
+    os.remove(path)
+    assert watcher.poll() == ([], [], [])
+    shutil.copy(DATA, path)
+    os.utime(path, ns=(sig[0], sig[0]))
+
+    assert watcher.poll() == ([], [], [])
+    assert watcher.poll() == ([], [], [])
+
+
+def test_thread_calls_back(data_dir):
+    changes = []
+    called = threading.Event()
+
+    def callback(*args):
+        changes.append(args)
+        called.set()
+
+    watcher = DirectoryWatcher(str(data_dir), interval=0.01, callback=callback)
+    watcher.start()
+    try:
+        path = str(shutil.copy(DATA, data_dir / "b.xlsx"))
+        assert called.wait(timeout=5)
+    finally:
+        watcher.stop()
+
+    assert changes == [([path], [], [])]
+
+
+def test_relative_dir_matches_parts(data_dir, monkeypatch):
+    monkeypatch.chdir(data_dir.parent)
+    relative = data_dir.name
+    parts = make_parts(relative)
+    watcher = DirectoryWatcher(relative)
+    path = str(data_dir / "a.xlsx")
+
+    touch(path, 1)
+    watcher.poll()
+    added, modified, deleted = watcher.poll()
+    update_parts(parts, added, modified, deleted)
+
+    assert modified == [path]
+    assert [part.filepath for part in parts.values()] == [path]
+
+    os.remove(path)
+    watcher.poll()
+    update_parts(parts, *watcher.poll())
+
+    assert not parts